@@ -115,8 +115,8 @@ SRC_DIR = PROJECT_ROOT / "src"
 sys.path.append(str(SRC_DIR))
 
 try:
-    from app_data import get_bike_data
-    from ui.overview import render as render_overview
+    from app_data import get_bitmap_index, get_station_flow, get_time_index, get_trip_cube
+    from ui.overview import render as render_overview, COLUMNS as OVERVIEW_COLUMNS
     from ui.time_trends import render as render_time_trends
     from ui.user_duration_insights import render as render_user_duration
     from ui.station_route_insights import render as render_station_route
@@ -130,7 +130,6 @@ except Exception as e:
     
 def main() -> None:
         inject_custom_css()
-        df = get_bike_data()
 
         st.sidebar.markdown("### 🚲 Toronto Bike-Sharing Analytics")
         st.sidebar.caption("Use the menu below to explore the insights:")
@@ -163,16 +162,18 @@ def main() -> None:
         unsafe_allow_html=True,
         )
 
+        # Overview filters its declared columns through the bitmap index;
+        # the other pages query the pre-aggregated trip cube
         if page == "Overview":
-            render_overview(df)
+            render_overview(get_bitmap_index(OVERVIEW_COLUMNS), get_time_index(OVERVIEW_COLUMNS))
         elif page.startswith("Time-based Trends"):
-            render_time_trends(df)
+            render_time_trends(get_trip_cube())
         elif page.startswith("User & Duration Insights"):
-            render_user_duration(df)
+            render_user_duration(get_trip_cube())
         elif page.startswith("Station & Route Insights"):
-            render_station_route(df)
+            render_station_route(get_trip_cube(), get_station_flow())
         elif page.startswith("Destination Flow"):
-            render_destination_flow(df)
+            render_destination_flow(get_trip_cube())
         else:
             st.error("Unknown page selection.")
 if __name__ == "__main__":
@@ -2,24 +2,36 @@
 from __future__ import annotations
 
 import pandas as pd
+
+from duration_sketch import DurationSketch
+from top_k import top_k
+from trip_cube import count_trips, duration_moments, duration_quantiles
 from utils import get_logger
 
 logger = get_logger(__name__)
 
 
-def summarize_trip_duration_by_user_type(df: pd.DataFrame) -> pd.DataFrame:
+def summarize_trip_duration_by_user_type(df: pd.DataFrame | DurationSketch) -> pd.DataFrame:
     """
     Compute mean/median trip duration per user type.
     Uses the column 'trip_duration_clean' and 'user_type_standardized'.
+
+    Also accepts a trip cube query by user type (and duration_bin): counts
+    and means come from the summed measures, the median from the duration
+    histogram sketch. A DurationSketch by user type gives the same summary
+    with a KLL median.
     """
 
-    df = df.copy()
+    if isinstance(df, DurationSketch):
+        return _summarize_sketch_duration_by_user_type(df)
+    if "duration_sum_sec" in df.columns:
+        return _summarize_cube_duration_by_user_type(df)
 
-    # Aseguramos que la duración esté en numérico
-    df["trip_duration_clean"] = pd.to_numeric(df["trip_duration_clean"], errors="coerce")
+    # Aseguramos que la duración esté en numérico (sin copiar el DataFrame)
+    duration = pd.to_numeric(df["trip_duration_clean"], errors="coerce")
 
     summary = (
-        df.groupby("user_type_standardized")["trip_duration_clean"]
+        duration.groupby(df["user_type_standardized"], observed=True)
           .agg(
               trips_count="count",
               duration_mean_sec="mean",
@@ -33,6 +45,44 @@ def summarize_trip_duration_by_user_type(df: pd.DataFrame) -> pd.DataFrame:
     return summary
 
 
+def _summarize_cube_duration_by_user_type(cube: pd.DataFrame) -> pd.DataFrame:
+    totals = cube.groupby("user_type_standardized", observed=True)[
+        ["duration_count", "duration_sum_sec", "duration_sumsq_sec"]
+    ].sum()
+    moments = duration_moments(totals)
+
+    if "duration_bin" in cube.columns:
+        median = duration_quantiles(cube, q=[0.5], by="user_type_standardized").iloc[:, 0]
+    else:
+        median = pd.Series(float("nan"), index=totals.index)
+
+    summary = pd.DataFrame({
+        "trips_count": moments["count"],
+        "duration_mean_sec": moments["mean"],
+        "duration_median_sec": median.reindex(totals.index),
+    }).reset_index()
+
+    logger.info("Computed trip duration summary by user type (trip cube):\n%s", summary)
+
+    return summary
+
+
+def _summarize_sketch_duration_by_user_type(sketch: DurationSketch) -> pd.DataFrame:
+    if sketch.by != ("user_type_standardized",):
+        raise ValueError(f"expected a sketch by user_type_standardized, got {sketch.by}")
+
+    stats = sketch.summary(q=[0.5])
+    summary = pd.DataFrame({
+        "trips_count": stats["count"],
+        "duration_mean_sec": stats["mean"],
+        "duration_median_sec": stats["50%"],
+    }).sort_index().reset_index()
+
+    logger.info("Computed trip duration summary by user type (duration sketch):\n%s", summary)
+
+    return summary
+
+
 def get_peak_stations_by_user_type(
     df: pd.DataFrame,
     top_n: int = 10
@@ -44,41 +94,22 @@ def get_peak_stations_by_user_type(
       - 'end_stations'
     """
 
-    df = df.copy()
-
-    # Nos quedamos con los tipos conocidos
-    df = df[df["user_type_standardized"].isin(["Casual", "Annual"])]
-
-    # Top estaciones de inicio
-    start_peak = (
-        df.groupby(["user_type_standardized", "start_station_normalized"])
-          .size()
-          .reset_index(name="trip_count")
-          .sort_values(["user_type_standardized", "trip_count"], ascending=[True, False])
-    )
-
-    # Nos quedamos con los top_n por tipo de usuario
-    start_peak = (
-        start_peak
-        .groupby("user_type_standardized")
-        .head(top_n)
-        .reset_index(drop=True)
-    )
-
-    # Top estaciones de fin
-    end_peak = (
-        df.groupby(["user_type_standardized", "end_station_normalized"])
-          .size()
-          .reset_index(name="trip_count")
-          .sort_values(["user_type_standardized", "trip_count"], ascending=[True, False])
-    )
+    known_types = ["Casual", "Annual"]
+    # cube query results carry a trip_count per row
+    weights = "trip_count" if "trip_count" in df.columns else None
+
+    def top_stations(station_col: str) -> pd.DataFrame:
+        # Contamos sobre códigos enteros y solo nombramos las top_n ganadoras
+        # por tipo de usuario (sin ordenar todos los grupos)
+        counts = top_k(df, station_col, k=top_n, by="user_type_standardized", weights=weights)
+        return (
+            counts[counts["user_type_standardized"].isin(known_types)]
+            .reset_index(drop=True)
+        )
 
-    end_peak = (
-        end_peak
-        .groupby("user_type_standardized")
-        .head(top_n)
-        .reset_index(drop=True)
-    )
+    # Top estaciones de inicio y de fin
+    start_peak = top_stations("start_station_normalized")
+    end_peak = top_stations("end_station_normalized")
 
     logger.info("Computed peak START stations by user type:\n%s", start_peak)
     logger.info("Computed peak END stations by user type:\n%s", end_peak)
@@ -95,8 +126,6 @@ def summarize_time_of_day_by_user_type(df: pd.DataFrame) -> pd.DataFrame:
     Conteo de viajes por hora del día y tipo de usuario.
     """
 
-    df = df.copy()
-
     # Por seguridad, nos aseguramos de que start_hour exista
     if "start_hour" not in df.columns:
         raise KeyError(
@@ -105,8 +134,7 @@ def summarize_time_of_day_by_user_type(df: pd.DataFrame) -> pd.DataFrame:
         )
 
     summary = (
-        df.groupby(["start_hour", "user_type_standardized"])
-          .size()
+        count_trips(df, ["start_hour", "user_type_standardized"])
           .reset_index(name="trip_count")
           .sort_values(["start_hour", "user_type_standardized"])
     )
@@ -1,45 +1,81 @@
 # analysis_outliers.py
 from __future__ import annotations
 
+from typing import Sequence
+
 import pandas as pd
 import numpy as np
+from duration_sketch import DurationSketch
+from group_aggregates import grouped_quantiles
 from utils import get_logger
 
 logger = get_logger(__name__)
 
+OUTLIER_METHODS = ("iqr", "zscore", "mad")
+
+# Modified z-score of Iglewicz & Hoaglin: 0.6745 * (x - median) / MAD, so a
+# MAD threshold is comparable to a z-score one for normal data.
+MAD_SCALE = 0.6745
+
 
 def detect_trip_duration_outliers(
     df: pd.DataFrame,
     method: str = "iqr",   # "iqr" or "zscore"
-    z_thresh: float = 3.0  # typical: 3 or 3.5
+    z_thresh: float = 3.0,  # typical: 3 or 3.5
+    sketch: DurationSketch | None = None,
 ):
     """
     Detects extremely long/short trips using IQR or Z-score.
+
+    With an ungrouped `sketch` (e.g. built chunk by chunk during streaming),
+    thresholds and the duration summary come from the sketch instead of
+    quantiles / std over the whole duration column; only the mask needs it.
     
     Returns:
         - outliers_df: DataFrame with flagged rows
         - insights: dictionary (JSON-ready) with summary statistics
     """
 
-    df = df.copy()
+    # Aseguramos que la duración sea numérica (sin copiar el DataFrame)
+    duration_all = pd.to_numeric(df["trip_duration_clean"], errors="coerce")
 
-    # Aseguramos que la duración sea numérica
-    df["trip_duration_clean"] = pd.to_numeric(df["trip_duration_clean"], errors="coerce")
-
-    duration = df["trip_duration_clean"].dropna()
+    if sketch is not None:
+        if sketch.by:
+            raise ValueError("detect_trip_duration_outliers needs an ungrouped DurationSketch")
+        stats = sketch.summary().iloc[0]
+        summary = {
+            "min": stats["min"],
+            "max": stats["max"],
+            "mean": stats["mean"],
+            "std": stats["std"],
+            "median": stats["50%"],
+            "Q1": stats["25%"],
+            "Q3": stats["75%"],
+        }
+    else:
+        duration = duration_all.dropna()
+        summary = {
+            "min": duration.min(),
+            "max": duration.max(),
+            "mean": duration.mean(),
+            "std": duration.std(),
+            "median": duration.median(),
+            "Q1": duration.quantile(0.25),
+            "Q3": duration.quantile(0.75),
+        }
 
     # ---------------------------------------------------------------------
     # METHOD A: IQR (Interquartile Range)
     # ---------------------------------------------------------------------
     if method == "iqr":
-        Q1 = duration.quantile(0.25)
-        Q3 = duration.quantile(0.75)
+        Q1 = summary["Q1"]
+        Q3 = summary["Q3"]
         IQR = Q3 - Q1
 
         lower_bound = Q1 - 1.5 * IQR
         upper_bound = Q3 + 1.5 * IQR
 
-        mask = (df["trip_duration_clean"] < lower_bound) | (df["trip_duration_clean"] > upper_bound)
+        mask = (duration_all < lower_bound) | (duration_all > upper_bound)
 
         approach = "IQR-based outlier detection"
 
@@ -47,10 +83,10 @@ def detect_trip_duration_outliers(
     # METHOD B: Z-SCORE
     # ---------------------------------------------------------------------
     elif method == "zscore":
-        mean = duration.mean()
-        std = duration.std()
+        mean = summary["mean"]
+        std = summary["std"]
 
-        z_scores = (df["trip_duration_clean"] - mean) / std
+        z_scores = (duration_all - mean) / std
         mask = (z_scores.abs() > z_thresh)
 
         lower_bound = mean - z_thresh * std
@@ -60,8 +96,9 @@ def detect_trip_duration_outliers(
     else:
         raise ValueError("method must be 'iqr' or 'zscore'")
 
-    # ✅ Filtramos primero
+    # ✅ Filtramos primero (solo se copian las filas atípicas)
     outliers_df = df[mask].copy()
+    outliers_df["trip_duration_clean"] = duration_all[mask]
 
     # ✅ Calculamos la razón SOLO con los outliers
     outliers_df["outlier_reason"] = np.where(
@@ -84,12 +121,7 @@ def detect_trip_duration_outliers(
             "upper_bound": float(upper_bound)
         },
         "duration_summary": {
-            "min": float(duration.min()),
-            "max": float(duration.max()),
-            "mean": float(duration.mean()),
-            "median": float(duration.median()),
-            "Q1": float(duration.quantile(0.25)),
-            "Q3": float(duration.quantile(0.75)),
+            name: float(summary[name]) for name in ("min", "max", "mean", "median", "Q1", "Q3")
         },
         "examples": {
             "sample_too_short": outliers_df[outliers_df["outlier_reason"] == "Too short"]["trip_duration_clean"].head(5).tolist(),
@@ -100,3 +132,188 @@ def detect_trip_duration_outliers(
     logger.info("Outlier detection complete. %s outliers found.", len(outliers_df))
 
     return outliers_df, insights
+
+
+def _group_codes(df: pd.DataFrame, by: tuple[str, ...]) -> tuple[np.ndarray, pd.Index]:
+    """Group id per row (-1 for missing keys) and the sorted group labels."""
+
+    if not by:
+        return np.zeros(len(df), dtype="int64"), pd.Index(["all"], name="group")
+    groups = df.groupby(list(by), observed=True, sort=True)
+    return groups.ngroup().fillna(-1).to_numpy(dtype="int64"), groups.size().index
+
+
+def _by_columns(by: str | Sequence[str] | None) -> tuple[str, ...]:
+    return () if not by else (by,) if isinstance(by, str) else tuple(by)
+
+
+def _durations(df: pd.DataFrame) -> np.ndarray:
+    return pd.to_numeric(df["trip_duration_clean"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _threshold_table(method: str, counts, center, spread, index: pd.Index, z_thresh: float, whisker: float) -> pd.DataFrame:
+    if method == "iqr":
+        names = ("Q1", "Q3")
+        iqr = spread - center
+        lower, upper = center - whisker * iqr, spread + whisker * iqr
+    elif method == "zscore":
+        names = ("mean", "std")
+        lower, upper = center - z_thresh * spread, center + z_thresh * spread
+    else:
+        names = ("median", "mad")
+        lower, upper = center - z_thresh * spread / MAD_SCALE, center + z_thresh * spread / MAD_SCALE
+
+    return pd.DataFrame({
+        "trips_count": counts,
+        names[0]: center,
+        names[1]: spread,
+        "lower_bound": lower,
+        "upper_bound": upper,
+    }, index=index)
+
+
+def _thresholds_from_values(
+    codes: np.ndarray,
+    values: np.ndarray,
+    index: pd.Index,
+    method: str,
+    z_thresh: float,
+    whisker: float,
+) -> pd.DataFrame:
+    keep = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+    n_groups = len(index)
+    counts = np.bincount(codes, minlength=n_groups)
+
+    if method == "iqr":
+        center, spread = grouped_quantiles(codes, values, n_groups, [0.25, 0.75]).T
+    elif method == "zscore":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            center = np.bincount(codes, weights=values, minlength=n_groups) / counts
+            m2 = np.bincount(codes, weights=(values - center[codes]) ** 2, minlength=n_groups)
+            spread = np.sqrt(m2 / np.where(counts > 1, counts - 1, np.nan))
+    else:
+        center = grouped_quantiles(codes, values, n_groups, [0.5])[:, 0]
+        spread = grouped_quantiles(codes, np.abs(values - center[codes]), n_groups, [0.5])[:, 0]
+
+    return _threshold_table(method, counts, center, spread, index, z_thresh, whisker)
+
+
+def _thresholds_from_sketch(sketch: DurationSketch, by: tuple[str, ...], method: str, z_thresh: float, whisker: float) -> pd.DataFrame:
+    if sketch.by != by:
+        raise ValueError(f"sketch is grouped by {sketch.by}, not {by}")
+    if method == "mad":
+        raise ValueError("MAD needs a second pass over the durations; pass the trips instead of a sketch")
+
+    stats = sketch.summary()
+    if method == "iqr":
+        center, spread = stats["25%"].to_numpy(), stats["75%"].to_numpy()
+    else:
+        center, spread = stats["mean"].to_numpy(), stats["std"].to_numpy()
+    index = stats.index if by else pd.Index(["all"], name="group")
+    return _threshold_table(method, stats["count"].to_numpy(), center, spread, index, z_thresh, whisker)
+
+
+def duration_outlier_thresholds(
+    df: pd.DataFrame | None,
+    by: str | Sequence[str] | None = None,
+    method: str = "iqr",
+    z_thresh: float = 3.0,
+    whisker: float = 1.5,
+    sketch: DurationSketch | None = None,
+) -> pd.DataFrame:
+    """
+    Lower/upper duration bounds for every group of `by`, all groups at once:
+
+      - iqr:    Q1 - whisker*IQR .. Q3 + whisker*IQR
+      - zscore: mean -/+ z_thresh * std
+      - mad:    median -/+ z_thresh * MAD / 0.6745 (modified z-score)
+
+    With a DurationSketch grouped by the same columns, iqr and zscore
+    bounds come from the sketch and `df` is not read.
+    """
+
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"method must be one of {OUTLIER_METHODS}")
+    by = _by_columns(by)
+
+    if sketch is not None:
+        return _thresholds_from_sketch(sketch, by, method, z_thresh, whisker)
+    codes, index = _group_codes(df, by)
+    return _thresholds_from_values(codes, _durations(df), index, method, z_thresh, whisker)
+
+
+def _mask(codes: np.ndarray, values: np.ndarray, thresholds: pd.DataFrame, index: pd.Index) -> np.ndarray:
+    bounds = thresholds.reindex(index)
+    # a trailing NaN bound for rows with missing keys (code -1)
+    lower = np.append(bounds["lower_bound"].to_numpy(dtype="float64"), np.nan)
+    upper = np.append(bounds["upper_bound"].to_numpy(dtype="float64"), np.nan)
+    return (values < lower[codes]) | (values > upper[codes])
+
+
+def outlier_mask(
+    df: pd.DataFrame,
+    thresholds: pd.DataFrame,
+    by: str | Sequence[str] | None = None,
+) -> np.ndarray:
+    """
+    Boolean mask over the rows of `df` (no copy of the frame): True where
+    the duration is outside its group's bounds. Rows without a duration or
+    a threshold for their group are never flagged, so thresholds computed
+    once (e.g. from a sketch) can be applied chunk by chunk.
+    """
+
+    codes, index = _group_codes(df, _by_columns(by))
+    return _mask(codes, _durations(df), thresholds, index)
+
+
+def detect_grouped_duration_outliers(
+    df: pd.DataFrame,
+    by: str | Sequence[str] | None = "user_type_standardized",
+    method: str = "iqr",
+    z_thresh: float = 3.0,
+    whisker: float = 1.5,
+    sketch: DurationSketch | None = None,
+) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    Outliers judged against the trip's own group (user type, bike model,
+    route, hour...), so a 3-hour casual ride is not measured against a
+    30-minute commute. One grouping and one sort serve every group.
+
+    Returns:
+        - mask: boolean array over the rows of df (np.flatnonzero for row numbers)
+        - thresholds: one row per group with its bounds and outlier counts
+    """
+
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"method must be one of {OUTLIER_METHODS}")
+    by = _by_columns(by)
+    codes, index = _group_codes(df, by)
+    values = _durations(df)
+
+    if sketch is not None:
+        thresholds = _thresholds_from_sketch(sketch, by, method, z_thresh, whisker)
+        missing = ~index.isin(thresholds.index)
+        if missing.any():
+            # groups the sketch never saw (e.g. built on another slice): bounds from the trips
+            logger.warning("%s groups are not in the sketch; computing their bounds from the trips", int(missing.sum()))
+            recode = np.full(len(index) + 1, -1, dtype="int64")
+            recode[np.flatnonzero(missing)] = np.arange(int(missing.sum()))
+            computed = _thresholds_from_values(recode[codes], values, index[missing], method, z_thresh, whisker)
+            thresholds = pd.concat([thresholds, computed])
+        thresholds = thresholds.reindex(index)
+        thresholds["trips_count"] = thresholds["trips_count"].astype("int64")
+    else:
+        thresholds = _thresholds_from_values(codes, values, index, method, z_thresh, whisker)
+    mask = _mask(codes, values, thresholds, index)
+
+    flagged = np.bincount(codes[mask], minlength=len(index))
+    thresholds["outliers"] = flagged
+    thresholds["percentage_outliers"] = np.round(100 * flagged / np.maximum(thresholds["trips_count"], 1), 2)
+
+    logger.info(
+        "Grouped %s outlier detection by %s: %s outliers in %s groups",
+        method, by or "all trips", int(mask.sum()), len(thresholds),
+    )
+
+    return mask, thresholds
@@ -1,26 +1,18 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Sequence
 
 import pandas as pd
 import streamlit as st
 
-from data_loader import load_bike_data
-from data_cleaning import (
-    standardize_user_type,
-    group_bike_model,
-    parse_datetime_columns,
-    clean_trip_duration,
-    clean_station_fields,
-)
-from feature_engineering import (
-    compute_distance_fields,
-    add_time_features,
-    add_weekend_flag,
-    add_rush_hour_flag,
-)
-from station_normalization import normalize_station_fields
+from bitmap_index import INDEX_COLUMNS, BitmapIndex
+from clean_store import CLEAN_STORE_FILENAME, clean_store_path, read_clean_store
+from data_loader import load_bike_data, load_cleaned_data
+from pipeline import process_bike_data
+from station_flow import END_COL, START_COL, StationFlow
+from time_index import TimeIndex, sort_by_time
+from trip_cube import CUBE_DIMENSIONS, TripCube, build_trip_cube, save_trip_cube
 from utils import get_logger
 
 logger = get_logger(__name__)
@@ -33,32 +25,76 @@ CLEAN_DATA_DIR = DATA_DIR / "clean"
 
 
 @st.cache_data(show_spinner=True)
-def get_bike_data(use_clean_file: bool = True) -> pd.DataFrame:
+def get_bike_data(
+    use_clean_file: bool = True,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
 
    #This is cached by Streamlit so multiple pages share the same df.
-    
-    clean_path = CLEAN_DATA_DIR / "toronto-bike-clean.csv"
-
-    if use_clean_file and clean_path.exists():
-        logger.info("Loading cleaned dataset from %s", clean_path)
-        df = pd.read_csv(clean_path)
-        #I am checking the presence of a datetime field and ensuring its [passed] if present
-        for col in ["start_time", "end_time"]:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-        return df
+   # `columns` projects the load: only those columns are read from the store.
+
+    store_path = clean_store_path(CLEAN_STORE_FILENAME)
+    legacy_csv_path = CLEAN_DATA_DIR / "toronto-bike-clean.csv"
+
+    if use_clean_file and store_path.exists():
+        return read_clean_store(CLEAN_STORE_FILENAME, columns=columns)
+
+    if use_clean_file and legacy_csv_path.exists():
+        logger.warning("Columnar clean store not found, falling back to %s", legacy_csv_path)
+        # datetime fields are re-parsed by load_cleaned_data
+        df = load_cleaned_data(legacy_csv_path.name)
+        return _project(df, columns)
 
     logger.info("Cleaned file not found. Running full pipeline from raw.")
     df = load_bike_data("toronto-bike.csv")
-    df = standardize_user_type(df)
-    df = group_bike_model(df)
-    df = parse_datetime_columns(df)
-    df = clean_trip_duration(df)
-    df = clean_station_fields(df)
-    df = normalize_station_fields(df)
-    df = compute_distance_fields(df)
-    df = add_time_features(df)
-    df = add_weekend_flag(df)
-    df = add_rush_hour_flag(df)
-
-    return df
+    df = process_bike_data(df)
+
+    return _project(df, columns)
+
+
+def _project(df: pd.DataFrame, columns: Optional[Sequence[str]]) -> pd.DataFrame:
+    if columns is None:
+        return df
+    return df[[c for c in columns if c in df.columns]]
+
+
+@st.cache_resource(show_spinner=True)
+def get_trip_cube() -> TripCube:
+    """
+    Pre-aggregated trip cube shared by the dashboard pages. Built from the
+    clean store (and saved) the first time if main.py has not written one.
+    """
+
+    try:
+        return TripCube.load()
+    except FileNotFoundError:
+        logger.info("Trip cube not found. Building it from the trip table.")
+
+    columns = CUBE_DIMENSIONS + ("start_time", "trip_duration_clean")
+    cube = build_trip_cube(get_bike_data(columns=columns))
+    save_trip_cube(cube)
+    return TripCube(cube)
+
+
+@st.cache_resource(show_spinner=True)
+def get_bitmap_index(columns: Sequence[str] = ()) -> BitmapIndex:
+    """
+    Bitmap index over the trip table (`columns` plus the indexed filter
+    dimensions), built once per session and shared by the pages. Rows are
+    in start_time order, so positions line up with get_time_index.
+    """
+
+    columns = tuple(dict.fromkeys(tuple(columns) + INDEX_COLUMNS + ("start_time",)))
+    return BitmapIndex(sort_by_time(get_bike_data(columns=columns)))
+
+
+@st.cache_resource(show_spinner=False)
+def get_time_index(columns: Sequence[str] = ()) -> TimeIndex:
+    """Time index over the same frame as get_bitmap_index(columns)."""
+    return TimeIndex(get_bitmap_index(columns).frame)
+
+
+@st.cache_resource(show_spinner=True)
+def get_station_flow() -> StationFlow:
+    """Hourly departures / arrivals / net flow per station, for the station pages."""
+    return StationFlow.from_frame(get_bike_data(columns=("start_time", "end_time", START_COL, END_COL)))
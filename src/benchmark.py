@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import resource
+import subprocess
+import sys
+import time
+import types
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from schema import RAW_SCHEMA
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# The pipeline before this work: the stage functions of the baseline commit,
+# read from git so the comparison does not drift as the stages change, run
+# in the order the baseline main.py ran them (user type twice, as it did).
+BASELINE_COMMIT = "bc76d34"
+BASELINE_STAGES = (
+    ("data_cleaning", "standardize_user_type"),
+    ("data_cleaning", "group_bike_model"),
+    ("data_cleaning", "parse_datetime_columns"),
+    ("data_cleaning", "clean_trip_duration"),
+    ("data_cleaning", "clean_station_fields"),
+    ("station_normalization", "normalize_station_fields"),
+    ("data_cleaning", "standardize_user_type"),
+    ("feature_engineering", "compute_distance_fields"),
+    ("feature_engineering", "add_time_features"),
+    ("feature_engineering", "add_weekend_flag"),
+    ("feature_engineering", "add_rush_hour_flag"),
+)
+
+
+def make_synthetic_raw_trips(
+    n_rows: int,
+    n_stations: int = 800,
+    n_bikes: int = 7000,
+    year: int = 2024,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Raw-layout trips with the dtypes load_bike_data produces, for benchmarks.
+
+    Timestamps are minute-resolution "MM/DD/YYYY HH:MM" categoricals over a
+    full year; ~2% of station names are blank so the station fill has work.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    minutes = pd.date_range(f"{year}-01-01", f"{year}-12-31 23:59", freq="min")
+    time_labels = minutes.strftime("%m/%d/%Y %H:%M")
+    start_codes = rng.integers(0, len(minutes) - 240, n_rows)
+    duration_min = rng.gamma(2.0, 8.0, n_rows).astype("int32") + 1
+    end_codes = start_codes + duration_min
+
+    station_ids = np.arange(7000, 7000 + n_stations)
+    station_names = [f"Station {i} / Street {i % 97}" for i in range(n_stations)]
+    lat = (43.64 + rng.normal(0, 0.03, n_stations)).astype("float32")
+    lon = (-79.39 + rng.normal(0, 0.05, n_stations)).astype("float32")
+
+    start_station = rng.integers(0, n_stations, n_rows)
+    end_station = rng.integers(0, n_stations, n_rows)
+
+    def names(codes: np.ndarray) -> pd.Categorical:
+        codes = codes.copy()
+        codes[rng.random(n_rows) < 0.02] = -1
+        return pd.Categorical.from_codes(codes, categories=station_names)
+
+    df = pd.DataFrame({
+        "Trip Id": np.arange(1, n_rows + 1),
+        "Trip  Duration": duration_min * 60,
+        "Start Station Id": station_ids[start_station],
+        "Start Time": pd.Categorical.from_codes(start_codes, categories=time_labels),
+        "Start Station Name": names(start_station),
+        "End Station Id": station_ids[end_station],
+        "End Time": pd.Categorical.from_codes(end_codes, categories=time_labels),
+        "End Station Name": names(end_station),
+        "Bike Id": rng.integers(1, n_bikes + 1, n_rows),
+        "User Type": pd.Categorical.from_codes(
+            (rng.random(n_rows) < 0.35).astype("int8"), ["Annual Member", "Casual Member"]
+        ),
+        "Model": pd.Categorical.from_codes(
+            rng.integers(0, 3, n_rows).astype("int8"), ["ICONIC", "EFIT", "EFIT G5"]
+        ),
+        "Start Station Latitude": lat[start_station],
+        "Start Station Longitude": lon[start_station],
+        "End Station Latitude": lat[end_station],
+        "End Station Longitude": lon[end_station],
+    })
+
+    return df.astype({c: t for c, t in RAW_SCHEMA.items() if t != "category"})
+
+
+@lru_cache(maxsize=None)
+def _baseline_module(name: str) -> types.ModuleType:
+    """src/<name>.py as of BASELINE_COMMIT (its only import, utils, is unchanged)."""
+
+    source = subprocess.run(
+        ["git", "show", f"{BASELINE_COMMIT}:src/{name}.py"],
+        cwd=PROJECT_ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    module = types.ModuleType(f"baseline_{name}")
+    exec(compile(source, f"{BASELINE_COMMIT}:src/{name}.py", "exec"), module.__dict__)
+    return module
+
+
+def _baseline_input(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The raw frame typed as the baseline loader (plain pd.read_csv) left it:
+    strings instead of categoricals, 64-bit numbers. Also loads the baseline
+    modules, so neither is timed.
+    """
+
+    for module, _ in BASELINE_STAGES:
+        _baseline_module(module)
+
+    dtypes = {}
+    for col, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtypes[col] = "str"
+        elif dtype.kind == "f" or df[col].isna().any():
+            dtypes[col] = "float64"
+        else:
+            dtypes[col] = "int64"
+    return df.astype(dtypes)
+
+
+def _run_baseline(df: pd.DataFrame) -> pd.DataFrame:
+    for module, stage in BASELINE_STAGES:
+        df = getattr(_baseline_module(module), stage)(df)
+    return df
+
+
+def _run_chain(df: pd.DataFrame) -> pd.DataFrame:
+    # Today's public stage functions, one after another on the whole frame
+    from data_cleaning import (
+        standardize_user_type, group_bike_model, parse_datetime_columns,
+        clean_trip_duration, clean_station_fields,
+    )
+    from feature_engineering import (
+        compute_distance_fields, add_time_features, add_weekend_flag, add_rush_hour_flag,
+    )
+    from station_normalization import normalize_station_fields
+
+    for stage in (
+        standardize_user_type, group_bike_model, parse_datetime_columns,
+        clean_trip_duration, clean_station_fields, normalize_station_fields,
+        compute_distance_fields, add_time_features, add_weekend_flag, add_rush_hour_flag,
+    ):
+        df = stage(df)
+    return df
+
+
+def _run_pipeline(df: pd.DataFrame) -> pd.DataFrame:
+    from pipeline import process_bike_data
+
+    return process_bike_data(df)
+
+
+# baseline: the stages of BASELINE_COMMIT on read_csv-typed input; chain:
+# today's stages one by one; pipeline: the engine in pipeline.run_pipeline
+MODES = {"baseline": _run_baseline, "chain": _run_chain, "pipeline": _run_pipeline}
+# Input preparation per mode, outside the timed region
+MODE_INPUTS = {"baseline": _baseline_input}
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high-water mark (Linux only), so setup is not counted."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and cannot be reset
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_benchmark(mode: str, n_rows: int, seed: int = 0) -> dict:
+    """Time one mode in the current process. Peak RSS is only meaningful in a fresh process."""
+
+    df = make_synthetic_raw_trips(n_rows, seed=seed)
+    if mode in MODE_INPUTS:
+        df = MODE_INPUTS[mode](df)
+    input_mb = df.memory_usage(deep=True).sum() / 1e6
+
+    gc.collect()
+    _reset_peak_rss()
+    rss_before = _peak_rss_mb()
+
+    start = time.perf_counter()
+    result = MODES[mode](df)
+    wall_s = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "rows": n_rows,
+        "wall_s": round(wall_s, 2),
+        "input_mb": round(input_mb, 1),
+        "output_mb": round(result.memory_usage(deep=True).sum() / 1e6, 1),
+        "rss_mb_before_run": round(rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def compare(n_rows: int, modes=("baseline", "chain", "pipeline")) -> list[dict]:
+    """Run each mode in its own interpreter so peak RSS is not shared."""
+
+    results = []
+    for mode in modes:
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--rows", str(n_rows)],
+            check=True, capture_output=True, text=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    # python src/benchmark.py --rows 10000000            (every mode)
+    # python src/benchmark.py --rows 10000000 --mode pipeline
+    parser = argparse.ArgumentParser(description="Pipeline wall time / peak memory benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--mode", choices=sorted(MODES), default=None)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    if args.mode:
+        print(json.dumps(run_benchmark(args.mode, args.rows)))
+    else:
+        for row in compare(args.rows):
+            print(json.dumps(row))
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+BIKE_COL = "Bike Id"
+# Station identity used to link a trip's end to the bike's next start.
+START_STATION_COL = "Start Station Id"
+END_STATION_COL = "End Station Id"
+
+NS_PER_SEC = 1_000_000_000
+NS_PER_DAY = 86_400 * NS_PER_SEC
+
+
+def _int_codes(values: pd.Series) -> np.ndarray:
+    """Integer ids as int64, -1 where missing."""
+    return values.astype("Int64").fillna(-1).to_numpy(dtype="int64")
+
+
+def _station_codes(start: pd.Series, end: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Start/end station codes comparable with each other (-1 where missing)."""
+
+    if pd.api.types.is_integer_dtype(start.dtype) and pd.api.types.is_integer_dtype(end.dtype):
+        return _int_codes(start), _int_codes(end)
+    # names (e.g. the normalized station columns): one shared factorization
+    codes, _ = pd.factorize(pd.concat([start.astype(str).where(start.notna()), end.astype(str).where(end.notna())], ignore_index=True))
+    return codes[:len(start)], codes[len(start):]
+
+
+class BikeChains:
+    """
+    Every bike's trips in start_time order, as flat arrays sorted by
+    (bike, start_time) once, with `offsets` giving each bike's slice:
+    the trips of bike_ids[i] are rows offsets[i]:offsets[i + 1].
+
+    Consecutive trips of a bike are compared with shifted arrays (row i+1
+    against row i where both belong to the same bike), never a per-bike
+    loop. That gives the idle gap between a bike's trips and the
+    "teleports": the bike starts its next trip somewhere other than where
+    its previous trip ended, i.e. it was moved by a rebalancing truck.
+
+        chains = BikeChains.from_frame(df)
+        chains.utilization()            # one row per bike
+        chains.teleports()              # rebalancing moves
+        chains.idle_gaps(min_gap="12h")
+        chains.daily_active_time()      # active seconds per bike and day
+    """
+
+    def __init__(
+        self,
+        bike_ids: np.ndarray,
+        offsets: np.ndarray,
+        start: np.ndarray,
+        end: np.ndarray,
+        start_station: np.ndarray,
+        end_station: np.ndarray,
+    ):
+        self.bike_ids = bike_ids
+        self.offsets = offsets
+        self.start = start
+        self.end = end
+        self.start_station = start_station
+        self.end_station = end_station
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        bike_col: str = BIKE_COL,
+        start_station_col: str = START_STATION_COL,
+        end_station_col: str = END_STATION_COL,
+    ) -> BikeChains:
+        """
+        Chains from a trip table. Trips without a bike id, start or end time
+        are left out; unknown stations are kept but never count as a
+        teleport.
+        """
+
+        bike = _int_codes(df[bike_col])
+        start = df["start_time"].to_numpy(dtype="datetime64[ns]")
+        end = df["end_time"].to_numpy(dtype="datetime64[ns]")
+        start_station, end_station = _station_codes(df[start_station_col], df[end_station_col])
+
+        valid = (bike >= 0) & ~np.isnat(start) & ~np.isnat(end) & (end >= start)
+        if not valid.all():
+            logger.info("Bike chaining: skipped %s trips without bike id or a valid start/end time", int((~valid).sum()))
+        rows = np.flatnonzero(valid)
+        start, end = start[rows].astype("int64"), end[rows].astype("int64")
+
+        # sort by start, then a stable (radix, on small ids) pass by bike
+        order = np.argsort(start)
+        bike_sorted = bike[rows][order]
+        order = order[np.argsort(bike_sorted.astype(np.min_scalar_type(bike_sorted.max(initial=0))), kind="stable")]
+        rows, start, end = rows[order], start[order], end[order]
+        bike_ids, first = np.unique(bike[rows], return_index=True)
+
+        chains = cls(
+            bike_ids,
+            np.append(first, len(rows)),
+            start,
+            end,
+            start_station[rows],
+            end_station[rows],
+        )
+        logger.info("Bike chaining: %s trips over %s bikes", len(rows), len(bike_ids))
+        return chains
+
+    @property
+    def n_trips(self) -> int:
+        return len(self.start)
+
+    @property
+    def trip_bikes(self) -> np.ndarray:
+        """Bike position (into bike_ids) of every trip."""
+        return np.repeat(np.arange(len(self.bike_ids)), np.diff(self.offsets))
+
+    def _links(self) -> np.ndarray:
+        """Rows i whose next row i+1 is the same bike's next trip."""
+        same_bike = np.ones(max(self.n_trips - 1, 0), dtype=bool)
+        same_bike[self.offsets[1:-1] - 1] = False
+        return np.flatnonzero(same_bike)
+
+    def _gap_frame(self, links: np.ndarray) -> pd.DataFrame:
+        nxt = links + 1
+        return pd.DataFrame({
+            "bike_id": self.bike_ids[self.trip_bikes[links]],
+            "end_time": self.end[links].astype("datetime64[ns]"),
+            "next_start_time": self.start[nxt].astype("datetime64[ns]"),
+            "idle_sec": (self.start[nxt] - self.end[links]) / NS_PER_SEC,
+            "end_station": self.end_station[links],
+            "next_start_station": self.start_station[nxt],
+        })
+
+    def idle_gaps(self, min_gap: str | pd.Timedelta = "0s") -> pd.DataFrame:
+        """
+        Time each bike sat between consecutive trips, for gaps of at least
+        `min_gap`. Negative gaps (overlapping trips of one bike) are data
+        errors and are left out.
+        """
+
+        links = self._links()
+        gap = self.start[links + 1] - self.end[links]
+        links = links[(gap >= 0) & (gap >= pd.Timedelta(min_gap).value)]
+        return self._gap_frame(links)
+
+    def teleports(self) -> pd.DataFrame:
+        """Consecutive trips of a bike where it starts at another station than it ended."""
+
+        links = self._links()
+        ended, restarted = self.end_station[links], self.start_station[links + 1]
+        links = links[(ended >= 0) & (restarted >= 0) & (ended != restarted)]
+        return self._gap_frame(links)
+
+    def utilization(self) -> pd.DataFrame:
+        """
+        One row per bike: trips, active time (sum of trip durations), the
+        span from its first start to its last end, idle time between trips,
+        the active share of the span and the number of teleports.
+        """
+
+        n_bikes = len(self.bike_ids)
+        trip_bikes = self.trip_bikes
+        active = np.bincount(trip_bikes, weights=(self.end - self.start) / NS_PER_SEC, minlength=n_bikes)
+
+        links = self._links()
+        gap = (self.start[links + 1] - self.end[links]) / NS_PER_SEC
+        link_bikes = trip_bikes[links]
+        idle = np.bincount(link_bikes, weights=np.maximum(gap, 0), minlength=n_bikes)
+        moved = (
+            (self.end_station[links] >= 0)
+            & (self.start_station[links + 1] >= 0)
+            & (self.end_station[links] != self.start_station[links + 1])
+        )
+
+        # every bike has at least one trip; its span ends with its latest end
+        first = self.offsets[:-1]
+        span = (np.maximum.reduceat(self.end, first) - self.start[first]) / NS_PER_SEC if n_bikes else np.zeros(0)
+
+        return pd.DataFrame(
+            {
+                "trips": np.diff(self.offsets),
+                "active_sec": active,
+                "span_sec": span,
+                "idle_sec": idle,
+                "utilization": np.divide(active, span, out=np.zeros(n_bikes), where=span > 0),
+                "teleports": np.bincount(link_bikes[moved], minlength=n_bikes),
+            },
+            index=pd.Index(self.bike_ids, name="bike_id"),
+        )
+
+    def daily_active_time(self) -> pd.DataFrame:
+        """
+        Seconds each bike spent on trips per calendar day. Trips over
+        midnight are split between the days they cover.
+        """
+
+        first_day = self.start // NS_PER_DAY
+        n_days = self.end // NS_PER_DAY - first_day + 1
+
+        # one piece per (trip, day covered), clipped to that day
+        trip = np.repeat(np.arange(self.n_trips), n_days)
+        day = first_day[trip] + (np.arange(len(trip)) - np.repeat(np.cumsum(n_days) - n_days, n_days))
+        seconds = (
+            np.minimum(self.end[trip], (day + 1) * NS_PER_DAY) - np.maximum(self.start[trip], day * NS_PER_DAY)
+        ) / NS_PER_SEC
+
+        bike = self.trip_bikes[trip]
+        n_day_slots = int(day.max()) + 1 if len(day) else 1
+        cells, cell_ids = np.unique(bike * n_day_slots + day, return_inverse=True)
+        bike, day = np.divmod(cells, n_day_slots)
+
+        return pd.DataFrame({
+            "bike_id": self.bike_ids[bike],
+            "date": (day * NS_PER_DAY).astype("datetime64[ns]"),
+            "active_sec": np.bincount(cell_ids, weights=seconds, minlength=len(cells)),
+        })
+
+    def bike(self, bike_id: int) -> pd.DataFrame:
+        """Trips of one bike, in order."""
+
+        pos = np.searchsorted(self.bike_ids, bike_id)
+        if pos == len(self.bike_ids) or self.bike_ids[pos] != bike_id:
+            raise KeyError(f"Unknown bike: {bike_id!r}")
+        rows = slice(self.offsets[pos], self.offsets[pos + 1])
+        return pd.DataFrame({
+            "start_time": self.start[rows].astype("datetime64[ns]"),
+            "end_time": self.end[rows].astype("datetime64[ns]"),
+            "start_station": self.start_station[rows],
+            "end_station": self.end_station[rows],
+        })
@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Dimensions the dashboard filters trips by
+INDEX_COLUMNS = (
+    "user_type_standardized",
+    "start_weekday",
+    "start_hour",
+    "start_month",
+    "is_weekend",
+    "is_rush_hour",
+    "start_station_normalized",
+    "end_station_normalized",
+)
+
+# A row id costs 32 bits as a position and 1 bit in a bitset, so a bitmap
+# holding fewer than 1/32 of the rows is smaller as a sorted position list
+# (the same container rule Roaring bitmaps use).
+SPARSE_MAX_FRACTION = 1 / 32
+
+# Set bits of every byte value, for numpy < 2 (no np.bitwise_count)
+_BYTE_POPCOUNT = np.unpackbits(np.arange(256, dtype="uint8")[:, None], axis=1).sum(axis=1).astype("uint8")
+
+
+def _popcount(bits: np.ndarray) -> int:
+    """Number of set bits in a uint8 bitset."""
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(bits).sum(dtype="int64"))
+    return int(_BYTE_POPCOUNT[bits].sum(dtype="int64"))
+
+
+class Bitmap:
+    """
+    Set of row ids of an n-row frame, stored either as a packed bitset
+    (1 bit per row) or as sorted int32 positions, whichever is smaller.
+    `&` and `|` pick the cheapest kernel for each pair of containers.
+    """
+
+    __slots__ = ("n_rows", "bits", "positions")
+
+    def __init__(self, n_rows: int, bits: np.ndarray | None = None, positions: np.ndarray | None = None):
+        self.n_rows = n_rows
+        self.bits = bits
+        self.positions = positions
+
+    @classmethod
+    def from_positions(cls, positions: np.ndarray, n_rows: int) -> Bitmap:
+        """Sorted, unique row ids."""
+        if len(positions) < n_rows * SPARSE_MAX_FRACTION:
+            return cls(n_rows, positions=np.asarray(positions, dtype="int32"))
+        mask = np.zeros(n_rows, dtype=bool)
+        mask[positions] = True
+        return cls(n_rows, bits=np.packbits(mask, bitorder="little"))
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> Bitmap:
+        return cls(len(mask), bits=np.packbits(mask, bitorder="little"))._compact()
+
+    @classmethod
+    def empty(cls, n_rows: int) -> Bitmap:
+        return cls(n_rows, positions=np.empty(0, dtype="int32"))
+
+    @classmethod
+    def full(cls, n_rows: int) -> Bitmap:
+        return cls.from_mask(np.ones(n_rows, dtype=bool))
+
+    @property
+    def is_dense(self) -> bool:
+        return self.bits is not None
+
+    @property
+    def nbytes(self) -> int:
+        return (self.bits if self.is_dense else self.positions).nbytes
+
+    def count(self) -> int:
+        if self.is_dense:
+            return _popcount(self.bits)
+        return len(self.positions)
+
+    __len__ = count
+
+    def to_positions(self) -> np.ndarray:
+        if self.is_dense:
+            return np.flatnonzero(np.unpackbits(self.bits, count=self.n_rows, bitorder="little"))
+        return self.positions
+
+    def to_mask(self) -> np.ndarray:
+        if self.is_dense:
+            return np.unpackbits(self.bits, count=self.n_rows, bitorder="little").astype(bool)
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.positions] = True
+        return mask
+
+    def slice(self, lo: int, hi: int) -> Bitmap:
+        """Rows of this bitmap with positions in [lo, hi); touches only that range."""
+
+        if not self.is_dense:
+            a, b = np.searchsorted(self.positions, (lo, hi))
+            return Bitmap(self.n_rows, positions=self.positions[a:b])
+
+        first = lo >> 3
+        window = np.unpackbits(self.bits[first:(hi + 7) >> 3], bitorder="little")
+        positions = np.flatnonzero(window[lo - first * 8:hi - first * 8]) + lo
+        return Bitmap.from_positions(positions, self.n_rows)
+
+    def _dense_bits(self) -> np.ndarray:
+        if self.is_dense:
+            return self.bits
+        return np.packbits(self.to_mask(), bitorder="little")
+
+    def _contains(self, positions: np.ndarray) -> np.ndarray:
+        """Which of `positions` are set in this (dense) bitmap."""
+        return ((self.bits[positions >> 3] >> (positions & 7).astype("uint8")) & 1).astype(bool)
+
+    def _compact(self) -> Bitmap:
+        """Switch a dense result to positions when that is smaller."""
+        if self.is_dense and self.count() < self.n_rows * SPARSE_MAX_FRACTION:
+            return Bitmap(self.n_rows, positions=self.to_positions().astype("int32"))
+        return self
+
+    def _check(self, other: Bitmap) -> None:
+        if self.n_rows != other.n_rows:
+            raise ValueError(f"bitmaps cover different frames ({self.n_rows} vs {other.n_rows} rows)")
+
+    def __and__(self, other: Bitmap) -> Bitmap:
+        self._check(other)
+        if not self.is_dense and not other.is_dense:
+            return Bitmap(self.n_rows, positions=np.intersect1d(self.positions, other.positions, assume_unique=True))
+        if not self.is_dense or not other.is_dense:
+            sparse, dense = (self, other) if not self.is_dense else (other, self)
+            return Bitmap(self.n_rows, positions=sparse.positions[dense._contains(sparse.positions)])
+        return Bitmap(self.n_rows, bits=self.bits & other.bits)._compact()
+
+    def __or__(self, other: Bitmap) -> Bitmap:
+        self._check(other)
+        if not self.is_dense and not other.is_dense:
+            return Bitmap.from_positions(np.union1d(self.positions, other.positions), self.n_rows)
+        return Bitmap(self.n_rows, bits=self._dense_bits() | other._dense_bits())
+
+    def __repr__(self) -> str:
+        kind = "dense" if self.is_dense else "sparse"
+        return f"Bitmap({self.count():,} of {self.n_rows:,} rows, {kind}, {self.nbytes:,} bytes)"
+
+
+class BitmapIndex:
+    """
+    Bitmap per distinct value of each indexed column of a trip frame.
+
+    Filters are answered with bitwise AND across columns and OR across
+    the values of one column; only the selected rows are then taken from
+    the frame. The index keeps a reference to the frame, not a copy.
+
+        index = BitmapIndex(df)
+        index.count(user_type_standardized="Casual", start_hour=(7, 9))
+        index.select(start_weekday=["Saturday", "Sunday"], is_rush_hour=True)
+
+    A filter value may be a scalar, a list/set/range of values, or an
+    inclusive (low, high) tuple over the column's sorted values.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Sequence[str] = INDEX_COLUMNS):
+        self.frame = df
+        self.n_rows = len(df)
+        self.values: dict[str, pd.Index] = {}
+        self.bitmaps: dict[str, list[Bitmap]] = {}
+
+        for col in columns:
+            if col not in df.columns:
+                logger.warning("Column %s not in frame, not indexed", col)
+                continue
+            self.values[col], self.bitmaps[col] = self._index_column(df[col])
+
+        logger.info(
+            "Built bitmap index over %s rows: %s bitmaps, %.1f MB",
+            self.n_rows,
+            sum(len(b) for b in self.bitmaps.values()),
+            self.nbytes / 1e6,
+        )
+
+    def _index_column(self, series: pd.Series) -> tuple[pd.Index, list[Bitmap]]:
+        codes, uniques = pd.factorize(series, sort=True)
+
+        # one stable sort groups the row ids of every value, already in row order
+        order = np.argsort(codes, kind="stable")
+        n_missing = int((codes < 0).sum())
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        groups = np.split(order[n_missing:], np.cumsum(counts)[:-1])
+
+        bitmaps = [Bitmap.from_positions(rows, self.n_rows) for rows in groups]
+        return pd.Index(uniques), bitmaps
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.nbytes for bitmaps in self.bitmaps.values() for b in bitmaps)
+
+    def bitmap(self, column: str, value) -> Bitmap:
+        """Rows where `column` matches `value` (see the class docstring)."""
+
+        if column not in self.bitmaps:
+            raise KeyError(f"'{column}' is not indexed")
+        values = self.values[column]
+
+        if isinstance(value, tuple):
+            low, high = value
+            wanted = np.flatnonzero((values >= low) & (values <= high))
+        elif isinstance(value, (list, set, frozenset, range, pd.Index, np.ndarray)):
+            wanted = values.get_indexer(list(value))
+        else:
+            wanted = values.get_indexer([value])
+        wanted = wanted[wanted >= 0]
+
+        return _union([self.bitmaps[column][i] for i in wanted], self.n_rows)
+
+    def where(
+        self,
+        filters: Mapping[str, object] | None = None,
+        rows: tuple[int, int] | None = None,
+        **kwargs,
+    ) -> Bitmap:
+        """
+        AND of the bitmaps of every filter; all rows when there are none.
+        `rows` restricts the result to positions [lo, hi), e.g. a
+        TimeIndex.day_bounds window of a frame sorted by start_time.
+        """
+
+        filters = {**(filters or {}), **kwargs}
+        # most selective first, so the AND chain shrinks early
+        bitmaps = sorted((self.bitmap(col, value) for col, value in filters.items()), key=len)
+
+        if not bitmaps:
+            lo, hi = rows if rows is not None else (0, self.n_rows)
+            return Bitmap.from_positions(np.arange(lo, hi, dtype="int32"), self.n_rows)
+
+        result = bitmaps[0] if rows is None else bitmaps[0].slice(*rows)
+        for other in bitmaps[1:]:
+            if not len(result):
+                break
+            result = result & other
+        return result
+
+    def count(
+        self,
+        filters: Mapping[str, object] | None = None,
+        rows: tuple[int, int] | None = None,
+        **kwargs,
+    ) -> int:
+        return self.where(filters, rows=rows, **kwargs).count()
+
+    def select(
+        self,
+        filters: Mapping[str, object] | None = None,
+        columns: Sequence[str] | None = None,
+        limit: int | None = None,
+        rows: tuple[int, int] | None = None,
+        **kwargs,
+    ) -> pd.DataFrame:
+        """Matching rows of the indexed frame (the first `limit` of them)."""
+
+        positions = self.where(filters, rows=rows, **kwargs).to_positions()[:limit]
+        frame = self.frame if columns is None else self.frame[list(columns)]
+        return frame.iloc[positions]
+
+
+def _union(bitmaps: Iterable[Bitmap], n_rows: int) -> Bitmap:
+    bitmaps = list(bitmaps)
+    if not bitmaps:
+        return Bitmap.empty(n_rows)
+    if len(bitmaps) == 1:
+        return bitmaps[0]
+    if all(not b.is_dense for b in bitmaps):
+        # disjoint values of one column: a single sort of the concatenation
+        return Bitmap.from_positions(np.sort(np.concatenate([b.positions for b in bitmaps])), n_rows)
+
+    bits = np.zeros((n_rows + 7) // 8, dtype="uint8")
+    for b in bitmaps:
+        if b.is_dense:
+            bits |= b.bits
+        else:
+            positions = b.positions
+            np.bitwise_or.at(bits, positions >> 3, (1 << (positions & 7)).astype("uint8"))
+    return Bitmap(n_rows, bits=bits)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from schema import SEASON_DTYPE, WEEKDAY_DTYPE
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# 7-9 am and 4-6 pm, as used by add_rush_hour_flag
+RUSH_HOURS = (7, 8, 9, 16, 17, 18)
+_RUSH_HOUR_LOOKUP = np.isin(np.arange(24), RUSH_HOURS)
+
+# Meteorological seasons (codes into SEASON_DTYPE), indexed by month 1-12
+_SEASON_BY_MONTH = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype="int8")
+
+
+def _easter_sunday(year: int) -> date:
+    # Anonymous Gregorian algorithm (Meeus/Jones/Butcher)
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def ontario_holidays(year: int) -> dict[date, str]:
+    """
+    Ontario statutory holidays (Employment Standards Act) for `year`.
+
+    Fixed-date holidays that fall on a weekend also mark the substitute
+    weekday off, named "<holiday> (observed)".
+    """
+
+    victoria_day = date(year, 5, 24) - timedelta(days=date(year, 5, 24).weekday())
+    holidays = {
+        date(year, 1, 1): "New Year's Day",
+        _nth_weekday(year, 2, 0, 3): "Family Day",
+        _easter_sunday(year) - timedelta(days=2): "Good Friday",
+        victoria_day: "Victoria Day",
+        date(year, 7, 1): "Canada Day",
+        _nth_weekday(year, 9, 0, 1): "Labour Day",
+        _nth_weekday(year, 10, 0, 2): "Thanksgiving",
+        date(year, 12, 25): "Christmas Day",
+        date(year, 12, 26): "Boxing Day",
+    }
+
+    observed = {}
+    for day, name in holidays.items():
+        if day.weekday() < 5:
+            continue
+        substitute = day + timedelta(days=1)
+        while substitute.weekday() >= 5 or substitute in holidays or substitute in observed:
+            substitute += timedelta(days=1)
+        observed[substitute] = f"{name} (observed)"
+
+    return {**holidays, **observed}
+
+
+def build_calendar_dimension(start, end) -> pd.DataFrame:
+    """
+    One row per hour from floor(start) to floor(end), with every calendar
+    fact trips are analysed by. Row i is the hour `start + i hours`, so
+    trips join to it with integer offsets (see calendar_rows).
+    """
+
+    hours = pd.date_range(pd.Timestamp(start).floor("h"), pd.Timestamp(end).floor("h"), freq="h")
+    days = hours.normalize()
+
+    holidays = {}
+    for year in range(hours.year.min(), hours.year.max() + 1) if len(hours) else ():
+        holidays.update(ontario_holidays(year))
+    holiday_names = pd.Series(pd.Index(days.date).map(holidays), dtype="category")
+
+    iso = hours.isocalendar()
+    weekday = hours.weekday.to_numpy()
+    hour = hours.hour.to_numpy()
+
+    calendar = pd.DataFrame({
+        "hour_start": hours,
+        "date_key": (hours.year * 10000 + hours.month * 100 + hours.day).astype("int32"),
+        "hour": hour.astype("int8"),
+        "day": hours.day.astype("int8"),
+        "month": hours.month.astype("int8"),
+        "year": hours.year.astype("int16"),
+        "weekday": pd.Categorical.from_codes(weekday, dtype=WEEKDAY_DTYPE),
+        "iso_year": iso["year"].to_numpy(dtype="int16"),
+        "iso_week": iso["week"].to_numpy(dtype="int8"),
+        "is_weekend": weekday >= 5,
+        "is_rush_hour": _RUSH_HOUR_LOOKUP[hour],
+        "is_holiday": holiday_names.notna().to_numpy(),
+        "holiday_name": holiday_names.array,
+        "season": pd.Categorical.from_codes(_SEASON_BY_MONTH[hours.month.to_numpy()], dtype=SEASON_DTYPE),
+    })
+    calendar["is_workday"] = ~(calendar["is_weekend"] | calendar["is_holiday"])
+
+    return calendar
+
+
+def calendar_rows(times: pd.Series) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Calendar covering `times` plus each timestamp's row in it (-1 for NaT).
+
+    The row is the whole number of hours since the first hour, i.e. an
+    integer key computed with array arithmetic instead of .dt accessors.
+    """
+
+    values = times.to_numpy()
+    if values.dtype.kind != "M":
+        values = pd.to_datetime(times).to_numpy()
+
+    # whole hours since the epoch, straight from the int64 representation
+    unit = np.datetime_data(values.dtype)[0]
+    ticks = values.view("int64")
+    missing = np.isnat(values)
+    if missing.all():
+        raise ValueError("cannot build a calendar from all-NaT timestamps")
+
+    rows = ticks // (np.timedelta64(1, "h") // np.timedelta64(1, unit))
+    first = rows[~missing].min() if missing.any() else rows.min()
+    last = rows[~missing].max() if missing.any() else rows.max()
+    rows -= first
+    rows[missing] = -1
+
+    first, last = np.datetime64(int(first), "h"), np.datetime64(int(last), "h")
+    return build_calendar_dimension(first, last), rows
+
+
+def gather_calendar(
+    calendar: pd.DataFrame,
+    rows: np.ndarray,
+    columns,
+    index: pd.Index | None = None,
+) -> pd.DataFrame:
+    """
+    Per-trip calendar fields: a positional take per column. NaT rows get
+    missing values (False for flags).
+    """
+
+    missing = rows < 0
+    safe_rows = np.where(missing, 0, rows)
+
+    out = {}
+    for col in columns:
+        values = calendar[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy().take(safe_rows)
+            codes[missing] = -1
+            out[col] = pd.Categorical.from_codes(codes, dtype=values.dtype)
+        elif values.dtype == bool:
+            out[col] = values.to_numpy().take(safe_rows) & ~missing
+        else:
+            gathered = pd.Series(values.to_numpy().take(safe_rows), index=index)
+            out[col] = gathered.mask(missing) if missing.any() else gathered
+
+    return pd.DataFrame(out, index=index)
+
+
+def is_rush_hour(hour: pd.Series) -> np.ndarray:
+    """Rush-hour flag through the 24-entry hour table; missing hours are False."""
+    hours = hour.to_numpy(dtype="float64", na_value=np.nan)
+    valid = (hours >= 0) & (hours < 24)
+    return valid & _RUSH_HOUR_LOOKUP.take(np.where(valid, hours, 0).astype("int64"))
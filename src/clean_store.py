@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_loader import CLEAN_DATA_DIR
+from time_index import TIME_INDEX_COLUMN, sort_by_time
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Columnar replacement for toronto-bike-clean.csv. Parquet keeps datetimes,
+# categoricals, bools and numeric dtypes, so nothing is re-parsed on load.
+# Rows are stored in start_time order (see time_index.TimeIndex), which the
+# footer records under SORTED_METADATA_KEY.
+CLEAN_STORE_FILENAME = "toronto-bike-clean.parquet"
+SORTED_METADATA_KEY = "clean_store.sorted_by_time"
+# Rows held in memory, over all row groups, while merging them into order
+MERGE_BUFFER_ROWS = 1 << 20
+
+
+def clean_store_path(filename: str = CLEAN_STORE_FILENAME) -> Path:
+    return CLEAN_DATA_DIR / filename
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    # The index is never meaningful here and would break chunk appends.
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Categorical code width depends on the number of categories (int8 for a
+    # handful of stations, int16 for a full year). Widen to int32 so chunks
+    # and partitions always share one Arrow schema.
+    fields = [
+        pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type, f.type.ordered), f.nullable)
+        if pa.types.is_dictionary(f.type) else f
+        for f in table.schema
+    ]
+    schema = pa.schema(fields, metadata=table.schema.metadata)
+
+    return table if schema.equals(table.schema) else table.cast(schema)
+
+
+def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """`table` in the store's schema: columns it lacks are added as nulls, extra ones dropped."""
+    missing = [f for f in schema if f.name not in table.column_names]
+    if missing:
+        logger.warning("Chunk has no %s columns; writing them as nulls", [f.name for f in missing])
+        for field in missing:
+            table = table.append_column(field.name, pa.nulls(len(table), type=field.type))
+    return table.select(schema.names).cast(schema)
+
+
+def _time_keys(table: pa.Table | pa.RecordBatch) -> np.ndarray:
+    """start_time as int64 sort keys, NaT last."""
+    values = table.column(TIME_INDEX_COLUMN).to_numpy(zero_copy_only=False)
+    keys = values.astype("int64")
+    keys[np.isnat(values)] = np.iinfo("int64").max
+    return keys
+
+
+def _merge_row_groups(source: Path, dest: Path) -> None:
+    """
+    Rewrite `source`, whose row groups are each sorted by start_time, as one
+    sorted file: a k-way merge that holds about MERGE_BUFFER_ROWS rows.
+
+    Every round emits, from each row group's buffer, the rows up to the
+    smallest last key among the buffers; no later row can sort before them.
+    """
+
+    parquet = pq.ParquetFile(source)
+    n_groups = parquet.num_row_groups
+    batch_size = max(MERGE_BUFFER_ROWS // max(n_groups, 1), 1024)
+    runs = [parquet.iter_batches(batch_size=batch_size, row_groups=[i]) for i in range(n_groups)]
+    buffers: list[tuple[pa.Table, np.ndarray] | None] = [None] * n_groups
+
+    def refill(i: int) -> None:
+        buffers[i] = None
+        for batch in runs[i]:
+            if batch.num_rows:
+                buffers[i] = (pa.Table.from_batches([batch]), _time_keys(batch))
+                return
+
+    for i in range(n_groups):
+        refill(i)
+
+    with pq.ParquetWriter(dest, parquet.schema_arrow) as writer:
+        while live := [i for i in range(n_groups) if buffers[i] is not None]:
+            cutoff = min(buffers[i][1][-1] for i in live)
+            pieces, keys = [], []
+            for i in live:
+                table, group_keys = buffers[i]
+                n = int(np.searchsorted(group_keys, cutoff, side="right"))
+                pieces.append(table.slice(0, n))
+                keys.append(group_keys[:n])
+                if n == len(group_keys):
+                    refill(i)
+                else:
+                    buffers[i] = (table.slice(n), group_keys[n:])
+
+            order = np.argsort(np.concatenate(keys), kind="stable")
+            writer.write_table(pa.concat_tables(pieces).take(order))
+        writer.add_key_value_metadata({SORTED_METADATA_KEY: "true"})
+
+
+def write_clean_store(df: pd.DataFrame, filename: str = CLEAN_STORE_FILENAME) -> Path:
+    """Write the whole frame, sorted by start_time, replacing any previous version."""
+    with CleanStoreWriter(filename) as writer:
+        writer.write(df)
+    return writer.path
+
+
+class CleanStoreWriter:
+    """
+    Append DataFrame chunks to a single Parquet file, one row group per chunk.
+    Each chunk is sorted by start_time, so the store is globally sorted when
+    chunks arrive in time order (one CSV streamed in order, monthly files).
+    The writer checks that as it goes; when chunks overlap in time, close()
+    merges the row groups into order once, so readers never sort the store.
+
+    Data goes to a temporary file that replaces the store on a clean close,
+    so readers never see a half-written store.
+    """
+
+    def __init__(self, filename: str = CLEAN_STORE_FILENAME):
+        self.path = clean_store_path(filename)
+        self._tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self._writer: pq.ParquetWriter | None = None
+        self.rows_written = 0
+        self.sorted_by_time = True
+        self._last_time = None
+        self._seen_nat = False
+
+    def __enter__(self) -> "CleanStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(commit=exc_type is None)
+
+    def write(self, df: pd.DataFrame) -> None:
+        df = sort_by_time(df)
+        self._track_order(df)
+        table = _to_table(df)
+
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self._tmp_path, table.schema)
+        elif not table.schema.equals(self._writer.schema, check_metadata=False):
+            # e.g. categorical index width changing between chunks
+            table = _conform(table, self._writer.schema)
+
+        self._writer.write_table(table)
+        self.rows_written += len(df)
+
+    def _track_order(self, df: pd.DataFrame) -> None:
+        """Clear sorted_by_time once a chunk starts before the end of the previous ones."""
+        if not len(df):
+            return
+        if TIME_INDEX_COLUMN not in df.columns:
+            self.sorted_by_time = False
+            return
+
+        times = df[TIME_INDEX_COLUMN].to_numpy()
+        n_valid = len(times) - int(np.isnat(times).sum())
+        if n_valid:
+            # NaT rows sit at the end of each chunk, so earlier NaTs break the order
+            if self._seen_nat or (self._last_time is not None and times[0] < self._last_time):
+                self.sorted_by_time = False
+            self._last_time = times[n_valid - 1]
+        self._seen_nat |= n_valid < len(times)
+
+    def close(self, commit: bool = True) -> None:
+        if self._writer is None:
+            return
+
+        has_time = TIME_INDEX_COLUMN in self._writer.schema.names
+        if self.sorted_by_time or not has_time:
+            self._writer.add_key_value_metadata({SORTED_METADATA_KEY: str(self.sorted_by_time).lower()})
+        self._writer.close()
+        self._writer = None
+
+        if not commit:
+            self._tmp_path.unlink(missing_ok=True)
+            return
+
+        if not self.sorted_by_time and has_time:
+            logger.info("Chunks of %s overlap in time; merging them into start_time order", self.path)
+            merged_path = self.path.with_name(self.path.name + ".merge.tmp")
+            try:
+                _merge_row_groups(self._tmp_path, merged_path)
+            except BaseException:
+                merged_path.unlink(missing_ok=True)
+                self._tmp_path.unlink(missing_ok=True)
+                raise
+            merged_path.replace(self._tmp_path)
+
+        self._tmp_path.replace(self.path)
+        logger.info("Saved %s rows to clean store %s", self.rows_written, self.path)
+
+
+def clean_store_columns(filename: str = CLEAN_STORE_FILENAME) -> list[str]:
+    """Column names in the store, read from the footer only."""
+    return pq.read_schema(clean_store_path(filename)).names
+
+
+def clean_store_is_sorted(filename: str = CLEAN_STORE_FILENAME) -> bool:
+    """Whether the store is recorded as in start_time order (footer only; older stores have no flag)."""
+    metadata = pq.read_metadata(clean_store_path(filename)).metadata or {}
+    return metadata.get(SORTED_METADATA_KEY.encode()) == b"true"
+
+
+def read_clean_store(
+    filename: str = CLEAN_STORE_FILENAME,
+    columns: Sequence[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Load the clean store. With `columns`, only those columns are read from disk;
+    names missing from the store are skipped with a warning. Rows come back in
+    start_time order; only stores written before the footer flag are sorted here.
+    """
+
+    path = clean_store_path(filename)
+    if not path.exists():
+        raise FileNotFoundError(f"Clean store not found: {path}")
+
+    if columns is not None:
+        available = set(clean_store_columns(filename))
+        missing = [c for c in columns if c not in available]
+        if missing:
+            logger.warning("Columns not in clean store, skipped: %s", missing)
+        columns = [c for c in columns if c in available]
+
+    df = pd.read_parquet(path, columns=columns)
+    if TIME_INDEX_COLUMN in df.columns and not clean_store_is_sorted(filename):
+        df = sort_by_time(df)
+    logger.info("Loaded clean store %s with shape %s", path, df.shape)
+
+    return df
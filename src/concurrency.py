@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Hashable, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Slices trips in progress are tracked for; () is the whole fleet.
+CONCURRENCY_SLICES: dict[str, tuple[str, ...]] = {
+    "all": (),
+    "user_type": ("user_type_standardized",),
+    "bike_model": ("bike_model_group",),
+    "start_station": ("start_station_normalized",),
+}
+
+MINUTES_PER_DAY = 24 * 60
+
+# An event key packs the slice id above the minute (minutes since the epoch
+# fit in 32 bits until the year 10136).
+_MINUTE_BITS = 32
+
+
+def _trip_minutes(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    First and one-past-last minute (since the epoch) of every trip, and the
+    rows that have both. A trip covers [floor(start), ceil(end)), at least
+    one minute, so a trip that starts and ends in the same minute counts.
+    """
+
+    start = df["start_time"].to_numpy(dtype="datetime64[ns]")
+    end = df["end_time"].to_numpy(dtype="datetime64[ns]")
+    valid = ~np.isnat(start) & ~np.isnat(end) & (end >= start)
+
+    first = start[valid].astype("datetime64[m]")
+    last = end[valid].astype("datetime64[m]")
+    last = last + (last < end[valid]).astype("timedelta64[m]")
+    first, last = first.astype("int64"), last.astype("int64")
+    return first, np.maximum(last, first + 1), valid
+
+
+class TripsInProgress:
+    """
+    Number of trips in progress (bikes out) over time, per slice of `by`,
+    at minute resolution.
+
+    Every trip is a +1 event at its start minute and a -1 event at its end
+    minute. Events are kept as sorted (slice, minute) keys with their net
+    change, and the count in progress is their running sum, so the cost
+    is O(n log n) in trips and nothing is scanned minute by minute.
+    Chunks are folded in with `update` (or whole counters with `merge`);
+    only the distinct (slice, minute) events are kept between chunks.
+
+        counter = TripsInProgress(by="user_type_standardized")
+        for chunk in chunks:
+            counter.update(chunk)
+        counter.daily_peaks()
+        counter.series("Casual", "2024-07-01", "2024-07-02")
+    """
+
+    def __init__(self, by: str | Sequence[str] = ()):
+        self.by = (by,) if isinstance(by, str) else tuple(by)
+        self.slices: list[tuple] = [] if self.by else [()]
+        self._slice_ids: dict[tuple, int] = {} if self.by else {(): 0}
+        self._keys = np.empty(0, dtype="int64")
+        self._deltas = np.empty(0, dtype="int64")
+        self._levels: np.ndarray | None = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, by: str | Sequence[str] = ()) -> TripsInProgress:
+        return cls(by).update(df)
+
+    def _slice_id(self, key: tuple) -> int:
+        if key not in self._slice_ids:
+            self._slice_ids[key] = len(self.slices)
+            self.slices.append(key)
+        return self._slice_ids[key]
+
+    def _slice_codes(self, df: pd.DataFrame) -> np.ndarray:
+        """Slice id per row (-1 for missing keys), registering new slices."""
+
+        if not self.by:
+            return np.zeros(len(df), dtype="int64")
+        groups = df.groupby(list(self.by), observed=True, sort=False)
+        local = groups.ngroup().fillna(-1).to_numpy(dtype="int64")
+        ids = [
+            self._slice_id(key if isinstance(key, tuple) else (key,))
+            for key in groups.size().index
+        ]
+        # the trailing -1 maps rows with a missing key (local -1) to -1
+        return np.append(np.asarray(ids, dtype="int64"), -1)[local]
+
+    def update(self, df: pd.DataFrame) -> TripsInProgress:
+        first, last, valid = _trip_minutes(df)
+        codes = self._slice_codes(df)[valid]
+        keep = codes >= 0
+        if (~valid).any() or not keep.all():
+            logger.info(
+                "Trips in progress: skipped %s trips without start/end time or slice key",
+                int((~valid).sum() + (~keep).sum()),
+            )
+
+        slice_bits = codes[keep] << _MINUTE_BITS
+        self._add_events(
+            np.concatenate([slice_bits | first[keep], slice_bits | last[keep]]),
+            np.concatenate([np.ones(keep.sum(), "int64"), -np.ones(keep.sum(), "int64")]),
+        )
+        return self
+
+    def merge(self, other: TripsInProgress) -> TripsInProgress:
+        if other.by != self.by:
+            raise ValueError(f"cannot merge counters sliced by {self.by} and {other.by}")
+        ids = np.asarray([self._slice_id(key) for key in other.slices], dtype="int64")
+        slice_ids = ids[other._keys >> _MINUTE_BITS]
+        minutes = other._keys & ((1 << _MINUTE_BITS) - 1)
+        self._add_events((slice_ids << _MINUTE_BITS) | minutes, other._deltas)
+        return self
+
+    def _add_events(self, keys: np.ndarray, deltas: np.ndarray) -> None:
+        # net change per distinct (slice, minute), in sorted key order
+        keys, inverse = np.unique(np.concatenate([self._keys, keys]), return_inverse=True)
+        deltas = np.bincount(inverse, weights=np.concatenate([self._deltas, deltas])).astype("int64")
+        nonzero = deltas != 0
+        self._keys, self._deltas = keys[nonzero], deltas[nonzero]
+        self._levels = None
+
+    @property
+    def levels(self) -> np.ndarray:
+        """Trips in progress from each event on. Every slice's changes sum
+        to zero, so one running sum restarts at 0 for each slice."""
+        if self._levels is None:
+            self._levels = np.cumsum(self._deltas)
+        return self._levels
+
+    def _slice_events(self, key: Hashable | tuple | None) -> tuple[np.ndarray, np.ndarray]:
+        """Event minutes and levels of one slice."""
+
+        if key is None and not self.by:
+            key = ()
+        key = key if isinstance(key, tuple) else (key,)
+        if key not in self._slice_ids:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="int64")
+        slice_id = self._slice_ids[key]
+        lo, hi = np.searchsorted(self._keys >> _MINUTE_BITS, [slice_id, slice_id + 1])
+        return self._keys[lo:hi] & ((1 << _MINUTE_BITS) - 1), self.levels[lo:hi]
+
+    def at(self, times, key: Hashable | tuple | None = None) -> np.ndarray:
+        """Trips in progress at each of `times` (floored to the minute)."""
+
+        minutes, levels = self._slice_events(key)
+        query = pd.DatetimeIndex(np.atleast_1d(times)).to_numpy(dtype="datetime64[m]").astype("int64")
+        idx = np.searchsorted(minutes, query, side="right") - 1
+        return np.where(idx >= 0, levels[np.maximum(idx, 0)] if len(levels) else 0, 0)
+
+    def series(self, key: Hashable | tuple | None = None, start=None, end=None) -> pd.Series:
+        """
+        Trips in progress for every minute in [start, end) (default: the
+        slice's whole span) as a Series on a 1-minute DatetimeIndex.
+        """
+
+        minutes, _ = self._slice_events(key)
+        if start is None and end is None and not len(minutes):
+            return pd.Series(dtype="int64", name="trips_in_progress")
+        start = pd.Timestamp(start) if start is not None else pd.Timestamp(minutes[0], unit="m")
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp(minutes[-1], unit="m")
+        index = pd.date_range(start.floor("min"), end, freq="min", inclusive="left")
+        return pd.Series(self.at(index, key), index=index, name="trips_in_progress")
+
+    def daily_peaks(self) -> pd.DataFrame:
+        """
+        Peak trips in progress per slice and day, with the first minute it
+        was reached. Trips still out at midnight count towards the next
+        day. Days without any start or end in the slice are not listed.
+        """
+
+        columns = [*self.by, "date", "peak_trips_in_progress", "peak_time"]
+        if not len(self._keys):
+            return pd.DataFrame(columns=columns)
+
+        keys, levels = self._keys, self.levels
+        slices = keys >> _MINUTE_BITS
+        minutes = keys & ((1 << _MINUTE_BITS) - 1)
+        days = minutes // MINUTES_PER_DAY
+
+        # the level carried into a slice's first event of a day (from the
+        # event before it) is a candidate at midnight, unless that event is
+        # at midnight itself and already sets the level there
+        first_of_day = np.r_[True, (slices[1:] != slices[:-1]) | (days[1:] != days[:-1])]
+        carried = np.flatnonzero(
+            first_of_day & np.r_[False, slices[1:] == slices[:-1]] & (minutes % MINUTES_PER_DAY != 0)
+        )
+
+        cand_slice = np.concatenate([slices, slices[carried]])
+        cand_day = np.concatenate([days, days[carried]])
+        cand_time = np.concatenate([minutes, days[carried] * MINUTES_PER_DAY])
+        cand_level = np.concatenate([levels, levels[carried - 1]])
+
+        # highest level per (slice, day), earliest minute on ties
+        order = np.lexsort((cand_time, -cand_level, cand_day, cand_slice))
+        s, d = cand_slice[order], cand_day[order]
+        best = order[np.r_[True, (s[1:] != s[:-1]) | (d[1:] != d[:-1])]]
+
+        peaks = pd.DataFrame({
+            "date": pd.to_datetime(cand_day[best] * MINUTES_PER_DAY, unit="m"),
+            "peak_trips_in_progress": cand_level[best],
+            "peak_time": pd.to_datetime(cand_time[best], unit="m"),
+        })
+        for i, col in enumerate(self.by):
+            peaks.insert(i, col, [self.slices[slice_id][i] for slice_id in cand_slice[best]])
+        return peaks.sort_values(columns[:len(self.by) + 1], kind="stable", ignore_index=True)
+
+
+def build_concurrency_profiles(
+    df: pd.DataFrame,
+    slices: Mapping[str, Sequence[str]] = CONCURRENCY_SLICES,
+) -> dict[str, TripsInProgress]:
+    """A TripsInProgress counter per entry of `slices` (fleet, user type, bike model, station)."""
+    return {name: TripsInProgress.from_frame(df, by) for name, by in slices.items()}
+
+
+def save_trips_in_progress(counter: TripsInProgress, out_dir: Path) -> Path:
+    """
+    Write a counter's events (and its slice labels, in slice-id order) to
+    `out_dir`, to be merged later with the counters of other partitions.
+    """
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({"key": counter._keys, "delta": counter._deltas}).to_parquet(out_dir / "events.parquet", index=False)
+    if counter.by:
+        pd.DataFrame(counter.slices, columns=list(counter.by)).to_parquet(out_dir / "slices.parquet", index=False)
+    with open(out_dir / "trips_in_progress.json", "w") as fh:
+        json.dump({"by": list(counter.by)}, fh)
+    return out_dir
+
+
+def load_trips_in_progress(in_dir: Path) -> TripsInProgress:
+    with open(in_dir / "trips_in_progress.json") as fh:
+        counter = TripsInProgress(json.load(fh)["by"])
+
+    if counter.by:
+        for key in pd.read_parquet(in_dir / "slices.parquet").itertuples(index=False, name=None):
+            counter._slice_id(key)
+    events = pd.read_parquet(in_dir / "events.parquet")
+    counter._keys = events["key"].to_numpy(dtype="int64")
+    counter._deltas = events["delta"].to_numpy(dtype="int64")
+    return counter
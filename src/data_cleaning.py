@@ -1,16 +1,24 @@
 from __future__ import annotations
 
 from typing import Literal
+import numpy as np
 import pandas as pd
 
+from schema import USER_TYPE_DTYPE, apply_schema
+from station_dimension import build_station_dimension, merge_station_dimensions
 from utils import get_logger
 
 logger = get_logger(__name__)
 
+# Timestamp layout of the raw files, e.g. '08/01/2024 03:14'
+RAW_DATETIME_FORMAT = "%m/%d/%Y %H:%M"
+
 
 def standardize_user_type(df: pd.DataFrame) -> pd.DataFrame:
 
-    df = df.copy()
+    # Stages only add or replace whole columns, so a shallow copy is enough
+    # to leave the caller's frame untouched (see pipeline.run_pipeline).
+    df = df.copy(deep=False)
 
     mapping = {
         "Casual Member": "Casual",
@@ -20,6 +28,7 @@ def standardize_user_type(df: pd.DataFrame) -> pd.DataFrame:
     df["user_type_standardized"] = (
         df["User Type"]
         .map(mapping)
+        .astype(USER_TYPE_DTYPE)
         .fillna("Unknown")
     )
 
@@ -30,7 +39,7 @@ def standardize_user_type(df: pd.DataFrame) -> pd.DataFrame:
 
 def group_bike_model(df: pd.DataFrame) -> pd.DataFrame:
    
-    df = df.copy()
+    df = df.copy(deep=False)
 
     def map_model(x):
         if pd.isna(x):
@@ -47,29 +56,51 @@ def group_bike_model(df: pd.DataFrame) -> pd.DataFrame:
             return "Unknown"
 
     df["bike_model_group"] = df["Model"].apply(map_model)
+    df = apply_schema(df, ["bike_model_group"])
 
     logger.info("Grouped bike models. Value counts:\n%s", df["bike_model_group"].value_counts())
 
     return df
+def to_datetime_unique(series: pd.Series, format: str | None = None) -> pd.Series:
+    """
+    pd.to_datetime that parses each distinct string once.
+
+    Trip timestamps have minute resolution, so a year of trips holds only
+    ~500k distinct values. The strings are factorized (or the categorical
+    codes reused), the uniques parsed, and the result gathered back through
+    the codes. Unparseable values become NaT, as with errors="coerce".
+    """
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+
+    if len(uniques) == 0:
+        return pd.Series(pd.NaT, index=series.index, name=series.name, dtype="datetime64[ns]")
+
+    parsed = pd.to_datetime(uniques, format=format, errors="coerce").to_numpy()
+
+    values = parsed.take(codes)
+    values[codes < 0] = np.datetime64("NaT")
+
+    return pd.Series(values, index=series.index, name=series.name)
+
+
 def parse_datetime_columns(df: pd.DataFrame) -> pd.DataFrame:
  
     # Parse 'Start Time' and 'End Time' into pandas datetime.
 
     # Assumes format MM/DD/YYYY HH:MM, e.g. '08/01/2024 03:14'.
 
-    df = df.copy()
+    df = df.copy(deep=False)
 
-    df["start_time"] = pd.to_datetime(
-        df["Start Time"],
-        format="%m/%d/%Y %H:%M",
-        errors="coerce",
-    )
-
-    df["end_time"] = pd.to_datetime(
-        df["End Time"],
-        format="%m/%d/%Y %H:%M",
-        errors="coerce",
-    )
+    df["start_time"] = to_datetime_unique(df["Start Time"], format=RAW_DATETIME_FORMAT)
+    df["end_time"] = to_datetime_unique(df["End Time"], format=RAW_DATETIME_FORMAT)
 
     # Basic logging / sanity check
     n_start_nat = df["start_time"].isna().sum()
@@ -96,7 +127,7 @@ def parse_datetime_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 def clean_trip_duration(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = df.copy(deep=False)
 
     # Compute duration from timestamps (in seconds)
     df["computed_duration_sec"] = (
@@ -105,16 +136,12 @@ def clean_trip_duration(df: pd.DataFrame) -> pd.DataFrame:
 
     raw = df["Trip  Duration"]
 
-    # Start from the raw duration as the base
-    df["trip_duration_clean"] = raw
-
     # Identify rows with invalid raw duration 
     mask_invalid = (raw <= 0) | raw.isna()
 
-    #Replace invalid raw duration with computed duration
-    df.loc[mask_invalid, "trip_duration_clean"] = df.loc[
-        mask_invalid, "computed_duration_sec"
-    ]
+    # Start from the raw duration, replacing invalid values with the computed one
+    df["trip_duration_clean"] = raw.where(~mask_invalid, df["computed_duration_sec"])
+    df = apply_schema(df, ["computed_duration_sec", "trip_duration_clean"])
 
     logger.info(
         "Trip duration cleaning summary:\n"
@@ -126,42 +153,62 @@ def clean_trip_duration(df: pd.DataFrame) -> pd.DataFrame:
     )
 
     return df
-def clean_station_fields(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+def _fill_station_names(names: pd.Series, ids: pd.Series, lookup: pd.Series) -> tuple[pd.Series, int]:
+    """
+    Fill missing names from the id -> name lookup; ids unknown to the lookup
+    get "Unknown Station <id>". Only the missing rows are touched.
+    """
+
+    result = names.astype(object)
+    missing = result.isna()
+    n_unresolved = 0
+
+    if missing.any():
+        missing_ids = ids[missing]
+        filled = missing_ids.map(lookup)
+        unresolved = filled.isna()
+        n_unresolved = int(unresolved.sum())
+
+        fallback = ("Unknown Station " + missing_ids.astype(str)).where(
+            missing_ids.notna(), "Unknown Station"
+        )
+        result[missing] = filled.where(~unresolved, fallback)
 
-    # Build lookup 
-    start_lookup = (
-        df.dropna(subset=["Start Station Name"])
-          .drop_duplicates(subset=["Start Station Id"])[["Start Station Id", "Start Station Name"]]
-          .set_index("Start Station Id")["Start Station Name"]
-          .to_dict()
-    )
+    return result, n_unresolved
 
-    end_lookup = (
-        df.dropna(subset=["End Station Name"])
-          .drop_duplicates(subset=["End Station Id"])[["End Station Id", "End Station Name"]]
-          .set_index("End Station Id")["End Station Name"]
-          .to_dict()
-    )
+
+def clean_station_fields(
+    df: pd.DataFrame,
+    station_dim: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """
+    Fill missing start/end station names from their station ids.
+
+    The id -> name lookup is learned from this frame (start and end columns
+    together). `station_dim` (see station_dimension.py) supplies names for
+    ids this frame never names, e.g. stations learned from earlier months.
+    """
+
+    df = df.copy(deep=False)
+
+    # Build lookup 
+    lookup = build_station_dimension(df)
+    if station_dim is not None:
+        lookup = merge_station_dimensions(lookup, station_dim)
+    names = lookup["station_name"].dropna()
 
     missing_start_before = df["Start Station Name"].isna().sum()
     missing_end_before = df["End Station Name"].isna().sum()
 
     # Fill missing names 
-    df["start_station_name_clean"] = df.apply(
-        lambda row: start_lookup.get(row["Start Station Id"], f"Unknown Station {row['Start Station Id']}")
-        if pd.isna(row["Start Station Name"]) else row["Start Station Name"],
-        axis=1
+    df["start_station_name_clean"], missing_start_after = _fill_station_names(
+        df["Start Station Name"], df["Start Station Id"], names
     )
-
-    df["end_station_name_clean"] = df.apply(
-        lambda row: end_lookup.get(row["End Station Id"], f"Unknown Station {row['End Station Id']}")
-        if pd.isna(row["End Station Name"]) else row["End Station Name"],
-        axis=1
+    df["end_station_name_clean"], missing_end_after = _fill_station_names(
+        df["End Station Name"], df["End Station Id"], names
     )
 
-    missing_start_after = df["start_station_name_clean"].eq("Unknown Station").sum()
-    missing_end_after = df["end_station_name_clean"].eq("Unknown Station").sum()
+    df = apply_schema(df, ["start_station_name_clean", "end_station_name_clean"])
 
     logger.info(
         "Station field cleaning summary:\n"
@@ -176,4 +223,3 @@ def clean_station_fields(df: pd.DataFrame) -> pd.DataFrame:
     )
 
     return df
-
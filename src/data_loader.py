@@ -1,6 +1,10 @@
+import glob
 from pathlib import Path
+from typing import Iterator, Sequence
+
 import pandas as pd
 
+from schema import canonical_column_mapping, raw_read_dtypes
 from utils import get_logger
 
 
@@ -9,11 +13,16 @@ DATA_DIR = PROJECT_ROOT / "data"
 RAW_DATA_DIR = DATA_DIR / "raw"
 CLEAN_DATA_DIR = DATA_DIR / "clean" 
 
-logger = get_logger(__name__)
+# Rows per chunk in streaming mode. ~250k trips keeps every stage well under 1 GB.
+DEFAULT_CHUNKSIZE = 250_000
 
+# read_csv options that change how the header row is parsed
+_HEADER_OPTIONS = ("sep", "delimiter", "encoding", "encoding_errors", "header", "skiprows", "names")
+
+logger = get_logger(__name__)
 
-def load_bike_data(filename: str, **kwargs) -> pd.DataFrame:
 
+def _raw_file_path(filename: str) -> Path:
     file_path = RAW_DATA_DIR / filename
 
     if not file_path.exists():
@@ -22,12 +31,81 @@ def load_bike_data(filename: str, **kwargs) -> pd.DataFrame:
             f"Expected inside: {RAW_DATA_DIR}"
         )
 
+    return file_path
+
+
+def resolve_raw_files(files: str | Path | Sequence[str | Path]) -> list[Path]:
+    """
+    Turn a filename, a glob pattern or a list of filenames (relative to
+    RAW_DATA_DIR, or absolute) into a sorted list of existing paths.
+    """
+
+    if isinstance(files, (str, Path)):
+        pattern = str(files)
+        if glob.has_magic(pattern):
+            paths = sorted(Path(p) for p in glob.glob(str(RAW_DATA_DIR / pattern)))
+            if not paths:
+                raise FileNotFoundError(
+                    f"No files match {pattern!r}\n"
+                    f"Expected inside: {RAW_DATA_DIR}"
+                )
+            return paths
+        files = [files]
+
+    return sorted(_raw_file_path(f) for f in files)
+
+
+def _read_options(file_path: Path, kwargs: dict) -> tuple[dict, dict[str, str]]:
+    """
+    Peek at the header so compact dtypes can be keyed by this file's own
+    spelling, and return the renames to canonical column names.
+    """
+
+    header_kwargs = {k: v for k, v in kwargs.items() if k in _HEADER_OPTIONS}
+    header = pd.read_csv(file_path, nrows=0, **header_kwargs)
+    # Compact dtypes from schema.RAW_SCHEMA unless the caller overrides them
+    kwargs.setdefault("dtype", raw_read_dtypes(header.columns))
+
+    return kwargs, canonical_column_mapping(header.columns)
+
+
+def load_bike_data(filename: str, **kwargs) -> pd.DataFrame:
+
+    file_path = _raw_file_path(filename)
+    kwargs, renames = _read_options(file_path, kwargs)
+
     logger.info("Loading bike data from %s", file_path)
-    df = pd.read_csv(file_path, **kwargs)
+    df = pd.read_csv(file_path, **kwargs).rename(columns=renames)
     logger.info("Loaded dataset with shape %s rows x %s columns", df.shape[0], df.shape[1])
 
     return df
 
+
+def iter_bike_data_chunks(
+    filename: str,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    **kwargs,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream the raw CSV as DataFrames of at most `chunksize` rows.
+    The file check happens eagerly, so a bad filename fails at call time.
+    """
+
+    if chunksize <= 0:
+        raise ValueError("chunksize must be a positive integer")
+
+    file_path = _raw_file_path(filename)
+    kwargs, renames = _read_options(file_path, kwargs)
+    logger.info("Streaming bike data from %s in chunks of %s rows", file_path, chunksize)
+
+    def _chunks() -> Iterator[pd.DataFrame]:
+        with pd.read_csv(file_path, chunksize=chunksize, **kwargs) as reader:
+            for chunk in reader:
+                yield chunk.rename(columns=renames)
+
+    return _chunks()
+
+
 def save_cleaned_data(df: pd.DataFrame, filename: str, index: bool = False) -> Path:
     print("Saving cleaned data...")
     CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -38,3 +116,18 @@ def save_cleaned_data(df: pd.DataFrame, filename: str, index: bool = False) -> P
 
     return output_path
 
+
+def load_cleaned_data(filename: str, **kwargs) -> pd.DataFrame:
+    """Read a clean file back, restoring the parsed datetime columns."""
+    file_path = CLEAN_DATA_DIR / filename
+
+    if not file_path.exists():
+        raise FileNotFoundError(f"Cleaned file not found: {file_path}")
+
+    logger.info("Loading cleaned dataset from %s", file_path)
+    df = pd.read_csv(file_path, **kwargs)
+    for col in ["start_time", "end_time"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+
+    return df
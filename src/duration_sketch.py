@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+DURATION_COLUMN = "trip_duration_clean"
+
+# Groups the duration statistics are kept for; () is all trips together.
+DURATION_SKETCH_GROUPINGS: dict[str, tuple[str, ...]] = {
+    "all": (),
+    "user_type": ("user_type_standardized",),
+    "start_station": ("start_station_normalized",),
+    "route": ("start_station_normalized", "end_station_normalized"),
+}
+
+# KLL sketch parameters (Karnin, Lang & Liberty, 2016). Level h of a group
+# with H levels holds at most max(8, k * (2/3)^(H-1-h)) items. With k=200
+# the rank of an estimated quantile is within ~1.65% of the group's trip
+# count with 99% confidence, independent of the number of trips, chunks or
+# merges (the Apache DataSketches bound for this k). Groups of up to k
+# trips are never compacted, so their quantiles are exact.
+KLL_K = 200
+KLL_DECAY = 2 / 3
+KLL_MIN_CAPACITY = 8
+
+# A saved sketch set: sketches.json (by / k / column per name) plus, per
+# name, <name>.groups.parquet (keys and moments) and <name>.items.parquet.
+SKETCHES_FILENAME = "sketches.json"
+
+def _group_codes(frame: pd.DataFrame, by: tuple[str, ...]) -> tuple[np.ndarray, pd.DataFrame]:
+    """Group id per row (-1 for missing keys) and the key values of each id."""
+
+    if not by:
+        return np.zeros(len(frame), dtype="int64"), pd.DataFrame(index=pd.RangeIndex(1))
+    groups = frame.groupby(list(by), observed=True, sort=False)
+    # ngroup numbers groups in the order size() lists them
+    keys = groups.size().index.to_frame(index=False)
+    for col in by:
+        # plain labels, so keys of chunks with different category sets line up
+        if isinstance(keys[col].dtype, pd.CategoricalDtype):
+            keys[col] = keys[col].astype(keys[col].cat.categories.dtype)
+    return groups.ngroup().fillna(-1).to_numpy(dtype="int64"), keys
+
+
+def _stable_order(ids: np.ndarray) -> np.ndarray:
+    """Stable argsort of non-negative ids (a radix sort while they fit in 16 bits)."""
+    return np.argsort(ids.astype(np.min_scalar_type(int(ids.max()) if len(ids) else 0)), kind="stable")
+
+
+def _moments(codes: np.ndarray, values: np.ndarray, n_groups: int) -> pd.DataFrame:
+    count = np.bincount(codes, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(codes, weights=values, minlength=n_groups) / count
+    m2 = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n_groups)
+
+    minimum = np.full(n_groups, np.inf)
+    maximum = np.full(n_groups, -np.inf)
+    np.minimum.at(minimum, codes, values)
+    np.maximum.at(maximum, codes, values)
+    empty = count == 0
+    minimum[empty] = maximum[empty] = np.nan
+
+    return pd.DataFrame({"count": count, "mean": mean, "m2": m2, "min": minimum, "max": maximum})
+
+
+def _combine_moments(codes: np.ndarray, parts: pd.DataFrame, n_groups: int) -> pd.DataFrame:
+    """Chan et al.'s pairwise update, for every group at once."""
+
+    n = parts["count"].to_numpy()
+    part_mean = np.nan_to_num(parts["mean"].to_numpy())
+    count = np.bincount(codes, weights=n, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(codes, weights=n * part_mean, minlength=n_groups) / count
+    m2 = np.bincount(
+        codes,
+        weights=parts["m2"].to_numpy() + n * (part_mean - np.nan_to_num(mean[codes])) ** 2,
+        minlength=n_groups,
+    )
+
+    minimum = np.full(n_groups, np.nan)
+    maximum = np.full(n_groups, np.nan)
+    np.fmin.at(minimum, codes, parts["min"].to_numpy())
+    np.fmax.at(maximum, codes, parts["max"].to_numpy())
+
+    return pd.DataFrame({
+        "count": count.astype("int64"), "mean": mean, "m2": m2, "min": minimum, "max": maximum,
+    })
+
+
+class DurationSketch:
+    """
+    Mergeable summary of trip durations per group of `by`: a KLL quantile
+    sketch plus count / mean / variance / min / max.
+
+    Memory is O(k log(n/k)) per group instead of one float per trip.
+    Sketches of separate chunks, partitions or worker processes combine
+    with `merge`; the moments are merged exactly, the quantiles within the
+    KLL_K error bound.
+
+        sketch = DurationSketch(by="user_type_standardized")
+        for chunk in chunks:
+            sketch.update(chunk)
+        sketch.quantiles([0.25, 0.5, 0.75])
+        sketch.iqr_bounds()
+    """
+
+    def __init__(
+        self,
+        by: str | Sequence[str] = (),
+        k: int = KLL_K,
+        column: str = DURATION_COLUMN,
+        seed: int | None = 0,
+    ):
+        self.by = (by,) if isinstance(by, str) else tuple(by)
+        self.k = k
+        self.column = column
+        self._rng = np.random.default_rng(seed)
+
+        _, self.keys = _group_codes(pd.DataFrame(columns=list(self.by)), self.by)
+        self.stats = _moments(np.empty(0, "int64"), np.empty(0), len(self.keys))
+        self._group = np.empty(0, dtype="int64")
+        self._level = np.empty(0, dtype="int8")
+        self._value = np.empty(0, dtype="float64")
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, by: str | Sequence[str] = (), **kwargs) -> DurationSketch:
+        sketch = cls(by, **kwargs)
+        values = pd.to_numeric(df[sketch.column], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        codes, keys = _group_codes(df, sketch.by)
+
+        keep = ~np.isnan(values) & (codes >= 0)
+        codes, values = codes[keep], values[keep]
+
+        sketch.keys = keys
+        sketch.stats = _moments(codes, values, len(keys))
+        order = np.argsort(values)
+        sketch._set_items(codes[order], np.zeros(len(codes), dtype="int8"), values[order])
+        return sketch
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def n_items(self) -> int:
+        """Durations retained by the quantile sketch (over all groups)."""
+        return len(self._value)
+
+    def update(self, df: pd.DataFrame) -> DurationSketch:
+        return self.merge(DurationSketch.from_frame(df, self.by, k=self.k, column=self.column, seed=None))
+
+    def merge(self, *others: DurationSketch) -> DurationSketch:
+        """Fold `others` (same `by`) into this sketch in place, in one pass."""
+
+        for other in others:
+            if other.by != self.by:
+                raise ValueError(f"cannot merge sketches grouped by {self.by} and {other.by}")
+        sketches = (self, *others)
+
+        # chunk-local category sets differ, so keys are matched by value
+        codes, keys = _group_codes(pd.concat([s.keys for s in sketches], ignore_index=True), self.by)
+        offsets = np.cumsum([0] + [len(s.keys) for s in sketches])
+        group = [codes[offsets[i]:offsets[i + 1]][s._group] for i, s in enumerate(sketches)]
+
+        self.stats = _combine_moments(codes, pd.concat([s.stats for s in sketches], ignore_index=True), len(keys))
+        self.keys = keys
+
+        # each part is sorted by value: the stable sort only merges the runs
+        value = np.concatenate([s._value for s in sketches])
+        order = np.argsort(value, kind="stable")
+        self._set_items(
+            np.concatenate(group)[order],
+            np.concatenate([s._level for s in sketches])[order],
+            value[order],
+        )
+        return self
+
+    def _set_items(self, group: np.ndarray, level: np.ndarray, value: np.ndarray) -> None:
+        """Items sorted by value, the order _compact and quantiles rely on."""
+        self._group, self._level, self._value = group, level, value
+        self._compact()
+
+    def _compact(self) -> None:
+        """
+        Compact every over-full (group, level) until none is left: keep
+        every other item of the sorted level (random offset) one level up,
+        with twice the weight. An odd item out stays where it is. Items
+        only move between levels, so they stay sorted by value.
+        """
+
+        group, level, value = self._group, self._level, self._value
+        while len(value):
+            # only groups with more items than the smallest capacity can overflow
+            sizes = np.bincount(group, minlength=len(self.keys))
+            candidates = np.flatnonzero(sizes > KLL_MIN_CAPACITY)
+            if not len(candidates):
+                break
+            dense = np.full(len(self.keys), -1, dtype="int64")
+            dense[candidates] = np.arange(len(candidates))
+            local = dense[group]
+            rows = np.flatnonzero(local >= 0)
+
+            n_levels = int(level[rows].max()) + 1
+            height = np.zeros(len(candidates), dtype="int64")
+            np.maximum.at(height, local[rows], level[rows].astype("int64") + 1)
+
+            cell = local[rows] * n_levels + level[rows]
+            cell_sizes = np.bincount(cell, minlength=len(candidates) * n_levels)
+            cell_height = np.repeat(height, n_levels)
+            cell_level = np.tile(np.arange(n_levels), len(candidates))
+            capacity = np.maximum(KLL_MIN_CAPACITY, np.ceil(self.k * KLL_DECAY ** (cell_height - 1 - cell_level)))
+            full = cell_sizes > capacity
+            if not full.any():
+                break
+
+            # rows are in value order; a stable sort by cell keeps the
+            # values of each level sorted
+            overflow = full[cell]
+            rows, cell = rows[overflow], cell[overflow]
+            order = _stable_order(cell)
+            rows, cell = rows[order], cell[order]
+
+            starts = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]])
+            lengths = np.diff(np.r_[starts, len(rows)])
+            pos = np.arange(len(rows)) - np.repeat(starts, lengths)
+            paired = pos < np.repeat(lengths - lengths % 2, lengths)
+            offset = np.repeat(self._rng.integers(0, 2, len(starts)), lengths)
+            promoted = rows[paired & (pos % 2 == offset)]
+
+            keep = np.ones(len(value), dtype=bool)
+            keep[rows[paired]] = False
+            keep[promoted] = True
+            level = level.copy()
+            level[promoted] += 1
+            group, level, value = group[keep], level[keep], value[keep]
+
+        self._group, self._level, self._value = group, level, value
+
+    def _index(self) -> pd.Index | None:
+        if not self.by:
+            return None
+        if len(self.by) == 1:
+            return pd.Index(self.keys[self.by[0]], name=self.by[0])
+        return pd.MultiIndex.from_frame(self.keys)
+
+    def quantiles(self, q: float | Sequence[float] = (0.25, 0.5, 0.75)) -> pd.DataFrame:
+        """
+        Duration quantiles per group (columns "25%", "50%", ...), linearly
+        interpolated between ranks as pandas does; exact for groups that
+        were never compacted.
+        """
+
+        q = np.atleast_1d(np.asarray(q, dtype="float64"))
+        n_groups = len(self.keys)
+
+        order = _stable_order(self._group)
+        group, value = self._group[order], self._value[order]
+        weight = np.ldexp(1.0, self._level[order].astype("int64"))
+        cumulative = np.cumsum(weight)
+
+        total = np.bincount(group, weights=weight, minlength=n_groups)
+        start = np.cumsum(total) - total
+        rank = q[None, :] * np.maximum(total - 1, 0)[:, None]
+        last = np.maximum(np.cumsum(np.bincount(group, minlength=n_groups)) - 1, 0)[:, None]
+
+        def at(r: np.ndarray) -> np.ndarray:
+            # the item covering rank r: ranks [cum - w, cum) belong to it
+            idx = np.searchsorted(cumulative, start[:, None] + r, side="right")
+            return value[np.minimum(idx, last)] if len(value) else np.full(r.shape, np.nan)
+
+        lower, upper = at(np.floor(rank)), at(np.ceil(rank))
+        result = lower + (rank - np.floor(rank)) * (upper - lower)
+        result[total == 0] = np.nan
+
+        return pd.DataFrame(result, index=self._index(), columns=[f"{p:.0%}" for p in q])
+
+    def moments(self) -> pd.DataFrame:
+        """count / mean / std (ddof=1) / min / max per group."""
+
+        count = self.stats["count"].to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.stats["m2"].to_numpy() / np.where(count > 1, count - 1, np.nan))
+        return pd.DataFrame({
+            "count": count,
+            "mean": self.stats["mean"].to_numpy(),
+            "std": std,
+            "min": self.stats["min"].to_numpy(),
+            "max": self.stats["max"].to_numpy(),
+        }, index=self._index())
+
+    def summary(self, q: Sequence[float] = (0.25, 0.5, 0.75)) -> pd.DataFrame:
+        return pd.concat([self.moments(), self.quantiles(q)], axis=1)
+
+    def iqr_bounds(self, whisker: float = 1.5) -> pd.DataFrame:
+        """Tukey fences Q1 - whisker*IQR, Q3 + whisker*IQR per group."""
+
+        quartiles = self.quantiles([0.25, 0.75])
+        iqr = quartiles["75%"] - quartiles["25%"]
+        return pd.DataFrame({
+            "lower_bound": quartiles["25%"] - whisker * iqr,
+            "upper_bound": quartiles["75%"] + whisker * iqr,
+        })
+
+    def zscore_bounds(self, z_thresh: float = 3.0) -> pd.DataFrame:
+        """mean -/+ z_thresh * std per group."""
+
+        moments = self.moments()
+        return pd.DataFrame({
+            "lower_bound": moments["mean"] - z_thresh * moments["std"],
+            "upper_bound": moments["mean"] + z_thresh * moments["std"],
+        })
+
+
+def build_duration_sketches(
+    df: pd.DataFrame,
+    groupings: Mapping[str, Sequence[str]] = DURATION_SKETCH_GROUPINGS,
+    k: int = KLL_K,
+) -> dict[str, DurationSketch]:
+    """One DurationSketch per entry of `groupings` (all trips, user type, station, route)."""
+
+    sketches = {name: DurationSketch.from_frame(df, by, k=k) for name, by in groupings.items()}
+    logger.info(
+        "Built duration sketches from %s trips: %s",
+        len(df),
+        ", ".join(f"{name}={len(s):,} groups/{s.n_items:,} items" for name, s in sketches.items()),
+    )
+    return sketches
+
+
+def combine_duration_sketches(parts: Iterable[Mapping[str, DurationSketch]]) -> dict[str, DurationSketch]:
+    """Merge the sketch sets of separate chunks, partitions or processes."""
+
+    by_name: dict[str, list[DurationSketch]] = {}
+    for part in parts:
+        for name, sketch in part.items():
+            by_name.setdefault(name, []).append(sketch)
+
+    return {
+        name: DurationSketch(sketches[0].by, k=sketches[0].k, column=sketches[0].column).merge(*sketches)
+        for name, sketches in by_name.items()
+    }
+
+
+def save_duration_sketches(sketches: Mapping[str, DurationSketch], out_dir: Path) -> Path:
+    """Write a sketch set to `out_dir`, to be merged later with the sets of other partitions."""
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name, sketch in sketches.items():
+        pd.concat([sketch.keys, sketch.stats], axis=1).to_parquet(out_dir / f"{name}.groups.parquet", index=False)
+        pd.DataFrame({
+            "group": sketch._group, "level": sketch._level, "value": sketch._value,
+        }).to_parquet(out_dir / f"{name}.items.parquet", index=False)
+
+    meta = {name: {"by": list(s.by), "k": s.k, "column": s.column} for name, s in sketches.items()}
+    with open(out_dir / SKETCHES_FILENAME, "w") as fh:
+        json.dump(meta, fh, indent=2)
+    return out_dir
+
+
+def load_duration_sketches(in_dir: Path) -> dict[str, DurationSketch]:
+    with open(in_dir / SKETCHES_FILENAME) as fh:
+        meta = json.load(fh)
+
+    sketches = {}
+    for name, params in meta.items():
+        sketch = DurationSketch(params["by"], k=params["k"], column=params["column"])
+        groups = pd.read_parquet(in_dir / f"{name}.groups.parquet")
+        items = pd.read_parquet(in_dir / f"{name}.items.parquet")
+        sketch.keys = groups[list(sketch.by)]
+        sketch.stats = groups[list(sketch.stats.columns)]
+        # saved in value order, already compacted
+        sketch._group = items["group"].to_numpy(dtype="int64")
+        sketch._level = items["level"].to_numpy(dtype="int8")
+        sketch._value = items["value"].to_numpy(dtype="float64")
+        sketches[name] = sketch
+    return sketches
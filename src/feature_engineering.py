@@ -1,13 +1,17 @@
 import pandas as pd
+from calendar_dimension import calendar_rows, gather_calendar, is_rush_hour
+from data_cleaning import RAW_DATETIME_FORMAT, to_datetime_unique
+from schema import WEEKDAY_DTYPE, apply_schema
+from station_distance import StationDistanceTable, haversine_km, station_coordinates
 from utils import get_logger
 import numpy as np
 
 logger = get_logger(__name__)
 
 
-def compute_distance_fields(df: pd.DataFrame) -> pd.DataFrame:
+def compute_distance_fields(df: pd.DataFrame, dtype: str = "float32") -> pd.DataFrame:
 
-    df = df.copy()
+    df = df.copy(deep=False)
 
     # Check necessary columns
     required_cols = [
@@ -19,66 +23,104 @@ def compute_distance_fields(df: pd.DataFrame) -> pd.DataFrame:
         logger.warning("Distance fields cannot be computed — missing lat/lon columns.")
         return df
 
-    R = 6371  # Earth radius in km
+    if {"Start Station Id", "End Station Id"} <= set(df.columns):
+        # One haversine per station pair, then a gather per trip
+        table = StationDistanceTable.from_coordinates(station_coordinates(df), dtype=dtype)
+        distance = table.lookup(df["Start Station Id"], df["End Station Id"])
+        fallback = np.isnan(distance)
+    else:
+        distance = np.full(len(df), np.nan, dtype=dtype)
+        fallback = np.ones(len(df), dtype=bool)
 
-    lat1 = np.radians(df["Start Station Latitude"])
-    lon1 = np.radians(df["Start Station Longitude"])
-    lat2 = np.radians(df["End Station Latitude"])
-    lon2 = np.radians(df["End Station Longitude"])
+    # Trips whose stations have no coordinates in the table use their own
+    if fallback.any():
+        lat1, lon1, lat2, lon2 = (df[col].to_numpy(dtype="float64", na_value=np.nan)[fallback] for col in required_cols)
+        distance[fallback] = haversine_km(lat1, lon1, lat2, lon2)
 
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-
-    a = (
-        np.sin(dlat / 2) ** 2 +
-        np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
-    )
-    c = 2 * np.arcsin(np.sqrt(a))
-
-    df["trip_distance_km"] = R * c
+    df["trip_distance_km"] = distance
+    df = apply_schema(df, ["trip_distance_km"])
 
     logger.info("Computed distance fields.")
     return df
 
 
+def _parse_start_time(values: pd.Series) -> pd.Series:
+    """Raw-file timestamps, with ISO 8601 as the fallback for other strings."""
+    parsed = to_datetime_unique(values, format=RAW_DATETIME_FORMAT)
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = to_datetime_unique(values[retry], format="ISO8601")
+    return parsed
+
+
 def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
 
-    df = df.copy()
+    df = df.copy(deep=False)
 
-    # Ensure start_time is a datetime type
-    df["start_time"] = pd.to_datetime(df["start_time"], errors="coerce")
+    # Ensure start_time is a datetime type (already parsed by parse_datetime_columns in the pipeline)
+    if not pd.api.types.is_datetime64_any_dtype(df["start_time"]):
+        df["start_time"] = _parse_start_time(df["start_time"])
 
     # Raise error if conversion failed (all NaT)
     if df["start_time"].isna().all():
         raise ValueError("start_time column cannot be converted to datetime")
 
-    df["start_hour"] = df["start_time"].dt.hour
-    df["start_day"] = df["start_time"].dt.day
-    df["start_month"] = df["start_time"].dt.month
-    df["start_weekday"] = df["start_time"].dt.day_name()
+    # Calendar facts only depend on the hour, and a year has ~8.8k of them:
+    # look them up in the calendar dimension by integer hour offset.
+    calendar, rows = calendar_rows(df["start_time"])
+    fields = gather_calendar(calendar, rows, ["hour", "day", "month", "weekday"], index=df.index)
+
+    df["start_hour"] = fields["hour"]
+    df["start_day"] = fields["day"]
+    df["start_month"] = fields["month"]
+    df["start_weekday"] = fields["weekday"]
+    df = apply_schema(df, ["start_hour", "start_day", "start_month", "start_weekday"])
 
     logger.info("Added time-extracted fields (hour, day, month, weekday).")
     return df
 
 
 def add_weekend_flag(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = df.copy(deep=False)
 
-    df["is_weekend"] = df["start_time"].dt.weekday >= 5  # Sat=5, Sun=6
+    if df["start_time"].isna().all():
+        df["is_weekend"] = False
+    else:
+        calendar, rows = calendar_rows(df["start_time"])  # Sat/Sun
+        df["is_weekend"] = gather_calendar(calendar, rows, ["is_weekend"], index=df.index)["is_weekend"]
+    df = apply_schema(df, ["is_weekend"])
 
     logger.info("Added weekend flag.")
     return df
 
 
 def add_rush_hour_flag(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = df.copy(deep=False)
 
-    hour = df["start_hour"]
-
-    df["is_rush_hour"] = (
-        ((hour >= 7) & (hour <= 9)) |
-        ((hour >= 16) & (hour <= 18))
-    )
+    # 7-9 am and 4-6 pm (calendar_dimension.RUSH_HOURS)
+    df["is_rush_hour"] = is_rush_hour(df["start_hour"])
+    df = apply_schema(df, ["is_rush_hour"])
 
     logger.info("Added rush-hour flag.")
-    return df
\ No newline at end of file
+    return df
+
+
+def add_calendar_fields(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Integer date key (YYYYMMDD), Ontario statutory holiday flag and season
+    per trip, so holiday-aware analysis needs no further date handling.
+    Other calendar facts join on start_date_key / start_hour.
+    """
+
+    df = df.copy(deep=False)
+
+    calendar, rows = calendar_rows(df["start_time"])
+    fields = gather_calendar(calendar, rows, ["date_key", "is_holiday", "season"], index=df.index)
+
+    df["start_date_key"] = fields["date_key"]
+    df["is_holiday"] = fields["is_holiday"]
+    df["season"] = fields["season"]
+    df = apply_schema(df, ["start_date_key", "is_holiday", "season"])
+
+    logger.info("Added calendar fields (date key, holiday, season).")
+    return df
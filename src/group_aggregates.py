@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from typing import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from top_k import DENSE_MAX_CELLS
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class FactorizedKeys:
+    """
+    Integer codes of a frame's key columns, computed once and shared by
+    every aggregate over them.
+
+    Each aggregate is one combined code per row (mixed radix over the key
+    codes) and one np.bincount per measure, instead of a groupby that
+    re-hashes the keys. Missing key values form their own group, listed
+    last, as with groupby(dropna=False).
+
+        keys = FactorizedKeys(df, ["start_hour", "start_weekday", "user_type_standardized"])
+        keys.aggregate(["start_hour"])
+        keys.aggregate(["start_hour", "user_type_standardized"], sums={"duration_sum_sec": duration})
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Sequence[str]):
+        self.n_rows = len(df)
+        self.codes: dict[str, np.ndarray] = {}
+        self.labels: dict[str, pd.Index] = {}
+        self.dtypes: dict[str, object] = {}
+
+        for col in columns:
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes, labels = values.cat.codes.to_numpy(dtype="int64"), values.cat.categories
+            else:
+                codes, labels = pd.factorize(values, sort=True)
+                labels = pd.Index(labels)
+            n = len(labels)
+            # missing values get the extra code n, so they sort last
+            self.codes[col] = np.where(codes < 0, n, codes)
+            self.labels[col] = labels
+            self.dtypes[col] = values.dtype
+
+    def _sizes(self, by: Sequence[str]) -> list[int]:
+        return [len(self.labels[col]) + 1 for col in by]
+
+    def group_ids(self, by: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Dense group id per row and the combined code of each group, in key
+        order (the order of groupby(sort=True)).
+        """
+
+        sizes = self._sizes(by)
+        flat = np.zeros(self.n_rows, dtype="int64")
+        for col, size in zip(by, sizes):
+            flat = flat * size + self.codes[col]
+
+        n_cells = int(np.prod(sizes, dtype="float64"))
+        if n_cells <= DENSE_MAX_CELLS:
+            present = np.flatnonzero(np.bincount(flat, minlength=n_cells))
+            remap = np.zeros(n_cells, dtype="int64")
+            remap[present] = np.arange(len(present))
+            return remap[flat], present
+
+        cells, ids = np.unique(flat, return_inverse=True)
+        return ids, cells
+
+    def _decode(self, cells: np.ndarray, by: Sequence[str]) -> dict[str, object]:
+        out, rest = {}, cells
+        for col, size in reversed(list(zip(by, self._sizes(by)))):
+            rest, code = np.divmod(rest, size)
+            labels = self.labels[col]
+            code = np.where(code == len(labels), -1, code)
+            if isinstance(self.dtypes[col], pd.CategoricalDtype):
+                out[col] = pd.Categorical.from_codes(code, dtype=self.dtypes[col])
+            else:
+                values = pd.Series(labels.take(np.maximum(code, 0)))
+                out[col] = values.where(code >= 0) if (code < 0).any() else values
+        return {col: out[col] for col in by}
+
+    def aggregate(
+        self,
+        by: Sequence[str],
+        sums: Mapping[str, np.ndarray] | None = None,
+        count: str | None = "trip_count",
+        means: Mapping[str, tuple[str, str]] | None = None,
+    ) -> pd.DataFrame:
+        """
+        One row per observed combination of `by`: the row count (as
+        `count`), the sum of every array in `sums`, and each mean in
+        `means` as name -> (sum name, count name).
+
+        Integer arrays keep integer sums. With no `by`, a single row.
+        """
+
+        by = list(by)
+        ids, cells = self.group_ids(by) if by else (np.zeros(self.n_rows, dtype="int64"), np.zeros(1, dtype="int64"))
+        n_groups = len(cells)
+
+        columns = self._decode(cells, by) if by else {}
+        if count is not None:
+            columns[count] = np.bincount(ids, minlength=n_groups)
+        for name, values in (sums or {}).items():
+            values = np.asarray(values)
+            total = np.bincount(ids, weights=values, minlength=n_groups)
+            columns[name] = total.round().astype("int64") if values.dtype.kind in "iub" else total
+        frame = pd.DataFrame(columns)
+
+        for name, (total, n) in (means or {}).items():
+            frame[name] = frame[total] / frame[n].where(frame[n] > 0)
+        return frame
+
+
+def _sortable_bits(values: np.ndarray) -> np.ndarray:
+    """float32 bit patterns mapped to integers with the same order as the values."""
+    bits = values.view(np.uint32).astype("int64")
+    return np.where(bits & 0x80000000, bits ^ 0xFFFFFFFF, bits | 0x80000000)
+
+
+def _from_sortable_bits(bits: np.ndarray) -> np.ndarray:
+    bits = np.where(bits & 0x80000000, bits ^ 0x80000000, bits ^ 0xFFFFFFFF)
+    return bits.astype(np.uint32).view(np.float32).astype("float64")
+
+
+def _grouped_order(codes: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """All values sorted by (group, value)."""
+
+    if values.dtype == np.float32 and n_groups < 1 << 31:
+        # pack (group, value bits) into one int64 and sort the keys themselves
+        keys = np.sort((codes << 32) | _sortable_bits(values))
+        return _from_sortable_bits(keys & 0xFFFFFFFF)
+
+    order = np.argsort(values)
+    ids = codes[order]
+    if n_groups <= 1 << 16:
+        # a stable (radix) sort of 16-bit group ids keeps each group's values in order
+        order = order[np.argsort(ids.astype(np.min_scalar_type(n_groups - 1)), kind="stable")]
+    else:
+        # many groups (e.g. routes): one sort of group id * n + value rank
+        order = order[np.argsort(ids * len(values) + np.arange(len(values)))]
+    return values[order].astype("float64")
+
+
+def grouped_quantiles(codes: np.ndarray, values: np.ndarray, n_groups: int, q: Sequence[float]) -> np.ndarray:
+    """
+    (n_groups, len(q)) quantiles with pandas' linear interpolation, from one
+    sort of all values instead of one quantile call per group. NaN values
+    must be dropped beforehand. float32 values (as stored in the clean
+    store) are sorted in a single pass as packed (group, value) keys.
+    """
+
+    counts = np.bincount(codes, minlength=n_groups)
+    if not len(values):
+        return np.full((n_groups, len(q)), np.nan)
+
+    ordered = _grouped_order(np.asarray(codes, dtype="int64"), values, n_groups)
+    start = np.minimum(np.cumsum(counts) - counts, len(values) - 1)[:, None]
+
+    pos = np.asarray(q, dtype="float64")[None, :] * np.maximum(counts - 1, 0)[:, None]
+    lo, hi = np.floor(pos).astype("int64"), np.ceil(pos).astype("int64")
+    lower = ordered[np.minimum(start + lo, len(values) - 1)]
+    upper = ordered[np.minimum(start + hi, len(values) - 1)]
+
+    result = lower + (pos - lo) * (upper - lower)
+    result[counts == 0] = np.nan
+    return result
+
+
+def multi_aggregate(
+    df: pd.DataFrame,
+    groupings: Mapping[str, Sequence[str]],
+    sums: Mapping[str, np.ndarray] | None = None,
+    count: str | None = "trip_count",
+) -> dict[str, pd.DataFrame]:
+    """
+    Every grouping in `groupings` (name -> key columns) from one
+    factorization of the keys they use.
+    """
+
+    columns = list(dict.fromkeys(col for by in groupings.values() for col in by))
+    keys = FactorizedKeys(df, columns)
+    result = {name: keys.aggregate(by, sums=sums, count=count) for name, by in groupings.items()}
+
+    logger.info(
+        "Aggregated %s rows over %s key columns: %s",
+        keys.n_rows,
+        len(columns),
+        ", ".join(f"{name}={len(frame):,}" for name, frame in result.items()),
+    )
+    return result
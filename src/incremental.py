@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Sequence
+
+import pandas as pd
+
+from clean_store import (
+    CLEAN_STORE_FILENAME,
+    CleanStoreWriter,
+    clean_store_path,
+    read_clean_store,
+    write_clean_store,
+)
+import data_loader
+from data_loader import CLEAN_DATA_DIR, resolve_raw_files
+from concurrency import TripsInProgress, load_trips_in_progress, save_trips_in_progress
+from duration_sketch import (
+    build_duration_sketches,
+    combine_duration_sketches,
+    load_duration_sketches,
+    save_duration_sketches,
+)
+from ingestion import iter_ingested_files
+from trip_cube import CUBOIDS, TripCube, build_trip_cube, combine_trip_cubes, save_trip_cube
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Everything below lives under CLEAN_DATA_DIR:
+#   manifest.json                  raw file -> content hash, size, partition
+#   partitions/<raw stem>.parquet  cleaned rows of one raw file
+#   aggregates/<raw stem>/         trip cube, duration sketches and trips
+#                                  in progress of that partition
+MANIFEST_FILENAME = "manifest.json"
+PARTITIONS_SUBDIR = "partitions"
+AGGREGATES_SUBDIR = "aggregates"
+# 2: per-partition trip cube / sketches / trips in progress
+MANIFEST_VERSION = 2
+
+# Slices of the per-partition trips-in-progress counters (main reports by user type)
+CONCURRENCY_BY = ("user_type_standardized",)
+
+
+def file_fingerprint(path: Path, block_size: int = 1 << 20) -> dict:
+    """SHA-256 and size of a raw file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while block := fh.read(block_size):
+            digest.update(block)
+
+    stat = path.stat()
+    return {"sha256": digest.hexdigest(), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_manifest() -> dict:
+    path = CLEAN_DATA_DIR / MANIFEST_FILENAME
+    if not path.exists():
+        return {"version": MANIFEST_VERSION, "files": {}}
+
+    with open(path) as fh:
+        manifest = json.load(fh)
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        logger.warning("Manifest version changed, every raw file will be reprocessed.")
+        return {"version": MANIFEST_VERSION, "files": {}}
+
+    return manifest
+
+
+def save_manifest(manifest: dict) -> Path:
+    path = CLEAN_DATA_DIR / MANIFEST_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    tmp_path.replace(path)
+
+    return path
+
+
+def _is_unchanged(path: Path, entry: dict | None, fingerprints: dict[str, dict]) -> bool:
+    """
+    Compare a raw file with its manifest entry. Size is checked first; the
+    hash is only computed when the mtime differs from the recorded one, and
+    is kept in `fingerprints` so a changed file is not hashed again.
+    """
+
+    if entry is None:
+        return False
+
+    stat = path.stat()
+    if stat.st_size != entry["size"]:
+        return False
+    if stat.st_mtime_ns == entry.get("mtime_ns"):
+        return True
+
+    fingerprint = fingerprints[path.name] = file_fingerprint(path)
+    if fingerprint["sha256"] != entry["sha256"]:
+        return False
+
+    # Touched but identical: remember the new mtime to skip hashing next time
+    entry["mtime_ns"] = stat.st_mtime_ns
+    return True
+
+
+def plan_incremental_run(
+    files: str | Sequence[str],
+    manifest: dict,
+    force: bool = False,
+) -> dict[str, list]:
+    """
+    Split the raw files into 'changed' (new or modified paths, or whose
+    partition or aggregates are missing on disk), 'unchanged' and 'removed'
+    (names in the manifest whose raw file no longer exists).
+    Manifest entries that just fall outside `files` are kept, so a run over
+    one month does not drop the others. 'fingerprints' holds the hashes
+    already computed while comparing, by file name.
+    """
+
+    paths = resolve_raw_files(files)
+    known = manifest["files"]
+
+    changed, unchanged = [], []
+    fingerprints: dict[str, dict] = {}
+    for path in paths:
+        entry = known.get(path.name)
+        same = (
+            not force
+            and entry is not None
+            and _has_outputs(path.name, entry)
+            and _is_unchanged(path, entry, fingerprints)
+        )
+        (unchanged if same else changed).append(path)
+
+    current = {p.name for p in paths}
+    removed = sorted(
+        name for name in known
+        if name not in current and not (data_loader.RAW_DATA_DIR / name).exists()
+    )
+
+    return {"changed": changed, "unchanged": unchanged, "removed": removed, "fingerprints": fingerprints}
+
+
+def _aggregate_dir(stem: str) -> Path:
+    return CLEAN_DATA_DIR / AGGREGATES_SUBDIR / stem
+
+
+def _has_outputs(name: str, entry: dict) -> bool:
+    out_dir = _aggregate_dir(Path(name).stem)
+    return clean_store_path(entry["partition"]).exists() and (out_dir / "trip_cube" / "base.parquet").exists()
+
+
+def _write_aggregates(stem: str, df: pd.DataFrame) -> None:
+    """
+    Mergeable summaries of one partition: the trip cube (additive), the
+    duration sketches and the trips-in-progress events. Only changed
+    partitions are summarized again; combine_aggregates merges them all.
+    """
+
+    out_dir = _aggregate_dir(stem)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    save_trip_cube(build_trip_cube(df), out_dir / "trip_cube")
+    save_duration_sketches(build_duration_sketches(df), out_dir / "duration_sketches")
+    save_trips_in_progress(TripsInProgress.from_frame(df, by=CONCURRENCY_BY), out_dir / "trips_in_progress")
+
+
+def _remove_partition(name: str, entry: dict) -> None:
+    clean_store_path(entry["partition"]).unlink(missing_ok=True)
+    shutil.rmtree(_aggregate_dir(Path(name).stem), ignore_errors=True)
+
+
+def combine_aggregates(manifest: dict | None = None) -> dict:
+    """
+    Merge the per-partition summaries of every file in the manifest into
+    one "trip_cube", "duration_sketches" set and "trips_in_progress"
+    counter, without reading any partition. Empty when the manifest is.
+    """
+
+    manifest = load_manifest() if manifest is None else manifest
+    out_dirs = [_aggregate_dir(Path(name).stem) for name in sorted(manifest["files"])]
+    if not out_dirs:
+        return {}
+
+    cubes = []
+    for out_dir in out_dirs:
+        cube = TripCube.load(out_dir / "trip_cube")
+        cubes.append({name: cube.cuboid(name) for name in CUBOIDS})
+
+    trips_in_progress = TripsInProgress(CONCURRENCY_BY)
+    for out_dir in out_dirs:
+        trips_in_progress.merge(load_trips_in_progress(out_dir / "trips_in_progress"))
+
+    return {
+        "trip_cube": combine_trip_cubes(cubes),
+        "duration_sketches": combine_duration_sketches(
+            load_duration_sketches(out_dir / "duration_sketches") for out_dir in out_dirs
+        ),
+        "trips_in_progress": trips_in_progress,
+    }
+
+
+def rebuild_clean_store(
+    manifest: dict,
+    output_filename: str = CLEAN_STORE_FILENAME,
+) -> Path:
+    """Concatenate the partitions into the combined clean store (I/O only, no cleaning)."""
+
+    with CleanStoreWriter(output_filename) as writer:
+        for name in sorted(manifest["files"]):
+            writer.write(read_clean_store(manifest["files"][name]["partition"]))
+
+    return writer.path
+
+
+def run_incremental(
+    files: str | Sequence[str] = "*.csv",
+    max_workers: int | None = None,
+    force: bool = False,
+) -> dict:
+    """
+    Process only raw files that are new or changed since the last run.
+
+    Each changed file is cleaned into its own partition and gets fresh
+    aggregates as soon as its worker is done, so only the frames not yet
+    written are held in memory; unchanged partitions, and those of raw files outside
+    `files`, are left as they are. Partitions of raw files that were
+    deleted from RAW_DATA_DIR are dropped. Returns the updated manifest.
+    """
+
+    manifest = load_manifest()
+    plan = plan_incremental_run(files, manifest, force=force)
+    logger.info(
+        "Incremental run: %s changed, %s unchanged, %s removed",
+        len(plan["changed"]),
+        len(plan["unchanged"]),
+        len(plan["removed"]),
+    )
+
+    for name in plan["removed"]:
+        _remove_partition(name, manifest["files"].pop(name))
+
+    for path, df in iter_ingested_files(plan["changed"], max_workers=max_workers):
+        partition = f"{PARTITIONS_SUBDIR}/{path.stem}.parquet"
+        write_clean_store(df, partition)
+        _write_aggregates(path.stem, df)
+
+        manifest["files"][path.name] = {
+            **(plan["fingerprints"].get(path.name) or file_fingerprint(path)),
+            "partition": partition,
+            "rows": int(len(df)),
+            "processed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+
+    save_manifest(manifest)
+    if plan["changed"] or plan["removed"] or not clean_store_path().exists():
+        rebuild_clean_store(manifest)
+    else:
+        logger.info("Nothing to do, clean store is up to date.")
+
+    return manifest
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_bike_data, resolve_raw_files
+from pipeline import clean_bike_data, process_bike_data
+from schema import concat_trip_frames
+from station_dimension import (
+    build_station_dimension,
+    load_station_dimension,
+    merge_station_dimensions,
+    save_station_dimension,
+)
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def load_and_clean_file(
+    path: str | Path,
+    features: bool = True,
+    station_dim: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """Load one raw file and run the cleaning (and optionally feature) stages on it."""
+    df = load_bike_data(path)
+    if features:
+        df = process_bike_data(df, station_dim=station_dim)
+    else:
+        df = clean_bike_data(df, station_dim=station_dim)
+    # Lets callers trace every row back to its monthly drop
+    df["source_file"] = pd.Categorical.from_codes(
+        np.zeros(len(df), dtype="int8"), [Path(path).name]
+    )
+    return df
+
+
+def iter_ingested_files(
+    paths: Sequence[Path],
+    max_workers: int | None = None,
+    features: bool = True,
+) -> Iterator[tuple[Path, pd.DataFrame]]:
+    """
+    Load and clean each path in a worker process, yielding (path, frame) as
+    soon as a file is done (completion order with several workers), so a
+    caller that writes each frame out holds one at a time.
+
+    Every worker sees the station dimension as it was before the run; the
+    stations found in this run are folded into it, in input order, once
+    every frame has been yielded.
+    """
+
+    paths = list(paths)
+    if not paths:
+        return
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(paths)))
+
+    station_dim = load_station_dimension()
+    worker = partial(load_and_clean_file, features=features, station_dim=station_dim)
+    logger.info("Ingesting %s files with %s worker(s)", len(paths), max_workers)
+
+    found: dict[Path, pd.DataFrame] = {}
+    if max_workers == 1:
+        for path in paths:
+            frame = worker(path)
+            found[path] = build_station_dimension(frame)
+            yield path, frame
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(worker, p): p for p in paths}
+            for future in as_completed(futures):
+                # popped, so the frame is freed once the caller is done with it
+                path = futures.pop(future)
+                frame = future.result()
+                found[path] = build_station_dimension(frame)
+                yield path, frame
+
+    # input order, so the dimension does not depend on which worker finished first
+    for path in paths:
+        station_dim = merge_station_dimensions(station_dim, found[path])
+    save_station_dimension(station_dim)
+
+
+def ingest_files(
+    paths: Sequence[Path],
+    max_workers: int | None = None,
+    features: bool = True,
+) -> list[pd.DataFrame]:
+    """Load and clean each path in a worker process; frames come back in input order."""
+
+    paths = list(paths)
+    frames = dict(iter_ingested_files(paths, max_workers=max_workers, features=features))
+    return [frames[p] for p in paths]
+
+
+def load_bike_files(
+    files: str | Sequence[str | Path],
+    max_workers: int | None = None,
+    features: bool = True,
+) -> pd.DataFrame:
+    """
+    Load and clean several raw CSV drops (a glob such as "*-bike-*.csv" or a
+    list of filenames under RAW_DATA_DIR), one file per worker process.
+
+    Results are merged in sorted filename order regardless of which worker
+    finishes first, so the output is identical to a serial run.
+    """
+
+    paths = resolve_raw_files(files)
+    df = concat_trip_frames(ingest_files(paths, max_workers=max_workers, features=features))
+    logger.info("Ingested %s rows from %s files", len(df), len(paths))
+
+    return df
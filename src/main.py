@@ -1,25 +1,30 @@
-from data_loader import load_bike_data, save_cleaned_data
-from data_cleaning import (
-    standardize_user_type,
-    group_bike_model,
-    parse_datetime_columns,
-    clean_trip_duration,
-    clean_station_fields,
-)
-from feature_engineering import (
-    compute_distance_fields,
-    add_time_features,
-    add_weekend_flag,
-    add_rush_hour_flag,
-)
-from station_normalization import normalize_station_fields
+import argparse
+from contextlib import nullcontext
+
+from data_loader import load_bike_data, resolve_raw_files
+from ingestion import load_bike_files
+from incremental import combine_aggregates, run_incremental
+from clean_store import CLEAN_STORE_FILENAME, clean_store_columns, write_clean_store
+from station_dimension import load_station_dimension, update_station_dimension
+from pipeline import process_bike_data, run_streaming_pipeline
+from profiling import PipelineProfiler
+from stage_cache import StageCache
+from trip_cube import StreamingTripCube, TripCube, build_trip_cube, save_trip_cube
+from duration_sketch import DURATION_SKETCH_GROUPINGS, DurationSketch, build_duration_sketches
+from concurrency import TripsInProgress
+from bike_chaining import BIKE_COL, BikeChains
+from route_stats import START_ID_COL, RouteStats, build_route_stats, save_route_stats
 from analysis import (
     summarize_trip_duration_by_user_type,
     get_peak_stations_by_user_type,
     summarize_time_of_day_by_user_type,
 )
 
-from analysis_outliers import detect_trip_duration_outliers
+from analysis_outliers import (
+    detect_trip_duration_outliers,
+    detect_grouped_duration_outliers,
+    duration_outlier_thresholds,
+)
 
 from visualizations import (
     plot_hourly_demand,
@@ -39,43 +44,183 @@ from time_analysis import (
     trips_per_hour,
     trips_per_weekday,
     trips_per_month,
+    peak_trips_in_progress_per_day,
 )
-def main():
-    df = load_bike_data("toronto-bike.csv")
-    df = standardize_user_type(df)
-    df = group_bike_model(df)
-    df = parse_datetime_columns(df)
-    df = clean_trip_duration(df)
-    df = clean_station_fields(df)
-    df = normalize_station_fields(df)
-    save_cleaned_data(df, "toronto-bike-clean.csv", index=False)
-
-    # 🔹 AQUÍ estandarizamos el tipo de usuario (IMPORTANTE)
-    df = standardize_user_type(df)
-
-    # 🔹 Feature engineering
-    df = compute_distance_fields(df)
-    df = add_time_features(df)
-    df = add_weekend_flag(df)
-    df = add_rush_hour_flag(df)
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Toronto bike-share cleaning and analysis pipeline")
+    parser.add_argument(
+        "--raw",
+        default="toronto-bike.csv",
+        help="Raw CSV under data/raw, or a glob such as 'bike-share-2024-*.csv'.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes when --raw matches several files (default: all cores).",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help=(
+            "Clean the raw CSV in chunks of this many rows. The report is built from "
+            "aggregates collected per chunk; route stats, bike chains and outlier rows are skipped."
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Only clean raw files that are new or changed since the last run (see manifest.json). "
+            "The report is merged from per-file aggregates, as with --chunksize."
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record per-stage time and memory and write a report to outputs/profiling.",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse cached stage outputs (data/clean/stage_cache) and rerun only invalidated stages.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(
+    raw: str = "toronto-bike.csv",
+    chunksize: int | None = None,
+    workers: int | None = None,
+    incremental: bool = False,
+    profile: bool = False,
+    cache: bool = False,
+):
+    profiler = PipelineProfiler() if profile else None
+    if profiler is not None and (incremental or (not chunksize and len(resolve_raw_files(raw)) > 1)):
+        # stages run in worker processes there
+        logger.warning("--profile only covers single-file and --chunksize runs; ignoring it.")
+        profiler = None
+
+    cube = None
+    duration_sketches = None
+    trips_in_progress = None
+
+    if incremental:
+        # Nightly refresh: unchanged months keep their clean partitions and
+        # their aggregates, which are merged here instead of reloading the store
+        aggregates = combine_aggregates(run_incremental(raw, max_workers=workers))
+        cube = aggregates.get("trip_cube")
+        duration_sketches = aggregates.get("duration_sketches")
+        trips_in_progress = aggregates.get("trips_in_progress")
+        df = None
+    elif chunksize:
+        # Streaming mode: clean + features per chunk, appended to the clean file;
+        # the cube, duration sketches and trips in progress are built on the way,
+        # so the report never holds more than one chunk of trips
+        streaming_cube = StreamingTripCube()
+        duration_sketches = {name: DurationSketch(by) for name, by in DURATION_SKETCH_GROUPINGS.items()}
+        trips_in_progress = TripsInProgress(by="user_type_standardized")
+        run_streaming_pipeline(
+            raw,
+            output_filename=CLEAN_STORE_FILENAME,
+            chunksize=chunksize,
+            profiler=profiler,
+            duration_sketches=list(duration_sketches.values()),
+            concurrency=[trips_in_progress],
+            trip_cubes=[streaming_cube],
+        )
+        cube = streaming_cube.cube
+        df = None
+    elif len(raw_files := resolve_raw_files(raw)) > 1:
+        # Monthly drops: one file per worker process, merged in filename order
+        df = load_bike_files(raw_files, max_workers=workers)
+        write_clean_store(df, CLEAN_STORE_FILENAME)
+    else:
+        stage_cache = StageCache() if cache else None
+        input_key = None
+
+        with profiler.stage("load_bike_data") if profiler else nullcontext():
+            if stage_cache is None:
+                df = load_bike_data(raw_files[0])
+            else:
+                df, input_key = stage_cache.load_raw(raw_files[0])
+            if profiler is not None:
+                profiler.set_output(df)
+
+        # Cleaning + feature engineering (pipeline.CLEANING_STAGES / FEATURE_STAGES)
+        df = process_bike_data(
+            df,
+            station_dim=load_station_dimension(),
+            profiler=profiler,
+            cache=stage_cache,
+            input_key=input_key,
+        )
+        update_station_dimension(df)
+
+        # Clean store keeps the engineered features too, so the dashboard
+        # does not recompute them on every cold start
+        write_clean_store(df, CLEAN_STORE_FILENAME)
+
+    if profiler is not None:
+        profiler.close()
+        profiler.write_report()
+        print("\n=== Pipeline profile ===")
+        print(profiler.to_text())
+
+    if df is None and cube is None:
+        logger.warning("No trips were processed; nothing to report.")
+        return
+
+    # Pre-aggregated cube for the dashboard and the summaries below
+    if cube is None:
+        cube = build_trip_cube(df)
+    save_trip_cube(cube)
+    trip_cube = TripCube(cube)
+    if duration_sketches is None:
+        duration_sketches = build_duration_sketches(df)
+    if trips_in_progress is None:
+        trips_in_progress = TripsInProgress.from_frame(df, by="user_type_standardized")
+
+    # Tiempos de viaje por ruta (ids de estación), precalculados para consultas O(1)
+    route_stats = None
+    if df is not None and START_ID_COL in df.columns:
+        route_stats = RouteStats(build_route_stats(df))
+        save_route_stats(route_stats.table)
 
     # Time-based Analysis Visualizations
-    trips_per_hour_df = trips_per_hour(df)
-    trips_per_weekday_df = trips_per_weekday(df)
-    trips_per_month_df = trips_per_month(df)    
+    trips_per_hour_df = trips_per_hour(trip_cube.query(["start_hour"]))
+    trips_per_weekday_df = trips_per_weekday(trip_cube.query(["start_weekday"]))
+    trips_per_month_df = trips_per_month(trip_cube.query(["start_month"]))
 
     plot_trips_per_hour(trips_per_hour_df)
     plot_trips_per_weekday(trips_per_weekday_df)
     plot_trips_per_month(trips_per_month_df)
 
+    # Bicis en uso a la vez: pico diario por tipo de usuario
+    concurrency_peaks = peak_trips_in_progress_per_day(trips_in_progress)
+    print("\n=== Peak Trips in Progress per Day (top days) ===")
+    print(concurrency_peaks.nlargest(5, "peak_trips_in_progress"))
+
     # 🔹 DEBUG rápido: ver columnas disponibles
     print("\nColumns in df right before analysis:")
-    print(df.columns)
+    print(df.columns if df is not None else clean_store_columns(CLEAN_STORE_FILENAME))
 
     # 🔹 Análisis
-    duration_summary = summarize_trip_duration_by_user_type(df)
-    peak_stations = get_peak_stations_by_user_type(df, top_n=10)
-    time_of_day_summary = summarize_time_of_day_by_user_type(df)
+    duration_summary = summarize_trip_duration_by_user_type(duration_sketches["user_type"])
+    peak_stations = get_peak_stations_by_user_type(
+        trip_cube.query(["user_type_standardized", "start_station_normalized", "end_station_normalized"]),
+        top_n=10,
+    )
+    time_of_day_summary = summarize_time_of_day_by_user_type(
+        trip_cube.query(["start_hour", "user_type_standardized"])
+    )
 
     print("\n=== Trip Duration Summary by User Type ===")
     print(duration_summary.head())
@@ -89,21 +234,64 @@ def main():
     print("\n=== Time-of-Day vs User Type Summary (first rows) ===")
     print(time_of_day_summary.head())
 
-    outliers_df, outliers_json = detect_trip_duration_outliers(df, method="iqr")
+    if df is None:
+        # Sin filas en memoria: solo los umbrales, que salen de los sketches
+        logger.info("Aggregate-only report: skipping route stats, bike chains and outlier rows.")
+        print("\n=== OUTLIER THRESHOLDS (all trips) ===")
+        print(duration_outlier_thresholds(None, method="iqr", sketch=duration_sketches["all"]))
+        print("\n=== OUTLIER THRESHOLDS BY USER TYPE ===")
+        print(duration_outlier_thresholds(
+            None, by="user_type_standardized", method="iqr", sketch=duration_sketches["user_type"]
+        ))
+    else:
+        outliers_df, outliers_json = detect_trip_duration_outliers(
+            df, method="iqr", sketch=duration_sketches["all"]
+        )
+
+        print("\n=== OUTLIERS DETECTED (HEAD) ===")
+        print(outliers_df[["trip_duration_clean", "outlier_reason"]].head())
+
+        print("\n=== OUTLIER SUMMARY (JSON-like) ===")
+        print(outliers_json)
+
+        # Umbrales por tipo de usuario: un paseo casual de 3 h no se mide contra un trayecto de 30 min
+        grouped_outliers, outlier_thresholds = detect_grouped_duration_outliers(
+            df, by="user_type_standardized", method="iqr", sketch=duration_sketches["user_type"]
+        )
+
+        print("\n=== OUTLIER THRESHOLDS BY USER TYPE ===")
+        print(outlier_thresholds)
 
-    print("\n=== OUTLIERS DETECTED (HEAD) ===")
-    print(outliers_df[["trip_duration_clean", "outlier_reason"]].head())
+    # Cadena de viajes por bici: tiempo activo, huecos y movimientos de rebalanceo
+    if df is not None and BIKE_COL in df.columns:
+        bike_chains = BikeChains.from_frame(df)
+        bike_utilization = bike_chains.utilization()
+        print("\n=== BIKE UTILIZATION (fleet) ===")
+        print(bike_utilization[["trips", "active_sec", "utilization", "teleports"]].describe())
+        print(f"Rebalancing moves (teleports): {int(bike_utilization['teleports'].sum()):,}")
 
-    print("\n=== OUTLIER SUMMARY (JSON-like) ===")
-    print(outliers_json)
+    if route_stats is not None:
+        print("\n=== TRAVEL TIMES OF THE BUSIEST ROUTES ===")
+        print(route_stats.table.nlargest(5, "trip_count"))
 
-    plot_hourly_demand(df)
-    plot_trip_duration_distribution(df)
-    plot_top_busiest_stations(df)
-    plot_user_type_comparison(df)
-    plot_daily_trips_decomposition(df)
+    # Los gráficos leen el cubo; el histograma de duración usa los viajes si están cargados
+    plot_hourly_demand(trip_cube.query(["start_hour"]))
+    plot_trip_duration_distribution(df if df is not None else trip_cube.query(["duration_bin"]))
+    plot_top_busiest_stations(
+        trip_cube.query(["start_station_normalized"]), station_col="start_station_normalized"
+    )
+    plot_user_type_comparison(trip_cube.query(["user_type_standardized"]))
+    plot_daily_trips_decomposition(trip_cube.query(["start_date"]))
 
     
     
 if __name__ == "__main__":
-     main()
+     args = parse_args()
+     main(
+         raw=args.raw,
+         chunksize=args.chunksize,
+         workers=args.workers,
+         incremental=args.incremental,
+         profile=args.profile,
+         cache=args.cache,
+     )
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from station_flow import station_codes
+from top_k import DENSE_MAX_CELLS
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+PAGERANK_DAMPING = 0.85
+
+
+class ODMatrix:
+    """
+    Origin-destination trip counts as a CSR matrix over integer station
+    codes (numpy only): the destinations of station i are
+    indices[indptr[i]:indptr[i + 1]], with their trip counts in `data`.
+
+    Built in one pass (one np.bincount over start * n + end codes), it
+    only stores the station pairs that have trips, a few MB for a year.
+    The network measures work on the sparse structure directly, with
+    matrix-vector products as bincounts over the non-zeros:
+
+        od = ODMatrix.from_frame(df)               # or TripCube.od_matrix(where=...)
+        od.pagerank()
+        od.station_table()                         # degrees, asymmetry, PageRank, community
+        od.top_routes(20)
+    """
+
+    def __init__(self, stations: pd.Index, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.stations = stations
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, weights=None) -> ODMatrix:
+        """
+        OD matrix of the trips in `df` (start/end normalized stations).
+        `weights` (a column name or array) sums it instead of counting rows,
+        e.g. "trip_count" on trip cube rows. Trips with a missing station
+        are left out.
+        """
+
+        start, end, stations = station_codes(df)
+        n = len(stations)
+        keep = (start >= 0) & (end >= 0)
+        cells = start[keep] * n + end[keep]
+
+        if isinstance(weights, str):
+            weights = df[weights].to_numpy()
+        weights = None if weights is None else np.asarray(weights)[keep]
+
+        if n * n <= DENSE_MAX_CELLS:
+            counts = np.bincount(cells, weights=weights, minlength=n * n)
+            cells = np.flatnonzero(counts)
+            counts = counts[cells]
+        else:
+            cells, inverse = np.unique(cells, return_inverse=True)
+            counts = np.bincount(inverse, weights=weights, minlength=len(cells))
+        if weights is None or weights.dtype.kind in "iub":
+            counts = np.rint(counts).astype("int64")
+
+        # cells are sorted, so they are already in row-major (CSR) order
+        rows, cols = np.divmod(cells, n)
+        indptr = np.zeros(n + 1, dtype="int64")
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        od = cls(stations, indptr, cols.astype("int32"), counts)
+
+        logger.info(
+            "OD matrix: %s stations, %s station pairs with trips (%.1f MB)",
+            n,
+            od.nnz,
+            od.nbytes / 1e6,
+        )
+        return od
+
+    @property
+    def n_stations(self) -> int:
+        return len(self.stations)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    @property
+    def rows(self) -> np.ndarray:
+        """Origin code of every non-zero."""
+        return np.repeat(np.arange(self.n_stations), np.diff(self.indptr))
+
+    def matvec(self, x: np.ndarray) -> np.ndarray:
+        """A @ x: per origin, the trip-weighted sum of x over its destinations."""
+        return np.bincount(self.rows, weights=self.data * x[self.indices], minlength=self.n_stations)
+
+    def rmatvec(self, x: np.ndarray) -> np.ndarray:
+        """A.T @ x: per destination, the trip-weighted sum of x over its origins."""
+        return np.bincount(self.indices, weights=self.data * x[self.rows], minlength=self.n_stations)
+
+    def transpose(self) -> ODMatrix:
+        """Destination → origin matrix (a stable counting sort of the non-zeros by column)."""
+
+        order = np.argsort(self.indices, kind="stable")
+        indptr = np.zeros(self.n_stations + 1, dtype="int64")
+        np.cumsum(np.bincount(self.indices, minlength=self.n_stations), out=indptr[1:])
+        return ODMatrix(self.stations, indptr, self.rows[order].astype("int32"), self.data[order])
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros((self.n_stations, self.n_stations), dtype=self.data.dtype)
+        dense[self.rows, self.indices] = self.data
+        return dense
+
+    def out_trips(self) -> np.ndarray:
+        return np.bincount(self.rows, weights=self.data, minlength=self.n_stations)
+
+    def in_trips(self) -> np.ndarray:
+        return np.bincount(self.indices, weights=self.data, minlength=self.n_stations)
+
+    def out_degree(self) -> np.ndarray:
+        """Number of distinct destinations of each station."""
+        return np.diff(self.indptr)
+
+    def in_degree(self) -> np.ndarray:
+        """Number of distinct origins of each station."""
+        return np.bincount(self.indices, minlength=self.n_stations)
+
+    def asymmetry(self) -> np.ndarray:
+        """
+        (out - in) / (out + in) trips per station: +1 only sends bikes away,
+        -1 only receives them, 0 is balanced. NaN for unused stations.
+        """
+
+        out, inn = self.out_trips(), self.in_trips()
+        total = out + inn
+        return np.divide(out - inn, total, out=np.full(self.n_stations, np.nan), where=total > 0)
+
+    def pagerank(self, damping: float = PAGERANK_DAMPING, tol: float = 1e-10, max_iter: int = 100) -> np.ndarray:
+        """
+        PageRank of the trip-weighted graph by power iteration: the share
+        of time a rider hopping along trips (with a 1 - damping chance of
+        restarting anywhere) spends at each station. Stations without
+        departures spread their rank uniformly.
+        """
+
+        n = self.n_stations
+        if not n:
+            return np.zeros(0)
+        out = self.out_trips()
+        # transition weight of every non-zero: its share of the origin's departures
+        share = self.data / out[self.rows]
+        dangling = out == 0
+
+        rank = np.full(n, 1.0 / n)
+        for iteration in range(max_iter):
+            spread = np.bincount(self.indices, weights=share * rank[self.rows], minlength=n)
+            new = damping * spread + (damping * rank[dangling].sum() + 1 - damping) / n
+            delta = np.abs(new - rank).sum()
+            rank = new
+            if delta < tol:
+                break
+        else:
+            logger.warning("PageRank did not converge in %s iterations (delta=%.2e)", max_iter, delta)
+        return rank / rank.sum()
+
+    def _undirected(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Edges (both directions) of the symmetrized graph, self-loops dropped."""
+
+        rows, cols = self.rows, self.indices.astype("int64")
+        loop = rows == cols
+        rows, cols, weight = rows[~loop], cols[~loop], self.data[~loop]
+        return np.concatenate([rows, cols]), np.concatenate([cols, rows]), np.concatenate([weight, weight])
+
+    def components(self, max_iter: int = 1_000) -> np.ndarray:
+        """
+        Connected component of every station (ignoring direction), by
+        propagating the smallest label over the edges until nothing
+        changes. Labels are renumbered 0..k-1 by first station.
+        """
+
+        src, dst, _ = self._undirected()
+        labels = np.arange(self.n_stations)
+        for _ in range(max_iter):
+            new = labels.copy()
+            np.minimum.at(new, dst, labels[src])
+            if np.array_equal(new, labels):
+                break
+            labels = new
+        return np.unique(labels, return_inverse=True)[1]
+
+    def communities(self, max_iter: int = 50, seed: int = 0) -> np.ndarray:
+        """
+        Communities of stations that trade many trips with each other, by
+        weighted label propagation on the symmetrized graph: every round,
+        each station takes the label with the most trips among its
+        neighbours (ties to the smaller label), in a random half of the
+        stations at a time so labels do not oscillate. Stops when no label
+        changes. Labels are renumbered 0..k-1 by first station; stations
+        without trips to others keep their own community.
+        """
+
+        n = self.n_stations
+        src, dst, weight = self._undirected()
+        labels = np.arange(n)
+        rng = np.random.default_rng(seed)
+
+        for _ in range(max_iter):
+            # trips from each station to each neighbouring label
+            keys, inverse = np.unique(src * n + labels[dst], return_inverse=True)
+            votes = np.bincount(inverse, weights=weight, minlength=len(keys))
+            station, label = np.divmod(keys, n)
+            # best label per station: most votes, then the smallest label
+            order = np.lexsort((label, -votes, station))
+            first = np.r_[True, station[order][1:] != station[order][:-1]]
+            best = labels.copy()
+            best[station[order][first]] = label[order][first]
+
+            move = (best != labels) & (rng.random(n) < 0.5)
+            if not (best != labels).any():
+                break
+            labels = np.where(move, best, labels)
+        return np.unique(labels, return_inverse=True)[1]
+
+    def pair_asymmetry(self, min_trips: int = 1) -> pd.DataFrame:
+        """
+        Every station pair with trips in either direction (each pair once,
+        with station_a < station_b by code): trips a → b, b → a and
+        (ab - ba) / (ab + ba).
+        """
+
+        n = self.n_stations
+        rows, cols = self.rows, self.indices.astype("int64")
+        keys = rows * n + cols
+        # CSR keys are sorted, so the reverse direction is a binary search
+        reverse = cols * n + rows
+        pos = np.minimum(np.searchsorted(keys, reverse), max(len(keys) - 1, 0))
+        back = np.where(keys[pos] == reverse, self.data[pos], 0) if len(keys) else self.data
+
+        # a pair seen from its smaller end, or from either end when only one direction exists
+        keep = ((rows < cols) | ((rows > cols) & (back == 0))) & (self.data + back >= min_trips)
+        a, b = np.minimum(rows, cols)[keep], np.maximum(rows, cols)[keep]
+        ab = np.where(rows[keep] < cols[keep], self.data[keep], back[keep])
+        ba = np.where(rows[keep] < cols[keep], back[keep], self.data[keep])
+        return pd.DataFrame({
+            "station_a": self.stations[a],
+            "station_b": self.stations[b],
+            "trips_ab": ab,
+            "trips_ba": ba,
+            "asymmetry": (ab - ba) / (ab + ba),
+        })
+
+    def top_routes(self, k: int = 10) -> pd.DataFrame:
+        """The k busiest origin → destination pairs (argpartition over the non-zeros)."""
+
+        k = min(k, self.nnz)
+        top = np.argpartition(-self.data, k - 1)[:k] if 0 < k < self.nnz else np.arange(k)
+        top = top[np.lexsort((top, -self.data[top]))]
+        return pd.DataFrame({
+            "start_station_normalized": self.stations[self.rows[top]],
+            "end_station_normalized": self.stations[self.indices[top]],
+            "trip_count": self.data[top],
+        })
+
+    def station_table(self) -> pd.DataFrame:
+        """One row per station: trips and degrees both ways, asymmetry, PageRank, community."""
+
+        return pd.DataFrame(
+            {
+                "out_trips": self.out_trips().astype(self.data.dtype),
+                "in_trips": self.in_trips().astype(self.data.dtype),
+                "out_degree": self.out_degree(),
+                "in_degree": self.in_degree(),
+                "asymmetry": self.asymmetry(),
+                "pagerank": self.pagerank(),
+                "community": self.communities(),
+            },
+            index=pd.Index(self.stations, name="station"),
+        )
@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterator, Sequence
+
+import pandas as pd
+
+from clean_store import CLEAN_STORE_FILENAME, CleanStoreWriter
+from data_loader import DEFAULT_CHUNKSIZE, iter_bike_data_chunks, resolve_raw_files
+from data_cleaning import (
+    standardize_user_type,
+    group_bike_model,
+    parse_datetime_columns,
+    clean_trip_duration,
+    clean_station_fields,
+)
+from feature_engineering import (
+    compute_distance_fields,
+    add_time_features,
+    add_weekend_flag,
+    add_rush_hour_flag,
+    add_calendar_fields,
+)
+from station_normalization import normalize_station_fields
+from profiling import PipelineProfiler
+from stage_cache import StageCache
+from top_k import StreamingTopK
+from concurrency import TripsInProgress
+from duration_sketch import DurationSketch
+from trip_cube import StreamingTripCube
+from station_dimension import (
+    build_station_dimension,
+    load_station_dimension,
+    merge_station_dimensions,
+    save_station_dimension,
+)
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+Stage = Callable[[pd.DataFrame], pd.DataFrame]
+
+_LAT_LON = (
+    "Start Station Latitude", "Start Station Longitude",
+    "End Station Latitude", "End Station Longitude",
+)
+
+
+@dataclass(frozen=True)
+class PipelineStage:
+    """
+    A pipeline step and the columns it reads and writes.
+
+    `inputs` may list optional columns; only those present are passed on.
+    """
+
+    func: Stage
+    inputs: tuple[str, ...]
+    outputs: tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        func = self.func.func if isinstance(self.func, partial) else self.func
+        return func.__name__
+
+
+# Order matters: later stages read the columns produced by earlier ones.
+CLEANING_STAGES: tuple[PipelineStage, ...] = (
+    PipelineStage(standardize_user_type, ("User Type",), ("user_type_standardized",)),
+    PipelineStage(group_bike_model, ("Model",), ("bike_model_group",)),
+    PipelineStage(parse_datetime_columns, ("Start Time", "End Time"), ("start_time", "end_time")),
+    PipelineStage(
+        clean_trip_duration,
+        ("Trip  Duration", "start_time", "end_time"),
+        ("computed_duration_sec", "trip_duration_clean"),
+    ),
+    PipelineStage(
+        clean_station_fields,
+        ("Start Station Id", "Start Station Name", "End Station Id", "End Station Name", *_LAT_LON),
+        ("start_station_name_clean", "end_station_name_clean"),
+    ),
+    PipelineStage(
+        normalize_station_fields,
+        ("start_station_name_clean", "end_station_name_clean"),
+        ("start_station_normalized", "end_station_normalized"),
+    ),
+)
+
+FEATURE_STAGES: tuple[PipelineStage, ...] = (
+    PipelineStage(
+        compute_distance_fields,
+        ("Start Station Id", "End Station Id", *_LAT_LON),
+        ("trip_distance_km",),
+    ),
+    PipelineStage(
+        add_time_features,
+        ("start_time",),
+        ("start_time", "start_hour", "start_day", "start_month", "start_weekday"),
+    ),
+    PipelineStage(add_weekend_flag, ("start_time",), ("is_weekend",)),
+    PipelineStage(add_rush_hour_flag, ("start_hour",), ("is_rush_hour",)),
+    PipelineStage(
+        add_calendar_fields,
+        ("start_time",),
+        ("start_date_key", "is_holiday", "season"),
+    ),
+)
+
+
+def run_stages(df: pd.DataFrame, stages: Sequence[PipelineStage]) -> pd.DataFrame:
+    """Plain chain: each stage function gets (and returns) the whole frame."""
+    for stage in stages:
+        df = stage.func(df)
+    return df
+
+
+def run_pipeline(
+    df: pd.DataFrame,
+    stages: Sequence[PipelineStage],
+    inplace: bool = False,
+    profiler: PipelineProfiler | None = None,
+    cache: StageCache | None = None,
+    input_key: str | None = None,
+) -> pd.DataFrame:
+    """
+    Run stages without full-frame copies.
+
+    Each stage only sees its declared input columns (a lazy selection under
+    pandas copy-on-write) and only its declared outputs are written back, so
+    the trip table is never duplicated. With inplace=True the outputs land
+    in `df` itself; otherwise in a shallow copy that shares column data.
+    With a `profiler`, every stage is timed and measured (see profiling.py).
+
+    With a `cache`, the outputs of every stage up to the first invalidated
+    one are read back from stage_cache.py and only the rest is executed.
+    `input_key` identifies `df` (StageCache.load_raw returns it); without
+    it the frame's contents are hashed.
+    """
+
+    if not inplace:
+        df = df.copy(deep=False)
+
+    start = 0
+    if cache is not None:
+        keys = cache.stage_keys(stages, input_key or cache.frame_key(df))
+        while start < len(stages) and cache.contains(keys[start]):
+            cached = cache.load(keys[start])
+            for col in cached.columns:
+                df[col] = cached[col]
+            start += 1
+        logger.info("Stage cache: reused %s of %s stages", start, len(stages))
+
+    for i in range(start, len(stages)):
+        stage = stages[i]
+        if profiler is None:
+            _run_stage(df, stage)
+        else:
+            with profiler.stage(stage.name, df):
+                _run_stage(df, stage)
+                profiler.set_output(df)
+
+        if cache is not None:
+            cache.store(keys[i], df[[c for c in stage.outputs if c in df.columns]])
+
+    return df
+
+
+def _run_stage(df: pd.DataFrame, stage: PipelineStage) -> None:
+    inputs = [c for c in stage.inputs if c in df.columns]
+    result = stage.func(df[inputs])
+
+    # stages may skip outputs they cannot compute (e.g. no lat/lon)
+    for col in stage.outputs:
+        if col in result.columns:
+            df[col] = result[col]
+
+
+def _station_dim_for(df: pd.DataFrame, station_dim: pd.DataFrame) -> pd.DataFrame | None:
+    """
+    The names in `station_dim` that clean_station_fields can use on `df`:
+    stations whose id appears without a name and that `df` never names
+    itself. Folding this frame into the dimension afterwards does not
+    change them, so a cached rerun on the same input keeps its stage keys.
+    """
+
+    missing, named = [], []
+    for side in ("Start", "End"):
+        id_col, name_col = f"{side} Station Id", f"{side} Station Name"
+        if id_col not in df.columns or name_col not in df.columns:
+            return station_dim
+        has_name = df[name_col].notna()
+        missing.append(df.loc[~has_name, id_col])
+        named.append(df.loc[has_name, id_col])
+
+    def ids(parts: list[pd.Series]) -> pd.Index:
+        return pd.Index(pd.concat(parts, ignore_index=True).unique()).dropna()
+
+    unnamed = ids(missing).difference(ids(named))
+    keep = station_dim.index.isin(unnamed) & station_dim["station_name"].notna().to_numpy()
+    return station_dim.loc[keep, ["station_name"]] if keep.any() else None
+
+
+def _with_station_dim(
+    stages: Sequence[PipelineStage],
+    station_dim: pd.DataFrame | None,
+    df: pd.DataFrame | None = None,
+) -> tuple[PipelineStage, ...]:
+    if station_dim is not None and df is not None:
+        station_dim = _station_dim_for(df, station_dim)
+    if station_dim is None:
+        return tuple(stages)
+    return tuple(
+        replace(stage, func=partial(clean_station_fields, station_dim=station_dim))
+        if stage.func is clean_station_fields else stage
+        for stage in stages
+    )
+
+
+def clean_bike_data(
+    df: pd.DataFrame,
+    station_dim: pd.DataFrame | None = None,
+    profiler: PipelineProfiler | None = None,
+) -> pd.DataFrame:
+    """
+    Raw trips -> cleaned trips (user type, model, datetimes, duration, stations).
+    `station_dim` fills station names this frame does not know.
+    """
+    return run_pipeline(df, _with_station_dim(CLEANING_STAGES, station_dim, df), profiler=profiler)
+
+
+def engineer_features(df: pd.DataFrame, profiler: PipelineProfiler | None = None) -> pd.DataFrame:
+    """Cleaned trips -> distance, time fields, weekend and rush-hour flags."""
+    return run_pipeline(df, FEATURE_STAGES, profiler=profiler)
+
+
+def process_bike_data(
+    df: pd.DataFrame,
+    station_dim: pd.DataFrame | None = None,
+    profiler: PipelineProfiler | None = None,
+    cache: StageCache | None = None,
+    input_key: str | None = None,
+) -> pd.DataFrame:
+    """Full cleaning + feature-engineering chain on an in-memory frame."""
+    stages = _with_station_dim(CLEANING_STAGES + FEATURE_STAGES, station_dim, df)
+    return run_pipeline(df, stages, profiler=profiler, cache=cache, input_key=input_key)
+
+
+def stream_processed_chunks(
+    filename: str | Sequence[str],
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    profiler: PipelineProfiler | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield fully processed chunks of the raw file(s). `filename` may also be
+    a glob or a list; files are streamed one after another in sorted order.
+
+    Only one chunk is alive at a time, so peak memory follows `chunksize`
+    rather than the size of the dataset. Station names missing in a chunk
+    are filled from the persisted station dimension, which grows with every
+    chunk and is saved once the stream is exhausted.
+
+    With a `profiler`, reading each chunk is recorded as "load_bike_data".
+    """
+
+    station_dim = load_station_dimension()
+
+    for path in resolve_raw_files(filename):
+        chunks = iter_bike_data_chunks(path, chunksize=chunksize)
+        if profiler is not None:
+            chunks = _profiled_chunks(chunks, profiler)
+
+        for i, chunk in enumerate(chunks):
+            logger.info("Processing %s chunk %s (%s rows)", path.name, i, len(chunk))
+            yield process_bike_data(chunk, station_dim=station_dim, profiler=profiler)
+            station_dim = merge_station_dimensions(station_dim, build_station_dimension(chunk))
+
+    save_station_dimension(station_dim)
+
+
+def _profiled_chunks(
+    chunks: Iterator[pd.DataFrame],
+    profiler: PipelineProfiler,
+) -> Iterator[pd.DataFrame]:
+    while True:
+        with profiler.stage("load_bike_data"):
+            chunk = next(chunks, None)
+            if chunk is not None:
+                profiler.set_output(chunk)
+        if chunk is None:
+            # the last, empty read is not a stage run
+            profiler.records.pop()
+            return
+        yield chunk
+
+
+def run_streaming_pipeline(
+    filename: str | Sequence[str] = "toronto-bike.csv",
+    output_filename: str = CLEAN_STORE_FILENAME,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    profiler: PipelineProfiler | None = None,
+    top_k_trackers: Sequence[StreamingTopK] = (),
+    duration_sketches: Sequence[DurationSketch] = (),
+    concurrency: Sequence[TripsInProgress] = (),
+    trip_cubes: Sequence[StreamingTripCube] = (),
+) -> Path:
+    """
+    Process `filename` chunk by chunk and append every chunk to the clean store.
+    The previous store is replaced once the last chunk has been written.
+
+    `top_k_trackers` (e.g. StreamingTopK("start_station_normalized",
+    by="user_type_standardized")) see every processed chunk, giving
+    approximate peak stations/routes without reloading the store.
+    Likewise `duration_sketches` collect duration quantiles and moments,
+    `concurrency` counters the trips in progress over time, and
+    `trip_cubes` roll every chunk up into the trip cube.
+    """
+
+    n_chunks = 0
+    with CleanStoreWriter(output_filename) as writer:
+        for chunk in stream_processed_chunks(filename, chunksize=chunksize, profiler=profiler):
+            writer.write(chunk)
+            for tracker in (*top_k_trackers, *duration_sketches, *concurrency, *trip_cubes):
+                tracker.update(chunk)
+            n_chunks += 1
+
+    logger.info(
+        "Streaming pipeline done: %s rows in %s chunks written to %s",
+        writer.rows_written,
+        n_chunks,
+        writer.path,
+    )
+
+    return writer.path
@@ -2,12 +2,15 @@ from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
 from typing import Tuple
-from utils import save_fig
+from trip_cube import count_trips
+from utils import PLOTS_DIR, save_fig
+
+TIME_PLOTS_DIR = PLOTS_DIR / "time_based_analysis"
 
 def plot_trips_per_hour(df: pd.DataFrame,
-                        out_dir="outputs/plots/time_based_analysis",
+                        out_dir=TIME_PLOTS_DIR,
                         figsize: Tuple[int, int] = (10, 5)):
-    hourly = df.groupby("start_hour").size()
+    hourly = count_trips(df, "start_hour")
     fig, ax = plt.subplots(figsize=figsize)
     ax.bar(hourly.index, hourly.values)
     ax.set_title("Trips per Hour")
@@ -20,14 +23,13 @@ def plot_trips_per_hour(df: pd.DataFrame,
 
 
 def plot_trips_per_weekday(df: pd.DataFrame,
-                           out_dir="outputs/plots/time_based_analysis",
+                           out_dir=TIME_PLOTS_DIR,
                            figsize: Tuple[int, int] = (10, 5)):
     weekday_order = ["Monday", "Tuesday", "Wednesday",
                      "Thursday", "Friday", "Saturday", "Sunday"]
 
     weekday_counts = (
-        df["start_weekday"]
-        .value_counts()
+        count_trips(df, "start_weekday")
         .reindex(weekday_order)
         .fillna(0)
     )
@@ -42,9 +44,9 @@ def plot_trips_per_weekday(df: pd.DataFrame,
     
 
 def plot_trips_per_month(df: pd.DataFrame,
-                         out_dir="outputs/plots/time_based_analysis",
+                         out_dir=TIME_PLOTS_DIR,
                          figsize: Tuple[int, int] = (10, 5)):
-    monthly = df.groupby("start_month").size()
+    monthly = count_trips(df, "start_month")
 
     fig, ax = plt.subplots(figsize=figsize)
     ax.plot(monthly.index, monthly.values, marker="o")
@@ -1,10 +1,11 @@
 import pandas as pd
 import plotly.express as px
 
+from trip_cube import count_trips
+
 def plotly_trips_per_hour(df: pd.DataFrame):
     hourly = (
-        df.groupby("start_hour")
-        .size()
+        count_trips(df, "start_hour")
         .reset_index(name="trip_count")
         .sort_values("start_hour")
     )
@@ -24,8 +25,7 @@ def plotly_trips_per_weekday(df: pd.DataFrame):
                      "Thursday", "Friday", "Saturday", "Sunday"]
 
     weekday_counts = (
-        df["start_weekday"]
-        .value_counts()
+        count_trips(df, "start_weekday")
         .reindex(weekday_order)
         .fillna(0)
         .reset_index()
@@ -44,8 +44,7 @@ def plotly_trips_per_weekday(df: pd.DataFrame):
 
 def plotly_trips_per_month(df: pd.DataFrame):
     monthly = (
-        df.groupby("start_month")
-        .size()
+        count_trips(df, "start_month")
         .reset_index(name="trip_count")
         .sort_values("start_month")
     )
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from utils import OUTPUTS_DIR, _ensure_dir, get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_OUT_DIR = OUTPUTS_DIR / "profiling"
+_MB = 1024 * 1024
+
+
+@dataclass
+class StageProfile:
+    stage: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    tracemalloc_peak_mb: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    frame_mb: float = 0.0
+
+
+class PipelineProfiler:
+    """
+    Opt-in per-stage instrumentation for the pipeline.
+
+    Records wall time, CPU time, tracemalloc peak (allocations made during
+    the stage, above what was already allocated), rows in/out and the
+    working frame's memory footprint. Pass it to run_pipeline /
+    process_bike_data; a stage that runs several times (one per chunk)
+    gets one record per run, summed up in `summary()`.
+
+    tracemalloc sees Python and numpy allocations, not Arrow buffers, and
+    slows allocation-heavy code down, so compare reports with each other,
+    not with unprofiled wall times.
+    """
+
+    def __init__(self, trace_memory: bool = True, deep_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.deep_memory = deep_memory
+        self.records: list[StageProfile] = []
+        self._output: pd.DataFrame | None = None
+        self._started_tracing = False
+
+    def __enter__(self) -> PipelineProfiler:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def set_output(self, df: pd.DataFrame) -> None:
+        """Frame the current stage produced; measured once the timers stop."""
+        self._output = df
+
+    @contextmanager
+    def stage(self, name: str, df: pd.DataFrame | None = None) -> Iterator[StageProfile]:
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        record = StageProfile(stage=name, rows_in=0 if df is None else len(df))
+        self._output = None
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        yield record
+
+        record.wall_s = time.perf_counter() - wall_start
+        record.cpu_s = time.process_time() - cpu_start
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            record.tracemalloc_peak_mb = max(peak - traced_before, 0) / _MB
+
+        output, self._output = self._output, None
+        if output is not None:
+            record.rows_out = len(output)
+            record.frame_mb = output.memory_usage(deep=self.deep_memory).sum() / _MB
+
+        self.records.append(record)
+
+    def summary(self) -> pd.DataFrame:
+        """One row per stage in first-run order; chunked runs are summed."""
+
+        columns = [f for f in StageProfile.__dataclass_fields__]
+        records = pd.DataFrame([asdict(r) for r in self.records], columns=columns)
+
+        summary = records.groupby("stage", sort=False).agg(
+            runs=("stage", "size"),
+            wall_s=("wall_s", "sum"),
+            cpu_s=("cpu_s", "sum"),
+            tracemalloc_peak_mb=("tracemalloc_peak_mb", "max"),
+            rows_in=("rows_in", "sum"),
+            rows_out=("rows_out", "sum"),
+            frame_mb=("frame_mb", "max"),
+        ).reset_index()
+
+        total_wall = summary["wall_s"].sum()
+        summary["wall_pct"] = 100 * summary["wall_s"] / total_wall if total_wall else 0.0
+
+        return summary
+
+    def report(self) -> dict:
+        summary = self.summary()
+        return {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "trace_memory": self.trace_memory,
+            "totals": {
+                "wall_s": float(summary["wall_s"].sum()),
+                "cpu_s": float(summary["cpu_s"].sum()),
+                "tracemalloc_peak_mb": float(summary["tracemalloc_peak_mb"].max()) if len(summary) else 0.0,
+            },
+            "stages": summary.to_dict(orient="records"),
+        }
+
+    def to_text(self) -> str:
+        summary = self.summary()
+        totals = pd.DataFrame([{
+            "stage": "TOTAL",
+            "wall_s": summary["wall_s"].sum(),
+            "cpu_s": summary["cpu_s"].sum(),
+            "tracemalloc_peak_mb": summary["tracemalloc_peak_mb"].max() if len(summary) else 0.0,
+            "wall_pct": summary["wall_pct"].sum(),
+        }])
+        table = pd.concat([summary, totals], ignore_index=True)
+
+        formatters = {
+            col: (lambda v: "" if pd.isna(v) else f"{int(v):,}")
+            for col in ("runs", "rows_in", "rows_out")
+        }
+        return table.to_string(index=False, na_rep="", formatters=formatters, float_format="{:.3f}".format)
+
+    def write_report(
+        self,
+        out_dir: str | Path = PROFILE_OUT_DIR,
+        name: str | None = None,
+    ) -> tuple[Path, Path]:
+        """
+        Write <name>.json and <name>.txt. The default name carries a UTC
+        timestamp, so successive runs accumulate for regression tracking.
+        """
+
+        out_path = _ensure_dir(out_dir)
+        name = name or "pipeline_profile_" + datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+
+        json_path = out_path / f"{name}.json"
+        with open(json_path, "w") as fh:
+            json.dump(self.report(), fh, indent=2, default=float)
+
+        text_path = out_path / f"{name}.txt"
+        text_path.write_text(self.to_text() + "\n")
+
+        logger.info("Saved pipeline profile to %s and %s", json_path, text_path)
+        return json_path, text_path
+
+
+def profile_pipeline(
+    raw: str | None = "toronto-bike.csv",
+    n_rows: int | None = None,
+    out_dir: str | Path = PROFILE_OUT_DIR,
+    trace_memory: bool = True,
+) -> PipelineProfiler:
+    """
+    Profile load_bike_data plus every cleaning and feature stage on a raw
+    file, or on `n_rows` synthetic trips when `n_rows` is given.
+    """
+
+    from data_loader import load_bike_data
+    from pipeline import process_bike_data
+
+    with PipelineProfiler(trace_memory=trace_memory) as profiler:
+        if n_rows is not None:
+            from benchmark import make_synthetic_raw_trips
+
+            with profiler.stage("make_synthetic_raw_trips"):
+                df = make_synthetic_raw_trips(n_rows)
+                profiler.set_output(df)
+        else:
+            with profiler.stage("load_bike_data"):
+                df = load_bike_data(raw)
+                profiler.set_output(df)
+
+        process_bike_data(df, profiler=profiler)
+        profiler.write_report(out_dir)
+
+    return profiler
+
+
+if __name__ == "__main__":
+    # python src/profiling.py --raw toronto-bike.csv
+    # python src/profiling.py --rows 5000000
+    parser = argparse.ArgumentParser(description="Per-stage pipeline profile (JSON + text table)")
+    parser.add_argument("--raw", default="toronto-bike.csv")
+    parser.add_argument("--rows", type=int, default=None, help="Profile synthetic trips instead of --raw.")
+    parser.add_argument("--out-dir", default=PROFILE_OUT_DIR)
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip allocation tracing (faster).")
+    args = parser.parse_args()
+
+    result = profile_pipeline(
+        args.raw,
+        n_rows=args.rows,
+        out_dir=args.out_dir,
+        trace_memory=not args.no_tracemalloc,
+    )
+    print(result.to_text())
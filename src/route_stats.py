@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CLEAN_DATA_DIR
+from group_aggregates import FactorizedKeys, grouped_quantiles
+from station_distance import DENSE_MAX_STATIONS, LOOKUP_MAX_ID
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+ROUTE_STATS_FILENAME = "route_stats.parquet"
+START_ID_COL = "Start Station Id"
+END_ID_COL = "End Station Id"
+
+ROUTE_QUANTILES = (0.1, 0.5, 0.9)
+# measure column in the trip table -> prefix of its quantile columns
+ROUTE_MEASURES = {"trip_duration_clean": "duration_sec", "trip_distance_km": "distance_km"}
+
+
+def _ids(values: pd.Series) -> np.ndarray:
+    """Station ids as int64, -1 where missing."""
+    return pd.to_numeric(values, errors="coerce").astype("Int64").to_numpy(dtype="int64", na_value=-1)
+
+
+def _quantile_columns(prefix: str, q: Sequence[float] = ROUTE_QUANTILES) -> list[str]:
+    return [f"{prefix}_p{round(p * 100)}" for p in q]
+
+
+def build_route_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (start station id, end station id) pair with trips: the
+    trip count, p10 / median / p90 of trip duration and distance, and the
+    implied speed (median distance over median duration, km/h).
+
+    Pairs are integer group ids from FactorizedKeys and every quantile
+    comes from one sort of the values by (pair, value) in
+    group_aggregates.grouped_quantiles, not a groupby-apply per route.
+    Rows come out sorted by (start, end) id; trips with a missing station
+    id are left out.
+    """
+
+    by = [START_ID_COL, END_ID_COL]
+    known = df[by].notna().all(axis=1).to_numpy()
+    if not known.all():
+        df = df[known]
+
+    keys = FactorizedKeys(df, by)
+    stats = keys.aggregate(by, count="trip_count").rename(
+        columns={START_ID_COL: "start_station_id", END_ID_COL: "end_station_id"}
+    )
+    codes, _ = keys.group_ids(by)
+
+    for column, prefix in ROUTE_MEASURES.items():
+        values = pd.to_numeric(df[column], errors="coerce").to_numpy(na_value=np.nan)
+        has_value = ~np.isnan(values)
+        quantiles = grouped_quantiles(codes[has_value], values[has_value], len(stats), ROUTE_QUANTILES)
+        for name, column_values in zip(_quantile_columns(prefix), quantiles.T):
+            stats[name] = column_values
+
+    median_hours = stats["duration_sec_p50"] / 3600
+    stats["speed_kmh"] = stats["distance_km_p50"] / median_hours.where(median_hours > 0)
+
+    logger.info("Route stats: %s routes from %s trips", len(stats), len(df))
+    return stats
+
+
+def route_stats_path() -> Path:
+    return CLEAN_DATA_DIR / ROUTE_STATS_FILENAME
+
+
+def save_route_stats(stats: pd.DataFrame) -> Path:
+    path = route_stats_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    stats.to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+    logger.info("Saved route stats to %s", path)
+    return path
+
+
+class RouteStats:
+    """
+    Route statistics table with O(1) lookups by (start station id, end
+    station id): station ids map to positions through a direct lookup
+    array, and position pairs to table rows through a dense n × n index.
+    Above DENSE_MAX_STATIONS stations the pair falls back to a binary
+    search over the sorted pair codes.
+
+        routes = RouteStats(build_route_stats(df))   # or RouteStats.load()
+        routes.get(7000, 7001)                       # one route as a Series
+        routes.lookup(df["Start Station Id"], df["End Station Id"])
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table.reset_index(drop=True)
+        start = self.table["start_station_id"].to_numpy(dtype="int64")
+        end = self.table["end_station_id"].to_numpy(dtype="int64")
+
+        self.station_ids = np.unique(np.concatenate([start, end]))
+        n = len(self.station_ids)
+        self._id_lookup = None
+        if n and 0 <= self.station_ids[0] and self.station_ids[-1] < LOOKUP_MAX_ID:
+            # station id -> position; a trailing slot maps unknown ids to -1
+            self._id_lookup = np.full(self.station_ids[-1] + 2, -1, dtype="int64")
+            self._id_lookup[self.station_ids] = np.arange(n)
+
+        pair_codes = np.searchsorted(self.station_ids, start) * n + np.searchsorted(self.station_ids, end)
+        self._pair_index = None
+        self._pair_codes = self._pair_rows = None
+        if n <= DENSE_MAX_STATIONS:
+            self._pair_index = np.full(n * n, -1, dtype="int32")
+            self._pair_index[pair_codes] = np.arange(len(pair_codes))
+        else:
+            order = np.argsort(pair_codes)
+            self._pair_codes, self._pair_rows = pair_codes[order], order
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> RouteStats:
+        path = route_stats_path() if path is None else Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"No route stats in {path}. Run main.py to build them.")
+        return cls(pd.read_parquet(path))
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def _positions(self, ids) -> np.ndarray:
+        ids = np.atleast_1d(ids)
+        ids = ids.astype("int64") if ids.dtype.kind in "iu" else _ids(pd.Series(ids))
+        if self._id_lookup is not None:
+            ids[(ids < 0) | (ids >= len(self._id_lookup) - 1)] = -1
+            return self._id_lookup[ids]
+        if not len(self.station_ids):
+            return np.full(len(ids), -1, dtype="int64")
+        pos = np.minimum(np.searchsorted(self.station_ids, ids), len(self.station_ids) - 1)
+        return np.where(self.station_ids[pos] == ids, pos, -1)
+
+    def rows(self, start_ids, end_ids) -> np.ndarray:
+        """Table row of every (start id, end id) pair; -1 for routes without trips."""
+
+        start, end = self._positions(start_ids), self._positions(end_ids)
+        known = (start >= 0) & (end >= 0)
+        codes = np.where(known, start * len(self.station_ids) + end, 0)
+
+        if self._pair_index is not None:
+            rows = self._pair_index[codes] if len(self._pair_index) else np.full(len(codes), -1)
+        else:
+            pos = np.minimum(np.searchsorted(self._pair_codes, codes), len(self._pair_codes) - 1)
+            rows = np.where(self._pair_codes[pos] == codes, self._pair_rows[pos], -1)
+        return np.where(known, rows, -1)
+
+    def lookup(self, start_ids, end_ids) -> pd.DataFrame:
+        """Stats of every requested route, aligned with the input (NaN for unknown routes)."""
+
+        rows = self.rows(start_ids, end_ids)
+        found = self.table.iloc[np.maximum(rows, 0)].reset_index(drop=True)
+        found = found.astype({"trip_count": "float64"}).where(pd.Series(rows >= 0))
+        found["start_station_id"] = _ids(pd.Series(np.atleast_1d(start_ids)))
+        found["end_station_id"] = _ids(pd.Series(np.atleast_1d(end_ids)))
+        return found
+
+    def get(self, start_id: int, end_id: int) -> pd.Series:
+        """Stats of one route; KeyError when no trip ran on it."""
+
+        row = self.rows(start_id, end_id)[0]
+        if row < 0:
+            raise KeyError(f"No trips from station {start_id} to station {end_id}")
+        return self.table.iloc[row]
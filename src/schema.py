@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import re
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+
+WEEKDAY_ORDER = [
+    "Monday", "Tuesday", "Wednesday",
+    "Thursday", "Friday", "Saturday", "Sunday",
+]
+
+# Fixed category sets keep chunks and files dtype-compatible, so they can be
+# concatenated without falling back to object.
+USER_TYPE_DTYPE = pd.CategoricalDtype(["Annual", "Casual", "Unknown"])
+BIKE_MODEL_DTYPE = pd.CategoricalDtype(["EFIT", "EFIT G5", "ICONIC", "Unknown"])
+WEEKDAY_DTYPE = pd.CategoricalDtype(WEEKDAY_ORDER, ordered=True)
+SEASON_DTYPE = pd.CategoricalDtype(["Winter", "Spring", "Summer", "Fall"], ordered=True)
+
+# Raw columns as published by Bike Share Toronto.
+# Ids are nullable because "End Station Id" is sometimes blank.
+RAW_SCHEMA: dict[str, object] = {
+    "Trip Id": "Int32",
+    "Trip  Duration": "float32",
+    "Start Station Id": "Int32",
+    "Start Time": "category",
+    "Start Station Name": "category",
+    "End Station Id": "Int32",
+    "End Time": "category",
+    "End Station Name": "category",
+    "Bike Id": "Int32",
+    "User Type": "category",
+    "Model": "category",
+    "Start Station Latitude": "float32",
+    "Start Station Longitude": "float32",
+    "End Station Latitude": "float32",
+    "End Station Longitude": "float32",
+}
+
+# Columns added by the cleaning and feature stages. start_time / end_time are
+# already 8-byte datetimes and are left as parsed.
+DERIVED_SCHEMA: dict[str, object] = {
+    "user_type_standardized": USER_TYPE_DTYPE,
+    "bike_model_group": BIKE_MODEL_DTYPE,
+    "computed_duration_sec": "float32",
+    "trip_duration_clean": "float32",
+    "start_station_name_clean": "category",
+    "end_station_name_clean": "category",
+    "start_station_normalized": "category",
+    "end_station_normalized": "category",
+    "trip_distance_km": "float32",
+    "start_hour": "int8",
+    "start_day": "int8",
+    "start_month": "int8",
+    "start_weekday": WEEKDAY_DTYPE,
+    "is_weekend": "bool",
+    "is_rush_hour": "bool",
+    "start_date_key": "int32",
+    "is_holiday": "bool",
+    "season": SEASON_DTYPE,
+    "source_file": "category",
+}
+
+TRIP_SCHEMA: dict[str, object] = {**RAW_SCHEMA, **DERIVED_SCHEMA}
+
+# Header spellings drift between monthly drops ("Trip  Duration" vs
+# "Trip Duration", BOMs, snake_case). Headers are matched on lowercase
+# alphanumerics only; the aliases cover the older open-data layout.
+_RAW_HEADER_ALIASES = {
+    "tripdurationseconds": "Trip  Duration",
+    "tripstarttime": "Start Time",
+    "tripstoptime": "End Time",
+    "tripendtime": "End Time",
+    "fromstationid": "Start Station Id",
+    "fromstationname": "Start Station Name",
+    "tostationid": "End Station Id",
+    "tostationname": "End Station Name",
+    "bikemodel": "Model",
+}
+
+
+def _header_key(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+_RAW_HEADER_KEYS = {
+    **{_header_key(col): col for col in RAW_SCHEMA},
+    **_RAW_HEADER_ALIASES,
+}
+
+
+def canonical_column_name(name: str) -> str:
+    """Map a raw header spelling to its RAW_SCHEMA name; unknown headers pass through."""
+    return _RAW_HEADER_KEYS.get(_header_key(name), name)
+
+
+def canonical_column_mapping(columns: Iterable[str]) -> dict[str, str]:
+    """{raw header: canonical name} for the headers that need renaming."""
+    mapping = {}
+    for col in columns:
+        canonical = canonical_column_name(col)
+        if canonical != col:
+            mapping[col] = canonical
+    return mapping
+
+# numpy ints cannot hold NaN, so columns with gaps use the nullable variant
+_NULLABLE_INTS = {"int8": "Int8", "int16": "Int16", "int32": "Int32", "int64": "Int64"}
+
+
+def _target_dtype(series: pd.Series, dtype: object) -> object:
+    if isinstance(dtype, str) and dtype in _NULLABLE_INTS and series.isna().any():
+        return _NULLABLE_INTS[dtype]
+    if dtype == "bool" and series.isna().any():
+        return "boolean"
+    return dtype
+
+
+def apply_schema(df: pd.DataFrame, columns: Iterable[str] | None = None) -> pd.DataFrame:
+    """
+    Cast columns to their TRIP_SCHEMA dtype.
+
+    With `columns`, only those columns are cast (stages pass the columns they
+    produce). Columns missing from the frame or from the schema are ignored.
+    """
+
+    names = TRIP_SCHEMA.keys() if columns is None else columns
+    casts = {}
+    for col in names:
+        if col not in df.columns or col not in TRIP_SCHEMA:
+            continue
+        dtype = _target_dtype(df[col], TRIP_SCHEMA[col])
+        if df[col].dtype != dtype:
+            casts[col] = dtype
+
+    if not casts:
+        return df
+
+    return df.astype(casts)
+
+
+def raw_read_dtypes(columns: Iterable[str] | None = None) -> dict[str, object]:
+    """
+    dtype mapping for pd.read_csv; columns absent from a file are ignored.
+    With the file's own `columns`, keys use the file's header spelling.
+    """
+    if columns is None:
+        return dict(RAW_SCHEMA)
+
+    return {
+        col: RAW_SCHEMA[canonical_column_name(col)]
+        for col in columns
+        if canonical_column_name(col) in RAW_SCHEMA
+    }
+
+
+def concat_trip_frames(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate trip frames without losing categoricals.
+
+    pd.concat falls back to object when categories differ (e.g. station names
+    from different months), so those columns get a shared category set first.
+    """
+
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame()
+
+    unified = {}
+    for col in frames[0].columns:
+        dtypes = [f[col].dtype for f in frames if col in f.columns]
+        if len(dtypes) != len(frames):
+            continue
+        if not all(isinstance(t, pd.CategoricalDtype) for t in dtypes):
+            continue
+        if all(t == dtypes[0] for t in dtypes):
+            continue
+        categories = union_categoricals(
+            [pd.Categorical([], dtype=t) for t in dtypes], ignore_order=True
+        ).categories
+        unified[col] = pd.CategoricalDtype(categories, ordered=dtypes[0].ordered)
+
+    if unified:
+        frames = [f.astype(unified) for f in frames]
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-column memory footprint as stored vs after apply_schema.
+
+    Columns: column, dtype, bytes, schema_dtype, schema_bytes, saved_pct.
+    The last row holds the totals.
+    """
+
+    typed = apply_schema(df)
+    current = df.memory_usage(index=False, deep=True)
+    optimized = typed.memory_usage(index=False, deep=True)
+
+    report = pd.DataFrame({
+        "column": df.columns,
+        "dtype": [str(t) for t in df.dtypes],
+        "bytes": current.values,
+        "schema_dtype": [str(t) for t in typed.dtypes],
+        "schema_bytes": optimized.values,
+    })
+
+    total = pd.DataFrame({
+        "column": ["TOTAL"],
+        "dtype": [""],
+        "bytes": [int(current.sum())],
+        "schema_dtype": [""],
+        "schema_bytes": [int(optimized.sum())],
+    })
+    report = pd.concat([report, total], ignore_index=True)
+
+    saved = 100 * (1 - report["schema_bytes"] / report["bytes"].replace(0, np.nan))
+    report["saved_pct"] = saved.round(1).fillna(0.0)
+
+    logger.info(
+        "Memory report: %.1f MB as stored -> %.1f MB with schema",
+        report["bytes"].iloc[-1] / 1e6,
+        report["schema_bytes"].iloc[-1] / 1e6,
+    )
+
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+
+    from data_loader import load_bike_data
+
+    # Compare untyped pandas defaults against the schema on a real file:
+    #   python src/schema.py toronto-bike.csv
+    filename = sys.argv[1] if len(sys.argv) > 1 else "toronto-bike.csv"
+    untyped = load_bike_data(filename, dtype=None)
+    with pd.option_context("display.width", 160, "display.max_rows", 100):
+        print(memory_report(untyped).to_string(index=False))
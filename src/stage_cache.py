@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import os
+from functools import partial
+from pathlib import Path
+from types import CodeType
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CLEAN_DATA_DIR, load_bike_data, _raw_file_path
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# CLEAN_DATA_DIR/stage_cache/<key>.parquet holds the declared output columns
+# of one pipeline stage (or the whole raw frame for the load step).
+STAGE_CACHE_SUBDIR = "stage_cache"
+STAGE_CACHE_MAX_BYTES = 2 * 1024**3
+# Bump to invalidate every entry, e.g. after a change the code hash cannot see
+STAGE_CACHE_VERSION = 1
+
+_SRC_DIR = Path(__file__).resolve().parent
+_HASHABLE_CONSTANTS = (str, bytes, int, float, bool, tuple, frozenset, list, dict, pd.CategoricalDtype)
+
+
+def _sha256(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a frame: column names, dtypes, index and values."""
+    row_hashes = pd.util.hash_pandas_object(df, index=True, categorize=True).to_numpy()
+    schema = repr([(str(c), str(t)) for c, t in df.dtypes.items()])
+    return _sha256(schema, hashlib.sha256(row_hashes.tobytes()).hexdigest())
+
+
+def _global_names(code: CodeType) -> Iterable[str]:
+    yield from code.co_names
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            yield from _global_names(const)
+
+
+def _is_repo_code(value) -> bool:
+    if not (inspect.isfunction(value) or inspect.isclass(value)):
+        return False
+    module = inspect.getmodule(value)
+    module_file = getattr(module, "__file__", None)
+    return module_file is not None and Path(module_file).resolve().parent == _SRC_DIR
+
+
+def code_fingerprint(func) -> str:
+    """
+    Hash of a stage's source, including the repo helpers and module-level
+    constants it refers to (recursively), e.g. apply_schema and the dtypes
+    in schema.py. Library code is covered by the pandas/numpy versions.
+    """
+
+    parts: list[str] = []
+    seen: set[int] = set()
+
+    def visit(obj) -> None:
+        if isinstance(obj, partial):
+            visit(obj.func)
+            return
+        if id(obj) in seen:
+            return
+        seen.add(id(obj))
+
+        try:
+            parts.append(inspect.getsource(obj))
+        except (OSError, TypeError):
+            parts.append(repr(obj))
+            return
+        if not inspect.isfunction(obj):
+            return
+
+        for name in dict.fromkeys(_global_names(obj.__code__)):
+            value = obj.__globals__.get(name)
+            if _is_repo_code(value):
+                visit(value)
+            elif isinstance(value, _HASHABLE_CONSTANTS):
+                parts.append(f"{name}={value!r}")
+
+    visit(func)
+    return _sha256(*parts)
+
+
+def _param_token(value) -> str:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return frame_fingerprint(value.to_frame() if isinstance(value, pd.Series) else value)
+    return repr(value)
+
+
+def stage_fingerprint(func) -> str:
+    """Code fingerprint plus the keyword parameters bound with functools.partial."""
+    params = func.keywords if isinstance(func, partial) else {}
+    tokens = [f"{k}={_param_token(v)}" for k, v in sorted(params.items())]
+    return _sha256(code_fingerprint(func), *tokens)
+
+
+class StageCache:
+    """
+    Content-addressed, size-bounded cache of pipeline stage outputs.
+
+    A stage's key hashes the key of its input (the raw file's content hash,
+    chained through every earlier stage), the stage's code fingerprint and
+    its parameters. Editing one stage therefore invalidates that stage and
+    everything after it, and run_pipeline resumes from there. Least recently
+    used entries are evicted once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str | Path | None = None, max_bytes: int = STAGE_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else CLEAN_DATA_DIR / STAGE_CACHE_SUBDIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.parquet"
+
+    def contains(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def load(self, key: str) -> pd.DataFrame:
+        path = self.path(key)
+        df = pd.read_parquet(path)
+        # mtime doubles as the LRU clock
+        os.utime(path)
+        self.hits += 1
+        return df
+
+    def store(self, key: str, df: pd.DataFrame) -> Path:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        df.to_parquet(tmp_path)
+        tmp_path.replace(path)
+        self.misses += 1
+
+        self.evict(keep=(key,))
+        return path
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*.parquet"))
+
+    def evict(self, keep: Sequence[str] = ()) -> list[Path]:
+        """Delete least recently used entries until the cache fits in max_bytes."""
+
+        if not self.cache_dir.exists():
+            return []
+
+        entries = sorted(
+            ((p, p.stat()) for p in self.cache_dir.glob("*.parquet")),
+            key=lambda entry: entry[1].st_mtime_ns,
+        )
+        total = sum(stat.st_size for _, stat in entries)
+
+        removed = []
+        for path, stat in entries:
+            if total <= self.max_bytes:
+                break
+            if path.stem in keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+            removed.append(path)
+
+        if removed:
+            logger.info("Stage cache: evicted %s entries, %.1f MB left", len(removed), total / 1e6)
+        return removed
+
+    def clear(self) -> None:
+        for path in self.cache_dir.glob("*.parquet"):
+            path.unlink()
+
+    def frame_key(self, df: pd.DataFrame) -> str:
+        return _sha256(self._environment(), "frame", frame_fingerprint(df))
+
+    def stage_keys(self, stages: Sequence, input_key: str) -> list[str]:
+        """One key per stage, each chained on the key before it."""
+        keys, key = [], input_key
+        for stage in stages:
+            key = _sha256(key, stage.name, stage_fingerprint(stage.func))
+            keys.append(key)
+        return keys
+
+    def load_raw(self, filename: str | Path, **kwargs) -> tuple[pd.DataFrame, str]:
+        """
+        load_bike_data through the cache. Returns the frame and its key,
+        which is the `input_key` to hand to run_pipeline.
+        """
+
+        from incremental import file_fingerprint
+
+        path = _raw_file_path(filename)
+        key = _sha256(
+            self._environment(),
+            "load_bike_data",
+            file_fingerprint(path)["sha256"],
+            code_fingerprint(load_bike_data),
+            repr(sorted(kwargs.items())),
+        )
+
+        if self.contains(key):
+            logger.info("Stage cache: raw frame of %s reused", path.name)
+            return self.load(key), key
+
+        df = load_bike_data(path, **kwargs)
+        self.store(key, df)
+        return df, key
+
+    @staticmethod
+    def _environment() -> str:
+        return f"v{STAGE_CACHE_VERSION}-pandas{pd.__version__}-numpy{np.__version__}"
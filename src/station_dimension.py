@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+from data_loader import CLEAN_DATA_DIR
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# station id -> name / latitude / longitude, kept across runs and raw files
+STATION_DIM_FILENAME = "station_dim.parquet"
+STATION_DIM_COLUMNS = ["station_name", "latitude", "longitude"]
+
+
+def empty_station_dimension() -> pd.DataFrame:
+    dim = pd.DataFrame(
+        {
+            "station_name": pd.Series(dtype=object),
+            "latitude": pd.Series(dtype="float32"),
+            "longitude": pd.Series(dtype="float32"),
+        },
+        index=pd.Index([], dtype="Int32", name="station_id"),
+    )
+    return dim
+
+
+def build_station_dimension(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    First non-null name (and lat/lon, when present) per station id, learned
+    from both the start and the end columns. Start observations win.
+    """
+
+    dim = empty_station_dimension()
+
+    for side in ("Start", "End"):
+        id_col = f"{side} Station Id"
+        if id_col not in df.columns:
+            continue
+
+        source = {
+            f"{side} Station Name": "station_name",
+            f"{side} Station Latitude": "latitude",
+            f"{side} Station Longitude": "longitude",
+        }
+        source = {k: v for k, v in source.items() if k in df.columns}
+        if not source:
+            continue
+
+        # groupby.first skips missing values column by column
+        side_dim = (
+            df.groupby(id_col, observed=True)[list(source)]
+              .first()
+              .rename(columns=source)
+        )
+        side_dim.index = side_dim.index.astype("Int32").rename("station_id")
+        if "station_name" in side_dim.columns:
+            side_dim["station_name"] = side_dim["station_name"].astype(object)
+
+        dim = merge_station_dimensions(dim, side_dim)
+
+    return dim
+
+
+def merge_station_dimensions(primary: pd.DataFrame, fallback: pd.DataFrame) -> pd.DataFrame:
+    """Union of two dimensions; `primary` values win, gaps are filled from `fallback`."""
+
+    if fallback.empty:
+        return primary
+    if primary.empty:
+        return fallback.reindex(columns=STATION_DIM_COLUMNS)
+
+    merged = primary.combine_first(fallback).reindex(columns=STATION_DIM_COLUMNS)
+    merged.index.name = "station_id"
+
+    return merged
+
+
+def station_dimension_path() -> Path:
+    return CLEAN_DATA_DIR / STATION_DIM_FILENAME
+
+
+def load_station_dimension() -> pd.DataFrame:
+    path = station_dimension_path()
+    if not path.exists():
+        return empty_station_dimension()
+
+    dim = pd.read_parquet(path)
+    dim["station_name"] = dim["station_name"].astype(object)
+    return dim
+
+
+def save_station_dimension(dim: pd.DataFrame) -> Path:
+    path = station_dimension_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    dim = dim.astype({"latitude": "float32", "longitude": "float32"})
+    dim.to_parquet(path)
+    logger.info("Saved station dimension (%s stations) to %s", len(dim), path)
+
+    return path
+
+
+def update_station_dimension(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fold the stations seen in `df` into the persisted dimension. Names already
+    on disk are kept; new stations and missing fields are added.
+    """
+
+    dim = merge_station_dimensions(load_station_dimension(), build_station_dimension(df))
+    save_station_dimension(dim)
+
+    return dim
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+EARTH_RADIUS_KM = 6371
+
+# Above this many stations the n x n matrix (64 MB in float32 at 4096) is
+# not worth it; distances are then computed per distinct trip pair instead.
+DENSE_MAX_STATIONS = 4096
+# Station ids up to this value are mapped to table rows with a direct
+# lookup array rather than a binary search.
+LOOKUP_MAX_ID = 1 << 22
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km between coordinate arrays (degrees)."""
+
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype="float64")) for a in (lat1, lon1, lat2, lon2))
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2 +
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(a))
+
+
+def _ids_array(ids) -> np.ndarray:
+    """Station ids as int64, -1 where missing (real ids are positive). Always a new array."""
+    ids = pd.Series(ids)
+    if pd.api.types.is_integer_dtype(ids.dtype):
+        # to_numpy can hand back a read-only view of an int64 column
+        return np.array(ids.to_numpy(dtype="int64", na_value=-1), copy=True)
+    ids = pd.to_numeric(ids, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return np.where(np.isnan(ids), -1, ids).astype("int64")
+
+
+def station_coordinates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    First known latitude/longitude per station id, from both trip sides
+    (start observations win). Index: station_id, sorted.
+    """
+
+    sides = []
+    for side in ("Start", "End"):
+        ids = _ids_array(df[f"{side} Station Id"])
+        lat = df[f"{side} Station Latitude"].to_numpy(na_value=np.nan)
+        lon = df[f"{side} Station Longitude"].to_numpy(na_value=np.nan)
+
+        rows = np.flatnonzero((ids >= 0) & ~(np.isnan(lat) | np.isnan(lon)))
+        # first valid row per station; only those few hundred rows are gathered
+        rows = rows[~pd.Series(ids[rows]).duplicated().to_numpy()]
+        sides.append(pd.DataFrame(
+            {"latitude": lat[rows].astype("float64"), "longitude": lon[rows].astype("float64")},
+            index=pd.Index(ids[rows], name="station_id"),
+        ))
+
+    start, end = sides
+    coords = pd.concat([start, end[~end.index.isin(start.index)]])
+
+    return coords.sort_index()
+
+
+@dataclass(frozen=True)
+class StationDistanceTable:
+    """
+    Distances between every pair of known stations.
+
+    Trips only run between a few hundred stations, so the haversine is
+    evaluated once per station pair (dense matrix) and per-trip distances
+    are an integer-indexed gather.
+    """
+
+    station_ids: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+    # (n + 1) x (n + 1); the last row and column are NaN for unknown stations
+    matrix: np.ndarray | None
+    dtype: np.dtype
+    # station id -> row; a trailing slot maps out-of-range ids to "unknown"
+    id_lookup: np.ndarray | None
+
+    @classmethod
+    def from_coordinates(cls, coords: pd.DataFrame, dtype: str = "float32") -> StationDistanceTable:
+        coords = coords.dropna(subset=["latitude", "longitude"]).sort_index()
+        station_ids = coords.index.to_numpy(dtype="int64")
+        lat = coords["latitude"].to_numpy(dtype="float64")
+        lon = coords["longitude"].to_numpy(dtype="float64")
+        n = len(station_ids)
+
+        matrix = None
+        if n <= DENSE_MAX_STATIONS:
+            matrix = np.full((n + 1, n + 1), np.nan, dtype=dtype)
+            matrix[:n, :n] = haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+        id_lookup = None
+        if n and 0 <= station_ids[0] and station_ids[-1] < LOOKUP_MAX_ID:
+            id_lookup = np.full(station_ids[-1] + 2, n, dtype="int64")
+            id_lookup[station_ids] = np.arange(n)
+
+        return cls(station_ids, lat, lon, matrix, np.dtype(dtype), id_lookup)
+
+    def _rows(self, ids) -> np.ndarray:
+        """Table row of each station id; len(station_ids) when unknown or missing."""
+
+        ids = _ids_array(ids)
+        n = len(self.station_ids)
+        if n == 0:
+            return np.zeros(len(ids), dtype="int64")
+
+        if self.id_lookup is not None:
+            # missing / out-of-range ids read the trailing "unknown" slot
+            ids = np.where((ids < 0) | (ids >= len(self.id_lookup) - 1), -1, ids)
+            return self.id_lookup.take(ids)
+
+        pos = np.searchsorted(self.station_ids, ids)
+        pos[pos >= n] = 0
+        found = (ids >= 0) & (self.station_ids.take(pos) == ids)
+        return np.where(found, pos, n)
+
+    def positions(self, ids) -> np.ndarray:
+        """Row of each station id in the table, -1 when unknown or missing."""
+        rows = self._rows(ids)
+        rows[rows == len(self.station_ids)] = -1
+        return rows
+
+    def lookup(self, start_ids, end_ids) -> np.ndarray:
+        """Per-trip distance in km; NaN where either station is not in the table."""
+
+        start = self._rows(start_ids)
+        end = self._rows(end_ids)
+        n = len(self.station_ids)
+
+        if self.matrix is not None:
+            # flat index into the padded matrix: one gather, no masks
+            start *= n + 1
+            start += end
+            return self.matrix.take(start)
+
+        # Too many stations for a matrix: one haversine per distinct pair
+        out = np.full(len(start), np.nan, dtype=self.dtype)
+        known = (start < n) & (end < n)
+        pair_codes, inverse = np.unique(start[known] * n + end[known], return_inverse=True)
+        s, e = np.divmod(pair_codes, n)
+        per_pair = haversine_km(self.latitude[s], self.longitude[s], self.latitude[e], self.longitude[e])
+        out[known] = per_pair.astype(self.dtype).take(inverse)
+        return out
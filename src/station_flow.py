@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+START_COL = "start_station_normalized"
+END_COL = "end_station_normalized"
+
+# Views a StationFlow can return, all stations × hours.
+FLOW_VIEWS = ("departures", "arrivals", "net_flow", "drift")
+
+# Orders the station pages can be sorted by (from StationFlow.totals).
+PAGE_SORTS = ("abs_net_flow", "net_flow", "departures", "arrivals", "max_drift", "min_drift", "station")
+
+
+def station_codes(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, pd.Index]:
+    """
+    Codes of the start and end stations in one shared, sorted station
+    index (-1 where missing). Categorical columns are recoded through
+    their categories, so no per-row strings are hashed.
+    """
+
+    def categories(col: str) -> pd.Index:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return pd.Index(values.cat.categories.astype(str))
+        return pd.Index(values.dropna().astype(str).unique())
+
+    stations = categories(START_COL).union(categories(END_COL)).sort_values()
+
+    def codes(col: str) -> np.ndarray:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            recode = np.append(stations.get_indexer(values.cat.categories.astype(str)), -1)
+            return recode[values.cat.codes.to_numpy(dtype="int64")]
+        return stations.get_indexer(values.astype(str).where(values.notna()))
+
+    return codes(START_COL), codes(END_COL), stations
+
+
+def _hours(times: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Hours since the epoch (floored) and which rows have a time."""
+    values = times.to_numpy(dtype="datetime64[ns]")
+    return values.astype("datetime64[h]").astype("int64"), ~np.isnat(values)
+
+
+def _hour_number(timestamp, ceil: bool = False) -> int:
+    timestamp = pd.Timestamp(timestamp)
+    timestamp = timestamp.ceil("h") if ceil else timestamp.floor("h")
+    return int(timestamp.to_datetime64().astype("datetime64[h]").astype("int64"))
+
+
+class StationFlow:
+    """
+    Departures, arrivals and net flow (departures - arrivals) per station
+    and hour, as dense stations × hours matrices over integer codes.
+
+    A trip departs from its start station in the hour of start_time and
+    arrives at its end station in the hour of end_time. Each matrix is a
+    single np.bincount over (station code, hour) cells, so a year of trips
+    for every station takes a couple of seconds and no groupby.
+
+    `drift` is the implied change in bikes docked at the station (arrivals
+    - departures, i.e. -net_flow) accumulated since the last reset, e.g.
+    since the crews' rebalancing round at 04:00 every morning:
+
+        flow = StationFlow.from_frame(df)
+        flow.page(0, page_size=25, view="drift", reset_hours=4)
+        flow.station("Union Station", start="2024-07-01", end="2024-07-08")
+    """
+
+    def __init__(self, stations: pd.Index, hours: pd.DatetimeIndex, departures: np.ndarray, arrivals: np.ndarray):
+        self.stations = stations
+        self.hours = hours
+        self.departures = departures
+        self.arrivals = arrivals
+        self.net_flow = departures - arrivals
+        self._station_pos = pd.Series(np.arange(len(stations)), index=stations)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, start=None, end=None) -> StationFlow:
+        """
+        Flow matrices over the hours in [start, end) (default: every hour a
+        trip starts or ends in). Events outside the window are dropped.
+        """
+
+        start_codes, end_codes, stations = station_codes(df)
+        dep_hours, dep_valid = _hours(df["start_time"])
+        arr_hours, arr_valid = _hours(df["end_time"])
+
+        seen = np.concatenate([dep_hours[dep_valid], arr_hours[arr_valid]])
+        first = _hour_number(start) if start is not None else int(seen.min()) if len(seen) else 0
+        last = _hour_number(end, ceil=True) if end is not None else int(seen.max()) + 1 if len(seen) else 0
+        n_stations, n_hours = len(stations), max(last - first, 0)
+
+        def counts(codes: np.ndarray, hours: np.ndarray, valid: np.ndarray) -> np.ndarray:
+            hours = hours - first
+            keep = valid & (codes >= 0) & (hours >= 0) & (hours < n_hours)
+            cells = codes[keep] * n_hours + hours[keep]
+            return np.bincount(cells, minlength=n_stations * n_hours).astype("int32").reshape(n_stations, n_hours)
+
+        hours = pd.date_range(pd.Timestamp(first, unit="h"), periods=n_hours, freq="h")
+        flow = cls(stations, hours, counts(start_codes, dep_hours, dep_valid), counts(end_codes, arr_hours, arr_valid))
+        logger.info(
+            "Station flow: %s stations × %s hours, %s departures / %s arrivals counted",
+            n_stations,
+            n_hours,
+            int(flow.departures.sum()),
+            int(flow.arrivals.sum()),
+        )
+        return flow
+
+    def _reset_mask(self, reset_hours: int | Sequence[int] | None, resets: Sequence | None) -> np.ndarray:
+        mask = np.zeros(len(self.hours), dtype=bool)
+        if reset_hours is not None:
+            mask |= np.isin(self.hours.hour, np.atleast_1d(reset_hours))
+        if resets is not None:
+            pos = self.hours.get_indexer(pd.DatetimeIndex(resets).floor("h"))
+            mask[pos[pos >= 0]] = True
+        return mask
+
+    def drift(
+        self,
+        reset_hours: int | Sequence[int] | None = None,
+        resets: Sequence | None = None,
+        rows: np.ndarray | slice = slice(None),
+    ) -> np.ndarray:
+        """
+        Cumulative arrivals - departures per station (of `rows`), restarting
+        from 0 at the start of every hour of the day in `reset_hours` and at
+        every timestamp in `resets` (floored to the hour). With neither, it
+        runs over the whole window.
+        """
+
+        total = np.cumsum(-self.net_flow[rows], axis=1, dtype="int64")
+        mask = self._reset_mask(reset_hours, resets)
+        if not mask.any():
+            return total
+
+        # subtract the running total just before the latest reset; before the
+        # first reset that is column 0 of `before`, which is 0
+        before = np.zeros_like(total)
+        before[:, 1:] = total[:, :-1]
+        last_reset = np.maximum.accumulate(np.where(mask, np.arange(len(mask)), 0))
+        return total - before[:, last_reset]
+
+    def _window(self, start, end) -> slice:
+        lo = self.hours.searchsorted(pd.Timestamp(start)) if start is not None else 0
+        hi = self.hours.searchsorted(pd.Timestamp(end)) if end is not None else len(self.hours)
+        return slice(lo, hi)
+
+    def view(self, view: str = "net_flow", reset_hours: int | Sequence[int] | None = None, resets: Sequence | None = None) -> np.ndarray:
+        if view not in FLOW_VIEWS:
+            raise ValueError(f"view must be one of {FLOW_VIEWS}, got {view!r}")
+        if view == "drift":
+            return self.drift(reset_hours, resets)
+        return getattr(self, view)
+
+    def totals(self, reset_hours: int | Sequence[int] | None = None, resets: Sequence | None = None) -> pd.DataFrame:
+        """Per-station departures, arrivals, net flow and drift range over the whole window."""
+
+        drift = self.drift(reset_hours, resets)
+        has_hours = drift.shape[1] > 0
+        totals = pd.DataFrame({
+            "station": self.stations,
+            "departures": self.departures.sum(axis=1, dtype="int64"),
+            "arrivals": self.arrivals.sum(axis=1, dtype="int64"),
+            "max_drift": drift.max(axis=1) if has_hours else 0,
+            "min_drift": drift.min(axis=1) if has_hours else 0,
+        })
+        totals.insert(3, "net_flow", totals["departures"] - totals["arrivals"])
+        return totals
+
+    def n_pages(self, page_size: int = 50) -> int:
+        return -(-len(self.stations) // page_size)
+
+    def page(
+        self,
+        page: int = 0,
+        page_size: int = 50,
+        view: str = "net_flow",
+        sort_by: str = "abs_net_flow",
+        start=None,
+        end=None,
+        reset_hours: int | Sequence[int] | None = None,
+        resets: Sequence | None = None,
+    ) -> pd.DataFrame:
+        """
+        One page of stations (rows) × hours in [start, end) (columns) of
+        `view`. Stations are ordered by `sort_by` over the whole window
+        (largest first, "station" alphabetically), so pages are stable
+        while the dashboard scrolls through time. Drift is accumulated
+        over the whole window before the hours are cut, so a window does
+        not restart it.
+        """
+
+        if sort_by not in PAGE_SORTS:
+            raise ValueError(f"sort_by must be one of {PAGE_SORTS}, got {sort_by!r}")
+
+        if sort_by == "station":
+            order = np.arange(len(self.stations))
+        else:
+            totals = self.totals(reset_hours, resets) if sort_by.endswith("drift") else self.totals()
+            key = totals["net_flow"].abs() if sort_by == "abs_net_flow" else totals[sort_by]
+            key = -key if sort_by != "min_drift" else key
+            order = np.argsort(key.to_numpy(), kind="stable")
+        rows = order[page * page_size:(page + 1) * page_size]
+
+        window = self._window(start, end)
+        if view == "drift":
+            values = self.drift(reset_hours, resets, rows=rows)[:, window]
+        else:
+            values = self.view(view)[rows, window]
+        return pd.DataFrame(values, index=pd.Index(self.stations[rows], name="station"), columns=self.hours[window])
+
+    def station(
+        self,
+        station: str,
+        start=None,
+        end=None,
+        reset_hours: int | Sequence[int] | None = None,
+        resets: Sequence | None = None,
+    ) -> pd.DataFrame:
+        """Hourly departures, arrivals, net flow and drift of one station."""
+
+        if station not in self._station_pos.index:
+            raise KeyError(f"Unknown station: {station!r}")
+        row = self._station_pos[station]
+        window = self._window(start, end)
+        drift = self.drift(reset_hours, resets, rows=[row])[0]
+        return pd.DataFrame(
+            {
+                "departures": self.departures[row, window],
+                "arrivals": self.arrivals[row, window],
+                "net_flow": self.net_flow[row, window],
+                "drift": drift[window],
+            },
+            index=pd.Index(self.hours[window], name="hour"),
+        )
@@ -1,15 +1,18 @@
 import pandas as pd
+import numpy as np
 import re
+from functools import lru_cache
 from utils import get_logger
 
 logger = get_logger(__name__)
 
+UNKNOWN_STATION = "Unknown Station"
 
-def normalize_station_name(name: str | float) -> str:
-    if pd.isna(name):
-        return "Unknown Station"
 
-    name = str(name).strip()
+@lru_cache(maxsize=8192)
+def _normalize_station_text(name: str) -> str:
+    # Memoized: there are only ~800 distinct stations, shared across calls/chunks
+    name = name.strip()
     name = name.replace("&", "and")
     name = re.sub(r"\s+", " ", name)
     name = name.strip(" ,.;:/\\")
@@ -18,8 +21,30 @@ def normalize_station_name(name: str | float) -> str:
     return name
 
 
+def normalize_station_name(name: str | float) -> str:
+    if pd.isna(name):
+        return UNKNOWN_STATION
+
+    return _normalize_station_text(str(name))
+
+
+def _codes_and_uniques(series: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, uniques = pd.factorize(series)
+    return codes, pd.Index(uniques)
+
+
 def normalize_station_fields(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    """
+    Add start/end_station_normalized.
+
+    Names are normalized once per distinct value, not once per trip. Both
+    output columns are categoricals over one shared category index, so a
+    station has the same integer code whether it is an origin or a destination.
+    """
+
+    df = df.copy(deep=False)
 
     if "start_station_name_clean" not in df or "end_station_name_clean" not in df:
         logger.warning(
@@ -27,9 +52,30 @@ def normalize_station_fields(df: pd.DataFrame) -> pd.DataFrame:
         )
         return df
 
-    df["start_station_normalized"] = df["start_station_name_clean"].apply(normalize_station_name)
-    df["end_station_normalized"] = df["end_station_name_clean"].apply(normalize_station_name)
+    sides = {
+        "start_station_normalized": _codes_and_uniques(df["start_station_name_clean"]),
+        "end_station_normalized": _codes_and_uniques(df["end_station_name_clean"]),
+    }
+
+    normalized = {
+        col: [normalize_station_name(name) for name in uniques]
+        for col, (_, uniques) in sides.items()
+    }
+    # missing names (code -1) normalize to the unknown label
+    needs_unknown = any((codes < 0).any() for codes, _ in sides.values())
+
+    categories = set().union(*normalized.values())
+    if needs_unknown:
+        categories.add(UNKNOWN_STATION)
+    shared = pd.CategoricalDtype(sorted(categories))
+
+    for col, (codes, _) in sides.items():
+        to_shared = shared.categories.get_indexer(normalized[col])
+        if needs_unknown:
+            to_shared = np.append(to_shared, shared.categories.get_loc(UNKNOWN_STATION))
+        # code -1 picks the appended unknown slot
+        df[col] = pd.Categorical.from_codes(to_shared.take(codes), dtype=shared)
 
     logger.info("Normalized station names for consistency.")
 
-    return df
\ No newline at end of file
+    return df
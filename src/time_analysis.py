@@ -1,9 +1,12 @@
 import pandas as pd
 
+from concurrency import TripsInProgress
+from trip_cube import count_trips
+
+
 def trips_per_hour(df: pd.DataFrame) -> pd.DataFrame:
     return (
-        df.groupby("start_hour")
-        .size()
+        count_trips(df, "start_hour")
         .reset_index(name="trip_count")
         .sort_values("start_hour")
     )
@@ -15,8 +18,7 @@ def trips_per_weekday(df: pd.DataFrame) -> pd.DataFrame:
         "Thursday", "Friday", "Saturday", "Sunday"
     ]
     return (
-        df.groupby("start_weekday")
-        .size()
+        count_trips(df, "start_weekday")
         .reindex(weekday_order)
         .fillna(0)
         .reset_index(name="trip_count")
@@ -25,8 +27,7 @@ def trips_per_weekday(df: pd.DataFrame) -> pd.DataFrame:
 
 def trips_per_month(df: pd.DataFrame) -> pd.DataFrame:
     return (
-        df.groupby("start_month")
-        .size()
+        count_trips(df, "start_month")
         .reset_index(name="trip_count")
         .sort_values("start_month")
     )
@@ -37,13 +38,18 @@ def trips_by_user_type(df: pd.DataFrame) -> pd.DataFrame:
         raise KeyError("Missing User Type column. Expected values: Casual, Member")
 
     return (
-        df.groupby("User Type")
-        .size()
+        count_trips(df, "User Type")
         .reset_index(name="trip_count")
         .sort_values("trip_count", ascending=False)
     )
 
 
+def peak_trips_in_progress_per_day(source: pd.DataFrame | TripsInProgress) -> pd.DataFrame:
+    """Daily peak of bikes out at once, from trips or a prebuilt TripsInProgress."""
+    counter = source if isinstance(source, TripsInProgress) else TripsInProgress.from_frame(source)
+    return counter.daily_peaks()
+
+
 
 
 # import pandas as pd
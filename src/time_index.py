@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+TIME_INDEX_COLUMN = "start_time"
+
+
+def _sorted_prefix(values: np.ndarray) -> int | None:
+    """
+    Number of non-NaT values if they are ascending and every NaT comes
+    after them (the layout sort_by_time produces), otherwise None.
+    """
+
+    missing = np.isnat(values)
+    n_valid = len(values) - int(missing.sum())
+    if missing[:n_valid].any():
+        return None
+    valid = values[:n_valid]
+    if n_valid > 1 and (valid[1:] < valid[:-1]).any():
+        return None
+    return n_valid
+
+
+def is_sorted_by_time(df: pd.DataFrame, column: str = TIME_INDEX_COLUMN) -> bool:
+    return _sorted_prefix(df[column].to_numpy()) is not None
+
+
+def sort_by_time(df: pd.DataFrame, column: str = TIME_INDEX_COLUMN) -> pd.DataFrame:
+    """
+    Rows in ascending `column` order (stable, NaT last) with a fresh
+    RangeIndex. Returns `df` itself when it is already in that order.
+    """
+
+    if column not in df.columns or is_sorted_by_time(df, column):
+        return df
+    return df.sort_values(column, kind="stable", na_position="last", ignore_index=True)
+
+
+def _as_datetime64(value, dtype: np.dtype) -> np.datetime64:
+    """
+    `value` in the index's own unit; a mismatched unit would make
+    searchsorted cast the whole array. Rounding up keeps "time >= value"
+    exact for times stored at that resolution.
+    """
+    unit = np.datetime_data(dtype)[0]
+    return pd.Timestamp(value).ceil(unit).to_datetime64().astype(dtype)
+
+
+class TimeIndex:
+    """
+    Time-range access to a frame sorted by start_time.
+
+    Every window is two binary searches (O(log n)) and the result is a
+    positional slice of the frame, so nothing is scanned or copied.
+    Windows are half-open, [start, end); `days` covers whole calendar days
+    including the last one.
+
+        index = TimeIndex(df)
+        index.days("2024-07-01", "2024-07-31")         # all of July
+        index.window("2024-07-01 07:00", "2024-07-01 10:00")
+    """
+
+    def __init__(self, df: pd.DataFrame, column: str = TIME_INDEX_COLUMN):
+        values = df[column].to_numpy()
+        n_valid = _sorted_prefix(values)
+        if n_valid is None:
+            logger.warning("Frame is not sorted by %s; sorting it for the time index", column)
+            df = sort_by_time(df, column)
+            values = df[column].to_numpy()
+            n_valid = _sorted_prefix(values)
+
+        self.frame = df
+        self.column = column
+        self._times = values[:n_valid]
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    @property
+    def first(self) -> pd.Timestamp | None:
+        return pd.Timestamp(self._times[0]) if len(self._times) else None
+
+    @property
+    def last(self) -> pd.Timestamp | None:
+        return pd.Timestamp(self._times[-1]) if len(self._times) else None
+
+    def bounds(self, start=None, end=None) -> tuple[int, int]:
+        """Row positions [lo, hi) of the trips with start <= time < end."""
+
+        times = self._times
+        lo = 0 if start is None else int(np.searchsorted(times, _as_datetime64(start, times.dtype), side="left"))
+        hi = len(times) if end is None else int(np.searchsorted(times, _as_datetime64(end, times.dtype), side="left"))
+        return lo, max(lo, hi)
+
+    def day_bounds(self, first_day, last_day=None) -> tuple[int, int]:
+        """Row positions of every trip on first_day .. last_day, both inclusive."""
+        last_day = first_day if last_day is None else last_day
+        return self.bounds(
+            pd.Timestamp(first_day).normalize(),
+            pd.Timestamp(last_day).normalize() + pd.Timedelta(days=1),
+        )
+
+    def window(self, start=None, end=None) -> pd.DataFrame:
+        lo, hi = self.bounds(start, end)
+        return self.frame.iloc[lo:hi]
+
+    def days(self, first_day, last_day=None) -> pd.DataFrame:
+        lo, hi = self.day_bounds(first_day, last_day)
+        return self.frame.iloc[lo:hi]
+
+    def count(self, start=None, end=None) -> int:
+        lo, hi = self.bounds(start, end)
+        return hi - lo
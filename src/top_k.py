@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Up to this many (group, item) cells the counts live in one dense bincount
+# array (128 MB of float64); above it only the distinct cells are counted.
+DENSE_MAX_CELLS = 1 << 24
+
+
+def _codes(values: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    """Integer code per row (-1 for missing) and the labels the codes index."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(dtype="int64"), values.cat.categories
+    codes, uniques = pd.factorize(values)
+    return codes.astype("int64"), pd.Index(uniques)
+
+
+def _weights(df: pd.DataFrame, weights) -> np.ndarray | None:
+    if weights is None:
+        return None
+    values = df[weights] if isinstance(weights, str) else pd.Series(weights)
+    return values.to_numpy(dtype="float64", na_value=0)
+
+
+def _count_cells(df: pd.DataFrame, keys: Sequence[str], weights):
+    """
+    Counts per combination of `keys` codes. Returns (counts, cells, labels,
+    sizes): `cells` is None when `counts` is dense over every combination,
+    otherwise it holds the flat code of each count.
+    """
+
+    codes, labels = zip(*(_codes(df[key]) for key in keys))
+    sizes = tuple(len(l) for l in labels)
+    w = _weights(df, weights)
+
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    if not valid.all():
+        codes = [c[valid] for c in codes]
+        w = None if w is None else w[valid]
+
+    n_cells = int(np.prod(sizes, dtype="float64"))
+    if n_cells <= DENSE_MAX_CELLS:
+        flat = np.ravel_multi_index(codes, sizes) if len(keys) > 1 else codes[0]
+        return np.bincount(flat, weights=w, minlength=n_cells), None, labels, sizes
+
+    # mixed-radix code without ravel_multi_index's bounds on the product
+    flat = codes[0]
+    for c, size in zip(codes[1:], sizes[1:]):
+        flat = flat * size + c
+    cells, inverse = np.unique(flat, return_inverse=True)
+    return np.bincount(inverse, weights=w, minlength=len(cells)), cells, labels, sizes
+
+
+def _decode(cells: np.ndarray, keys: Sequence[str], labels, sizes) -> dict[str, pd.Index]:
+    out, rest = {}, cells
+    for key, label, size in reversed(list(zip(keys, labels, sizes))):
+        rest, code = np.divmod(rest, size)
+        out[key] = label.take(code)
+    return {key: out[key] for key in keys}
+
+
+def _as_counts(counts: np.ndarray, weights) -> np.ndarray:
+    if weights is None or np.allclose(counts, np.round(counts)):
+        return np.round(counts).astype("int64")
+    return counts
+
+
+def _n_items(sizes, by) -> int:
+    return int(np.prod(sizes[1:] if by else sizes, dtype="float64"))
+
+
+def _top_cells(counts, cells, n_groups: int, n_items: int, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Flat codes and counts of the k largest nonzero cells of every group,
+    ordered by group, count descending, code.
+    """
+
+    if cells is None:
+        # dense: one row of counters per group, partitioned row by row
+        matrix = counts.reshape(n_groups, n_items)
+        if k < n_items:
+            top = np.argpartition(-matrix, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n_items), (n_groups, n_items))
+        winners = (np.arange(n_groups)[:, None] * n_items + top).ravel()
+        winner_counts = counts[winners]
+    else:
+        # too many cells for a dense array: rank the distinct ones per group
+        groups = cells // n_items
+        order = np.lexsort((cells, -counts, groups))
+        sorted_groups = groups[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_groups, sorted_groups, side="left")
+        selected = order[rank < k]
+        winners, winner_counts = cells[selected], counts[selected]
+
+    keep = winner_counts > 0
+    winners, winner_counts = winners[keep], winner_counts[keep]
+    order = np.lexsort((winners, -winner_counts, winners // n_items))
+    return winners[order], winner_counts[order]
+
+
+def top_k(
+    df: pd.DataFrame,
+    columns: str | Sequence[str],
+    k: int = 10,
+    by: str | None = None,
+    weights=None,
+    name: str = "trip_count",
+) -> pd.DataFrame:
+    """
+    The `k` most frequent values of `columns` (one column, or a pair such
+    as start/end station for routes), per value of `by` if given.
+
+    Rows are counted on integer codes with bincount and the winners picked
+    with argpartition, so nothing is sorted but the k winners and only
+    their labels are materialized. `weights` (a column name or array)
+    turns counts into sums, e.g. "trip_count" on trip cube rows.
+
+    Result: [by], *columns, name; groups in code order, counts descending
+    (ties by code). Rows with a missing key are not counted.
+    """
+
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    keys = ([by] if by else []) + columns
+    counts, cells, labels, sizes = _count_cells(df, keys, weights)
+
+    n_groups = sizes[0] if by else 1
+    winners, winner_counts = _top_cells(counts, cells, n_groups, _n_items(sizes, by), k)
+
+    result = pd.DataFrame(_decode(winners, keys, labels, sizes))
+    result[name] = _as_counts(winner_counts, weights)
+    return result
+
+
+class SpaceSaving:
+    """
+    Mergeable Space-Saving summary: at most `capacity` items with an
+    overestimated count and its error bound, so that
+    count - error <= true count <= count. Any item whose true count
+    exceeds total / capacity is guaranteed to be kept.
+
+    Updates take a whole chunk's top items at once (the merge of two
+    summaries, Agarwal et al.), so the per-trip loop of the textbook
+    version becomes a few vectorized index operations per chunk.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="float64")
+        self.errors = pd.Series(dtype="float64")
+        # upper bound on the count of any item not in the summary
+        self.floor = 0.0
+
+    def merge(self, other: SpaceSaving) -> SpaceSaving:
+        if self.counts.empty:
+            index = other.counts.index
+        elif other.counts.empty:
+            index = self.counts.index
+        else:
+            index = self.counts.index.union(other.counts.index)
+
+        counts = self.counts.reindex(index).fillna(self.floor) + other.counts.reindex(index).fillna(other.floor)
+        errors = self.errors.reindex(index).fillna(self.floor) + other.errors.reindex(index).fillna(other.floor)
+        floor = self.floor + other.floor
+
+        if len(counts) > self.capacity:
+            counts = counts.nlargest(self.capacity + 1, keep="first")
+            floor = max(floor, float(counts.iloc[-1]))
+            counts = counts.iloc[:-1]
+
+        self.counts, self.errors, self.floor = counts, errors[counts.index], floor
+        return self
+
+    def update(self, counts: pd.Series, floor: float = 0.0) -> SpaceSaving:
+        """
+        Add exact counts of one chunk's items. When only the chunk's top
+        items are passed, `floor` bounds the count of the ones left out.
+        """
+
+        chunk = SpaceSaving(self.capacity)
+        chunk.counts = counts.astype("float64")
+        chunk.errors = pd.Series(0.0, index=counts.index)
+        chunk.floor = floor
+        return self.merge(chunk)
+
+    def top(self, k: int) -> pd.DataFrame:
+        top = self.counts.nlargest(k, keep="first")
+        return pd.DataFrame({"count": top, "error": self.errors[top.index]})
+
+
+def _label_hashes(labels: pd.Index) -> np.ndarray:
+    # hash the text of each label so that keys hash alike whatever the
+    # chunk's category set or dtype
+    return pd.util.hash_array(np.asarray(labels.astype(str), dtype=object))
+
+
+def _combine_hashes(hashes: Sequence[np.ndarray]) -> np.ndarray:
+    combined = np.zeros(len(hashes[0]), dtype="uint64")
+    for h in hashes:
+        combined = combined * np.uint64(1_000_003) ^ h
+    return combined
+
+
+class CountMinSketch:
+    """
+    Count-min sketch over 64-bit key hashes: `depth` rows of `width`
+    counters with independent multiply-shift hashes. Estimates never
+    undercount and overcount by at most e / width of the total with
+    probability 1 - exp(-depth). Sketches of the same shape and seed
+    merge by adding their tables.
+    """
+
+    def __init__(self, width: int = 1 << 15, depth: int = 4, seed: int = 0):
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**63, depth, dtype="uint64") | np.uint64(1)
+        self._b = rng.integers(0, 2**63, depth, dtype="uint64")
+        self.table = np.zeros((depth, width), dtype="float64")
+
+    def _columns(self, hashes: np.ndarray, row: int) -> np.ndarray:
+        return ((hashes * self._a[row] + self._b[row]) >> np.uint64(32)) % np.uint64(self.width)
+
+    def update(self, hashes: np.ndarray, counts: np.ndarray) -> None:
+        counts = np.asarray(counts, dtype="float64")
+        for row in range(self.depth):
+            self.table[row] += np.bincount(self._columns(hashes, row), weights=counts, minlength=self.width)
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        return np.min([self.table[row].take(self._columns(hashes, row)) for row in range(self.depth)], axis=0)
+
+    def merge(self, other: CountMinSketch) -> CountMinSketch:
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("count-min sketches differ in shape or seed")
+        self.table += other.table
+        return self
+
+
+class StreamingTopK:
+    """
+    Approximate top-k of `columns` (per `by` group) over a stream of
+    chunks, in bounded memory: a Space-Saving summary per group keeps the
+    heavy hitters, a count-min sketch answers point queries for any item.
+
+    Each chunk is counted exactly on integer codes first; only its top
+    `capacity` items per group get labels and enter the summaries, and
+    the sketch hashes labels once per category, not once per trip.
+    """
+
+    def __init__(
+        self,
+        columns: str | Sequence[str],
+        k: int = 10,
+        by: str | None = None,
+        capacity: int | None = None,
+        sketch_width: int = 1 << 15,
+        sketch_depth: int = 4,
+    ):
+        self.columns = [columns] if isinstance(columns, str) else list(columns)
+        self.k = k
+        self.by = by
+        self.capacity = capacity or max(20 * k, 200)
+        self.summaries: dict[object, SpaceSaving] = {}
+        self.sketch = CountMinSketch(sketch_width, sketch_depth)
+        self.total = 0.0
+
+    @property
+    def keys(self) -> list[str]:
+        return ([self.by] if self.by else []) + self.columns
+
+    def update(self, chunk: pd.DataFrame, weights=None) -> None:
+        keys = self.keys
+        counts, cells, labels, sizes = _count_cells(chunk, keys, weights)
+        n_items = _n_items(sizes, self.by)
+
+        # sketch: every item present, hashed from per-category label hashes
+        present = np.flatnonzero(counts) if cells is None else cells[counts > 0]
+        present_counts = counts[present] if cells is None else counts[counts > 0]
+        codes = np.unravel_index(present, sizes) if len(sizes) > 1 else (present,)
+        hashes = _combine_hashes([_label_hashes(l).take(c) for l, c in zip(labels, codes)])
+        self.sketch.update(hashes, present_counts)
+        self.total += float(present_counts.sum())
+
+        # summaries: the chunk's top `capacity` items per group, exact
+        winners, winner_counts = _top_cells(counts, cells, sizes[0] if self.by else 1, n_items, self.capacity + 1)
+        decoded = _decode(winners, keys, labels, sizes)
+        group_ids = winners // n_items
+
+        for g in np.unique(group_ids):
+            in_group = group_ids == g
+            group_counts = pd.Series(
+                winner_counts[in_group],
+                index=pd.MultiIndex.from_arrays([decoded[c][in_group] for c in self.columns], names=self.columns)
+                if len(self.columns) > 1 else pd.Index(decoded[self.columns[0]][in_group], name=self.columns[0]),
+            )
+            # with capacity + 1 taken, the extra one bounds everything left out
+            floor = 0.0
+            if len(group_counts) > self.capacity:
+                floor = float(group_counts.iloc[-1])
+                group_counts = group_counts.iloc[:-1]
+
+            group = decoded[self.by][in_group][0] if self.by else None
+            self.summaries.setdefault(group, SpaceSaving(self.capacity)).update(group_counts, floor=floor)
+
+    def merge(self, other: StreamingTopK) -> StreamingTopK:
+        for group, summary in other.summaries.items():
+            self.summaries.setdefault(group, SpaceSaving(self.capacity)).merge(summary)
+        self.sketch.merge(other.sketch)
+        self.total += other.total
+        return self
+
+    def result(self) -> pd.DataFrame:
+        """Like top_k: [by], *columns, trip_count, plus each count's error bound."""
+
+        frames = []
+        for group, summary in self.summaries.items():
+            top = summary.top(self.k)
+            frame = top.index.to_frame(index=False)
+            frame.columns = self.columns
+            if self.by is not None:
+                frame.insert(0, self.by, group)
+            frame["trip_count"] = np.round(top["count"].to_numpy()).astype("int64")
+            frame["error"] = np.round(top["error"].to_numpy()).astype("int64")
+            frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame(columns=self.keys + ["trip_count", "error"])
+        result = pd.concat(frames, ignore_index=True)
+        return result.sort_values(
+            self.keys[:1] + ["trip_count"] if self.by else ["trip_count"],
+            ascending=[True, False] if self.by else [False],
+            kind="stable",
+            ignore_index=True,
+        )
+
+    def estimate(self, items: pd.DataFrame) -> np.ndarray:
+        """Count-min estimate for each row of `items` (columns: [by], *columns)."""
+        hashes = _combine_hashes([_label_hashes(pd.Index(items[key])) for key in self.keys])
+        return self.sketch.estimate(hashes)
@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from calendar_dimension import RUSH_HOURS, build_calendar_dimension, calendar_rows, gather_calendar
+from data_loader import CLEAN_DATA_DIR
+from group_aggregates import multi_aggregate
+from od_matrix import ODMatrix
+from top_k import top_k
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Materialized aggregate of the trip table, stored as one Parquet file per
+# cuboid under CLEAN_DATA_DIR/trip_cube/. Every cuboid holds the same
+# additive measures, so any query is a groupby-sum over a few thousand rows.
+TRIP_CUBE_SUBDIR = "trip_cube"
+
+CUBE_DIMENSIONS = (
+    "start_date_key",
+    "start_hour",
+    "user_type_standardized",
+    "bike_model_group",
+    "start_station_normalized",
+    "end_station_normalized",
+)
+CUBE_MEASURES = ("trip_count", "duration_count", "duration_sum_sec", "duration_sumsq_sec")
+
+# Duration histogram sketch: log-spaced bins (~11% wide) from 30 s to 48 h,
+# plus [0, 30 s) and an overflow bin. Trips without a duration get bin -1.
+DURATION_BIN_EDGES = np.concatenate([[0.0], np.geomspace(30, 48 * 3600, 81), [np.inf]])
+
+# Roll-ups kept on disk; queries use the smallest one that has every
+# dimension they need. "base" has them all.
+CUBOIDS: dict[str, tuple[str, ...]] = {
+    "base": CUBE_DIMENSIONS + ("duration_bin",),
+    "time": ("start_date_key", "start_hour", "user_type_standardized", "bike_model_group"),
+    "duration": ("start_date_key", "user_type_standardized", "bike_model_group", "duration_bin"),
+    "od": ("user_type_standardized", "start_station_normalized", "end_station_normalized"),
+    # station network by hour band (destination_flow page)
+    "od_hour": ("start_hour", "user_type_standardized", "start_station_normalized", "end_station_normalized"),
+}
+
+# Dimensions derived on the fly from start_date_key / start_hour
+DATE_ATTRIBUTES = ("start_date", "start_weekday", "start_month", "start_day", "start_year",
+                   "is_weekend", "is_holiday", "season")
+HOUR_ATTRIBUTES = ("is_rush_hour",)
+
+
+def duration_bins(duration_sec: pd.Series) -> np.ndarray:
+    """Histogram bin of each duration; -1 where the duration is missing."""
+    values = pd.to_numeric(duration_sec, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    bins = np.searchsorted(DURATION_BIN_EDGES, values, side="right") - 1
+    bins[np.isnan(values)] = -1
+    return bins.astype("int8")
+
+
+def _date_keys(df: pd.DataFrame) -> pd.Series:
+    if "start_date_key" in df.columns:
+        return df["start_date_key"]
+    calendar, rows = calendar_rows(df["start_time"])
+    return gather_calendar(calendar, rows, ["date_key"], index=df.index)["date_key"]
+
+
+def _rollup(frame: pd.DataFrame, by: Sequence[str]) -> pd.DataFrame:
+    measures = [m for m in CUBE_MEASURES if m in frame.columns]
+    if not by:
+        return frame[measures].sum().to_frame().T
+    return (
+        frame.groupby(list(by), observed=True, dropna=False, sort=True)[measures]
+             .sum()
+             .reset_index()
+    )
+
+
+def build_trip_cube(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """
+    Aggregate cleaned trips into every cuboid in CUBOIDS.
+
+    Missing dimension values are kept as their own group (dropna=False), so
+    roll-ups add up to the row-level totals.
+    """
+
+    duration = pd.to_numeric(df["trip_duration_clean"], errors="coerce")
+    has_duration = duration.notna()
+
+    keys = pd.DataFrame({
+        **{dim: df[dim] for dim in CUBE_DIMENSIONS if dim != "start_date_key"},
+        "start_date_key": _date_keys(df),
+        "duration_bin": duration_bins(duration),
+    }, index=df.index)
+    measures = {
+        "duration_count": has_duration.to_numpy(dtype="int64"),
+        "duration_sum_sec": duration.fillna(0).to_numpy(dtype="float64"),
+        "duration_sumsq_sec": duration.fillna(0).to_numpy(dtype="float64") ** 2,
+    }
+
+    # keys are factorized once; each cuboid is one bincount pass over them
+    cube = multi_aggregate(keys, CUBOIDS, sums=measures, count="trip_count")
+
+    logger.info(
+        "Built trip cube from %s trips: %s",
+        len(df),
+        ", ".join(f"{name}={len(frame):,} rows" for name, frame in cube.items()),
+    )
+    return cube
+
+
+def combine_trip_cubes(cubes: Iterable[dict[str, pd.DataFrame]]) -> dict[str, pd.DataFrame]:
+    """Merge cubes of separate chunks or partitions; every measure is additive."""
+
+    cubes = list(cubes)
+    combined = {}
+    for name, dims in CUBOIDS.items():
+        frame = pd.concat([cube[name] for cube in cubes], ignore_index=True)
+        for dim in dims:
+            # chunk-local category sets differ
+            if isinstance(frame[dim].dtype, pd.CategoricalDtype) or frame[dim].dtype == object:
+                frame[dim] = frame[dim].astype("category")
+        combined[name] = _rollup(frame, dims)
+    return combined
+
+
+class StreamingTripCube:
+    """
+    Trip cube built over a stream of chunks: each chunk is rolled up and
+    folded into the running cube, so only the cube is kept between chunks.
+
+        streaming = StreamingTripCube()
+        for chunk in chunks:
+            streaming.update(chunk)
+        TripCube(streaming.cube)
+    """
+
+    def __init__(self):
+        self.cube: dict[str, pd.DataFrame] | None = None
+
+    def update(self, df: pd.DataFrame) -> StreamingTripCube:
+        cube = build_trip_cube(df)
+        self.cube = cube if self.cube is None else combine_trip_cubes([self.cube, cube])
+        return self
+
+
+def trip_cube_dir() -> Path:
+    return CLEAN_DATA_DIR / TRIP_CUBE_SUBDIR
+
+
+def save_trip_cube(cube: dict[str, pd.DataFrame], out_dir: Path | None = None) -> Path:
+    out_dir = trip_cube_dir() if out_dir is None else Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    for name, frame in cube.items():
+        path = out_dir / f"{name}.parquet"
+        tmp_path = path.with_name(path.name + ".tmp")
+        frame.to_parquet(tmp_path, index=False)
+        tmp_path.replace(path)
+
+    logger.info("Saved trip cube to %s", out_dir)
+    return out_dir
+
+
+def _date_attributes(date_keys: pd.Series) -> pd.DataFrame:
+    """Calendar attributes per YYYYMMDD key, read off the calendar dimension."""
+
+    keys = date_keys.dropna()
+    if keys.empty:
+        return pd.DataFrame(columns=list(DATE_ATTRIBUTES), index=pd.Index([], name="start_date_key"))
+
+    first = pd.to_datetime(str(int(keys.min())), format="%Y%m%d")
+    last = pd.to_datetime(str(int(keys.max())), format="%Y%m%d")
+    calendar = build_calendar_dimension(first, last)
+    days = calendar[calendar["hour"] == 0].set_index("date_key")
+
+    return pd.DataFrame({
+        "start_date": days["hour_start"].dt.date,
+        "start_weekday": days["weekday"],
+        "start_month": days["month"],
+        "start_day": days["day"],
+        "start_year": days["year"],
+        "is_weekend": days["is_weekend"],
+        "is_holiday": days["is_holiday"],
+        "season": days["season"],
+    }).rename_axis("start_date_key")
+
+
+def _as_date_key(value) -> int:
+    value = pd.Timestamp(value)
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+class TripCube:
+    """
+    Query interface over the materialized cuboids.
+
+    query(by, where) answers "trip count / duration moments by <dims>"
+    from the smallest cuboid that has the needed dimensions. `by` and
+    `where` may use the cube dimensions, duration_bin, and the calendar
+    attributes derived from the date key and hour (start_weekday,
+    start_month, is_weekend, is_holiday, season, is_rush_hour, ...).
+
+    Cuboids are read from disk on first use.
+    """
+
+    def __init__(self, cuboids: Mapping[str, pd.DataFrame] | None = None, path: Path | None = None):
+        self._frames = dict(cuboids or {})
+        self.path = path
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> TripCube:
+        path = trip_cube_dir() if path is None else Path(path)
+        if not (path / "base.parquet").exists():
+            raise FileNotFoundError(f"No trip cube in {path}. Run main.py to build it.")
+        return cls(path=path)
+
+    def cuboid(self, name: str) -> pd.DataFrame:
+        if name not in self._frames:
+            self._frames[name] = pd.read_parquet(self.path / f"{name}.parquet")
+        return self._frames[name]
+
+    def _num_rows(self, name: str) -> int:
+        if name in self._frames:
+            return len(self._frames[name])
+        return pq.read_metadata(self.path / f"{name}.parquet").num_rows
+
+    def _has_cuboid(self, name: str) -> bool:
+        # cubes saved before a cuboid was added do not have its file
+        return name in self._frames or (self.path is not None and (self.path / f"{name}.parquet").exists())
+
+    def _choose_cuboid(self, needed: set[str]) -> str:
+        candidates = [name for name, dims in CUBOIDS.items() if needed <= set(dims) and self._has_cuboid(name)]
+        return min(candidates, key=self._num_rows)
+
+    @staticmethod
+    def _source_dims(names: Iterable[str]) -> set[str]:
+        dims = set()
+        for name in names:
+            if name in DATE_ATTRIBUTES:
+                dims.add("start_date_key")
+            elif name in HOUR_ATTRIBUTES:
+                dims.add("start_hour")
+            elif name in CUBOIDS["base"]:
+                dims.add(name)
+            else:
+                raise KeyError(f"'{name}' is not a trip cube dimension")
+        return dims
+
+    def query(
+        self,
+        by: Sequence[str] = (),
+        where: Mapping[str, object] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Measures grouped by `by` after applying `where`.
+
+        `where` maps a dimension to a value, a list of values, or an
+        inclusive (low, high) tuple. "start_date" accepts dates.
+        """
+
+        by = list(by)
+        return _rollup(self._filtered(by, where), by)
+
+    def top_k(
+        self,
+        columns: str | Sequence[str],
+        k: int = 10,
+        by: str | None = None,
+        where: Mapping[str, object] | None = None,
+    ) -> pd.DataFrame:
+        """The k busiest values of `columns` (per `by`), see top_k.top_k."""
+
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        frame = self._filtered(([by] if by else []) + columns, where)
+        return top_k(frame, columns, k=k, by=by, weights="trip_count")
+
+    def od_matrix(self, where: Mapping[str, object] | None = None) -> ODMatrix:
+        """Sparse start → end station matrix of the trips passing `where` (see od_matrix.ODMatrix)."""
+
+        frame = self._filtered(["start_station_normalized", "end_station_normalized"], where)
+        return ODMatrix.from_frame(frame, weights="trip_count")
+
+    def _filtered(self, dims: list[str], where: Mapping[str, object] | None) -> pd.DataFrame:
+        """Rows of the smallest covering cuboid that pass `where`, with derived dims added."""
+
+        where = dict(where or {})
+        name = self._choose_cuboid(self._source_dims(dims + list(where)))
+        frame = self.cuboid(name)
+
+        derived = [d for d in dims + list(where) if d in DATE_ATTRIBUTES + HOUR_ATTRIBUTES]
+        if derived:
+            frame = frame.copy(deep=False)
+            if any(d in DATE_ATTRIBUTES for d in derived):
+                attrs = _date_attributes(frame["start_date_key"])
+                for d in dict.fromkeys(d for d in derived if d in DATE_ATTRIBUTES):
+                    frame[d] = attrs[d].reindex(frame["start_date_key"]).array
+            if "is_rush_hour" in derived:
+                frame["is_rush_hour"] = frame["start_hour"].isin(RUSH_HOURS)
+
+        mask = np.ones(len(frame), dtype=bool)
+        for dim, value in where.items():
+            column = frame[dim]
+            if dim == "start_date" and isinstance(value, tuple):
+                column, value = frame["start_date_key"], tuple(_as_date_key(v) for v in value)
+            elif dim == "start_date":
+                column, value = frame["start_date_key"], _as_date_key(value)
+
+            if isinstance(value, tuple):
+                mask &= column.between(*value).to_numpy()
+            elif isinstance(value, (list, set, frozenset, pd.Index, np.ndarray)):
+                mask &= column.isin(list(value)).to_numpy()
+            else:
+                mask &= (column == value).to_numpy()
+
+        return frame[mask] if not mask.all() else frame
+
+    def total_trips(self) -> int:
+        return int(self.cuboid(self._choose_cuboid(set()))["trip_count"].sum())
+
+
+def count_trips(df: pd.DataFrame, by: str | Sequence[str]) -> pd.Series:
+    """
+    Trips per group. Works on row-level trips (one row = one trip) and on
+    cube query results, where each row carries a trip_count.
+    """
+
+    grouped = df.groupby(by, observed=True)
+    if "trip_count" in df.columns:
+        return grouped["trip_count"].sum()
+    return grouped.size()
+
+
+def duration_moments(frame: pd.DataFrame) -> pd.DataFrame:
+    """count / mean / std (ddof=1) of trip duration from the cube measures."""
+
+    n = frame["duration_count"]
+    mean = frame["duration_sum_sec"] / n.where(n > 0)
+    var = (frame["duration_sumsq_sec"] - n * mean**2) / (n - 1).where(n > 1)
+    return pd.DataFrame({
+        "count": n,
+        "mean": mean,
+        "std": np.sqrt(var.clip(lower=0)),
+    }, index=frame.index)
+
+
+def duration_quantiles(
+    frame: pd.DataFrame,
+    q: Sequence[float] = (0.25, 0.5, 0.75),
+    by: str | Sequence[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Duration quantiles estimated from the histogram sketch (a cube query
+    that includes duration_bin). Interpolation is geometric inside a bin, so
+    the error is bounded by the bin width (~11%).
+    """
+
+    frame = frame[frame["duration_bin"] >= 0]
+    groups = [((), frame)] if by is None else frame.groupby(by, observed=True)
+
+    rows = {}
+    for key, group in groups:
+        counts = (
+            group.groupby("duration_bin")["trip_count"].sum()
+                 .reindex(range(len(DURATION_BIN_EDGES) - 1), fill_value=0)
+                 .to_numpy(dtype="float64")
+        )
+        rows[key] = [_histogram_quantile(counts, p) for p in q]
+
+    index = None if by is None else pd.Index(list(rows), name=by if isinstance(by, str) else None)
+    if by is not None and not isinstance(by, str):
+        index = pd.MultiIndex.from_tuples(list(rows), names=list(by))
+    return pd.DataFrame(list(rows.values()), index=index, columns=[f"{p:.0%}" for p in q])
+
+
+def _histogram_quantile(counts: np.ndarray, p: float) -> float:
+    total = counts.sum()
+    if total == 0:
+        return np.nan
+
+    cumulative = np.cumsum(counts)
+    target = p * total
+    b = int(np.searchsorted(cumulative, target, side="left"))
+    # p=0 stops on the leading empty bins: move on to the first non-empty one
+    b += int(np.argmax(counts[b:] > 0))
+    lo, hi = DURATION_BIN_EDGES[b], DURATION_BIN_EDGES[b + 1]
+    if not np.isfinite(hi):
+        return lo
+
+    before = cumulative[b - 1] if b else 0.0
+    frac = (target - before) / counts[b]
+    if lo == 0:
+        return frac * hi
+    return lo * (hi / lo) ** frac
+
+
+def duration_histogram(frame: pd.DataFrame) -> pd.DataFrame:
+    """Trips per duration bin with the bin edges in seconds."""
+
+    counts = count_trips(frame[frame["duration_bin"] >= 0], "duration_bin")
+    bins = counts.index.to_numpy()
+    return pd.DataFrame({
+        "bin_start_sec": DURATION_BIN_EDGES[bins],
+        "bin_end_sec": DURATION_BIN_EDGES[bins + 1],
+        "trip_count": counts.to_numpy(),
+    })
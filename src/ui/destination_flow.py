@@ -4,7 +4,12 @@ import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
 
-def render(df: pd.DataFrame) -> None:
+from schema import USER_TYPE_DTYPE
+from trip_cube import TripCube
+from ui.station_route_insights import top_routes_from_cube
+
+
+def render(cube: TripCube) -> None:
     st.title("Destination Flow Insights — Major Station Pairs")
 
     st.markdown(
@@ -18,18 +23,8 @@ def render(df: pd.DataFrame) -> None:
         """
     )
 
-    df["route"] = df["Start Station Name"] + " → " + df["End Station Name"]
-
-    top_routes = (
-        df["route"]
-        .value_counts()
-        .reset_index(name="Trips")
-        .rename(columns={"index": "Route"})
-        .head(20)         # LIMIT — improves Sankey performance
-    )
-
-    top_routes[ "Start" ] = top_routes["route"].str.split(" → ").str[0]
-    top_routes[ "End" ]   = top_routes["route"].str.split(" → ").str[1]
+    # LIMIT — improves Sankey performance
+    top_routes = top_routes_from_cube(cube, 20)
 
     st.subheader("Top 20 Most Common Origin–Destination Routes")
     st.dataframe(top_routes, use_container_width=True)
@@ -73,16 +68,49 @@ def render(df: pd.DataFrame) -> None:
     st.subheader("🔀 Route Flow Network (Sankey Chart)")
     st.plotly_chart(sankey_fig, use_container_width=True)
 
+    _render_network(cube)
+
     st.markdown("---")
     st.info("Developer notes:")
     st.markdown(
         """
         - **Uses Plotly Sankey** for high-performance visualization.
         - Optimized by limiting to **Top 20 OD pairs**.
-        - Uses columns:  
-          - `Start Station Name`  
-          - `End Station Name`  
+        - Uses the trip cube's OD counts:  
+          - `start_station_normalized`  
+          - `end_station_normalized`  
         - Automatically constructs node indexing and flow weights.
+        - Station network: sparse OD matrix (`od_matrix.ODMatrix`) from the cube for the selected filters.
         - Fully compatible with your dark theme.
         """
-    )
\ No newline at end of file
+    )
+
+def _render_network(cube: TripCube) -> None:
+    """Station centrality, balance and communities of the filtered OD network."""
+
+    st.subheader("🕸️ Station Network")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        user_type = st.selectbox("User type", ("All", *USER_TYPE_DTYPE.categories))
+    with col2:
+        hours = st.slider("Start hour band", 0, 23, (0, 23))
+
+    where = {"start_hour": hours}
+    if user_type != "All":
+        where["user_type_standardized"] = user_type
+    od = cube.od_matrix(where)
+    if not od.nnz:
+        st.warning("No trips for these filters.")
+        return
+
+    table = od.station_table()
+    table = table[(table["out_trips"] > 0) | (table["in_trips"] > 0)]
+    st.caption(
+        f"{len(table):,} stations · {od.nnz:,} station pairs · "
+        f"{table['community'].nunique():,} communities"
+    )
+    st.dataframe(
+        table.sort_values("pagerank", ascending=False).head(25),
+        use_container_width=True,
+    )
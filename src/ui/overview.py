@@ -3,15 +3,46 @@ from __future__ import annotations
 import pandas as pd
 import streamlit as st
 
+from bitmap_index import BitmapIndex
+from time_index import TimeIndex
 
-def render(df: pd.DataFrame) -> None:
-    st.title("Toronto Bike-Sharing — Overview")
+# Only what the KPIs and the data preview need.
+COLUMNS = (
+    "start_time",
+    "end_time",
+    "user_type_standardized",
+    "bike_model_group",
+    "start_station_normalized",
+    "end_station_normalized",
+    "trip_duration_clean",
+    "trip_distance_km",
+)
+
+
+def _filters(index: BitmapIndex) -> dict:
+    """Filter widgets; empty selections and the full hour range do not filter."""
 
+    col1, col2, col3 = st.columns(3)
+    filters = {
+        "user_type_standardized": col1.multiselect("User type", list(index.values["user_type_standardized"])),
+        "start_weekday": col2.multiselect("Weekday", list(index.values["start_weekday"])),
+        "start_station_normalized": col3.multiselect("Start station", list(index.values["start_station_normalized"])),
+    }
+    filters["start_hour"] = st.slider("Start hour", min_value=0, max_value=23, value=(0, 23))
+    if st.checkbox("Rush hour only"):
+        filters["is_rush_hour"] = True
+
+    return {col: value for col, value in filters.items() if value not in ([], (0, 23))}
 
 
+def render(index: BitmapIndex, time_index: TimeIndex) -> None:
+    st.title("Toronto Bike-Sharing — Overview")
+
+    df = index.frame
+
     total_trips = len(df)
-    start_date = df["start_time"].min() if "start_time" in df.columns else None
-    end_date = df["start_time"].max() if "start_time" in df.columns else None
+    start_date = time_index.first
+    end_date = time_index.last
     n_users = df["user_type_standardized"].nunique() if "user_type_standardized" in df.columns else None
 
     col1, col2, col3 = st.columns(3)
@@ -21,8 +52,27 @@ def render(df: pd.DataFrame) -> None:
     if n_users is not None:
         col3.metric("User Types", n_users)
 
+    # Filters combine precomputed bitmaps; only the previewed rows are taken
     st.markdown("### Sample of Cleaned Data")
-    st.dataframe(df.head(10), use_container_width=True)
+    filters = _filters(index)
+
+    # Rows are sorted by start_time: a date range is a binary-searched slice
+    rows = None
+    if start_date is not None:
+        dates = st.date_input(
+            "Start date range (inclusive)",
+            value=(start_date.date(), end_date.date()),
+            min_value=start_date.date(),
+            max_value=end_date.date(),
+        )
+        if len(dates) == 2:
+            rows = time_index.day_bounds(*dates)
+
+    st.markdown(f"**Matching trips:** {index.count(filters, rows=rows):,}")
+    st.dataframe(
+        index.select(filters, columns=[c for c in COLUMNS if c in df.columns], limit=10, rows=rows),
+        use_container_width=True,
+    )
 
     st.info("Developer notes:")
     st.markdown(
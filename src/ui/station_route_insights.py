@@ -3,8 +3,37 @@ from pathlib import Path
 import pandas as pd
 import streamlit as st
 
+from station_flow import FLOW_VIEWS, PAGE_SORTS, StationFlow
+from trip_cube import TripCube
+
 PLOTS_DIR = Path(__file__).resolve().parents[2] / "outputs" / "plots"
-def render(df: pd.DataFrame) -> None:
+
+START_COL = "start_station_normalized"
+END_COL = "end_station_normalized"
+
+
+def top_routes_from_cube(cube: TripCube, n: int) -> pd.DataFrame:
+    """
+    n busiest start → end pairs from the cube. Route labels are only
+    built for those n rows.
+    """
+
+    routes = cube.top_k([START_COL, END_COL], k=n)
+    start, end = routes[START_COL].astype(str), routes[END_COL].astype(str)
+    return pd.DataFrame({
+        "route": (start + " → " + end).to_numpy(),
+        "Trips": routes["trip_count"].to_numpy(),
+        "Start": start.to_numpy(),
+        "End": end.to_numpy(),
+    })
+
+
+def _top_stations(cube: TripCube, station_col: str, label: str, n: int) -> pd.DataFrame:
+    top = cube.top_k(station_col, k=n)
+    return pd.DataFrame({label: top[station_col].astype(str).to_numpy(), "Trips": top["trip_count"].to_numpy()})
+
+
+def render(cube: TripCube, flow: StationFlow | None = None) -> None:
     st.title("Station & Route Insights")
 
     st.markdown(
@@ -19,32 +48,9 @@ def render(df: pd.DataFrame) -> None:
         """
     )
 
-    df["route"] = df["Start Station Name"] + " → " + df["End Station Name"]
-
-    top_start = (
-        df["Start Station Name"]
-        .value_counts()
-        .reset_index(name="Trips")
-        .rename(columns={"index": "Start Station Name"})
-        .head(10)
-    )
-
-    top_end = (
-        df["End Station Name"]
-        .value_counts()
-        .reset_index(name="Trips")
-        .rename(columns={"index": "End Station Name"})
-        .head(10)
-    )
-
-
-    top_routes = (
-        df["route"]
-        .value_counts()
-        .reset_index(name="Trips")
-        .rename(columns={"index": "Route"})
-        .head(10)
-    )
+    top_start = _top_stations(cube, START_COL, "Start Station Name", 10)
+    top_end = _top_stations(cube, END_COL, "End Station Name", 10)
+    top_routes = top_routes_from_cube(cube, 10)[["route", "Trips"]]
 
     st.subheader("Station & Route Insights")
 
@@ -85,13 +91,48 @@ def render(df: pd.DataFrame) -> None:
         else:
             st.warning(f"Image not found: {top_stations_img}")
 
+    if flow is not None and len(flow.hours):
+        _render_net_flow(flow)
+
     st.markdown("---")
     st.info("Developer notes:")
     st.markdown(
         """
-        - Uses columns: **Start Station Name**, **End Station Name**.
-        - Computes OD pair as `"start → end"`.
+        - Uses the trip cube's normalized station names (`start_station_normalized`, `end_station_normalized`).
+        - Computes OD pair as `"start → end"` for the top routes only.
         - Shows top 10 busiest stations & routes.
+        - Net flow = departures - arrivals per station and hour; drift = arrivals - departures accumulated since the last reset.
         - Fully compatible with cleaned dataset.
         """
-    )
\ No newline at end of file
+    )
+
+def _render_net_flow(flow: StationFlow) -> None:
+    """Paged stations × hours net flow / dock drift for the rebalancing crews."""
+
+    st.markdown("### ⚖️ Hourly Net Flow & Dock Drift")
+
+    first_day, last_day = flow.hours[0].date(), flow.hours[-1].date()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        view = st.selectbox("View", FLOW_VIEWS, index=FLOW_VIEWS.index("net_flow"))
+    with col2:
+        sort_by = st.selectbox("Sort stations by", PAGE_SORTS)
+    with col3:
+        day = st.date_input("Day", value=last_day, min_value=first_day, max_value=last_day)
+    with col4:
+        reset_hour = st.number_input("Drift reset hour", min_value=0, max_value=23, value=4)
+
+    page_size = 25
+    page = st.number_input("Page", min_value=1, max_value=max(flow.n_pages(page_size), 1), value=1) - 1
+    start = pd.Timestamp(day)
+    table = flow.page(
+        page,
+        page_size=page_size,
+        view=view,
+        sort_by=sort_by,
+        start=start,
+        end=start + pd.Timedelta(days=1),
+        reset_hours=reset_hour,
+    )
+    table.columns = [f"{hour:%H}h" for hour in table.columns]
+    st.dataframe(table, use_container_width=True)
@@ -10,13 +10,16 @@ from time_analysis import (
     trips_by_user_type
 )
 
+from trip_cube import TripCube
+
 from plots_time import (
     plot_trips_per_hour,
     plot_trips_per_weekday,
     plot_trips_per_month
 )
 
-def render(df: pd.DataFrame) -> None:
+
+def render(cube: TripCube) -> None:
     st.title("Time-based Trends — Dhruv")
 
     st.markdown(
@@ -30,25 +33,16 @@ def render(df: pd.DataFrame) -> None:
         """
     )
 
-    df["start_time"] = pd.to_datetime(df["start_time"], errors="coerce")
-    df["start_hour"] = df["start_time"].dt.hour
-    df["start_weekday"] = df["start_time"].dt.day_name()
-    df["start_month"] = df["start_time"].dt.month
-
     # DATE FILTER
     st.subheader("Filter by Start & End Date")
 
-    min_date = df["start_time"].min().date()
-    max_date = df["start_time"].max().date()
+    dates = cube.query(["start_date"])["start_date"]
+    min_date = dates.min()
+    max_date = dates.max()
 
     start_date = st.date_input("Start Date", min_value=min_date, value=min_date)
     end_date   = st.date_input("End Date", min_value=min_date, value=max_date)
 
-    mask_date = (df["start_time"] >= pd.to_datetime(start_date)) & \
-                (df["start_time"] <= pd.to_datetime(end_date))
-
-    filtered_df = df[mask_date]
-
   
     # HOUR FILTER
     st.subheader("Filter by Hour of Day")
@@ -60,12 +54,10 @@ def render(df: pd.DataFrame) -> None:
         value=(0, 23)
     )
 
-    filtered_df = filtered_df[
-        (filtered_df["start_hour"] >= hour_range[0]) &
-        (filtered_df["start_hour"] <= hour_range[1])
-    ]
+    # Both ranges are inclusive: the end date keeps all of its trips
+    where = {"start_date": (start_date, end_date), "start_hour": hour_range}
 
-    st.markdown(f"**Filtered rows:** {len(filtered_df):,}")
+    st.markdown(f"**Filtered trips:** {int(cube.query(where=where)['trip_count'].sum()):,}")
 
     
     # VISUALS
@@ -76,18 +68,18 @@ def render(df: pd.DataFrame) -> None:
     # Trips by Hour
     with col1:
         st.markdown("### Trips by Hour of Day")
-        hour_path = plot_trips_per_hour(filtered_df)
+        hour_path = plot_trips_per_hour(cube.query(["start_hour"], where))
         st.image(str(hour_path), use_container_width=True)
 
     # Trips by Weekday
     with col2:
         st.markdown("### Trips by Day of Week")
-        weekday_path = plot_trips_per_weekday(filtered_df)
+        weekday_path = plot_trips_per_weekday(cube.query(["start_weekday"], where))
         st.image(str(weekday_path), use_container_width=True)
 
     # Trips by Month
     st.markdown("### Trips per Month")
-    month_path = plot_trips_per_month(filtered_df)
+    month_path = plot_trips_per_month(cube.query(["start_month"], where))
     st.image(str(month_path), use_container_width=True)
 
    
@@ -117,6 +109,8 @@ def render(df: pd.DataFrame) -> None:
 
             - start_time, start_hour, start_day, start_month, start_weekday, is_weekend, is_rush_hour.
 
+        - Counts come from the pre-aggregated trip cube (`trip_cube.py`), not the trip table.
+
         - Try to keep filters simple (e.g., user type, weekend vs weekday) to avoid slow interactions.
 
         """
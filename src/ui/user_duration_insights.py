@@ -2,12 +2,31 @@ from __future__ import annotations
 from pathlib import Path
 import pandas as pd
 import streamlit as st
-import numpy as np
 import altair as alt
 
+from trip_cube import (
+    CUBE_MEASURES,
+    TripCube,
+    count_trips,
+    duration_histogram,
+    duration_moments,
+    duration_quantiles,
+)
+
 PLOTS_DIR = Path(__file__).resolve().parents[2] / "outputs" / "plots"
 
-def render(df: pd.DataFrame) -> None:
+
+def _duration_stats(frame: pd.DataFrame) -> pd.Series:
+    """describe()-style duration stats in minutes from cube measures."""
+    moments = duration_moments(frame[list(CUBE_MEASURES)].sum().to_frame().T).iloc[0]
+    quantiles = duration_quantiles(frame).iloc[0]
+    return pd.concat([
+        pd.Series({"count": moments["count"], "mean": moments["mean"] / 60, "std": moments["std"] / 60}),
+        quantiles / 60,
+    ])
+
+
+def render(cube: TripCube) -> None:
     st.title("User & Duration Insights")
 
     st.markdown(
@@ -22,27 +41,14 @@ def render(df: pd.DataFrame) -> None:
         """
     )
 
-    # Resolve column names
     user_type_col = "user_type_standardized"
-    duration_col = "trip_duration_clean"
 
-    # Validate columns
-    if user_type_col not in df.columns:
-        st.error(f"Column '{user_type_col}' not found in dataset.")
-        st.write("Available columns:", df.columns.tolist())
-        return
-
-    if duration_col not in df.columns:
-        st.error(f"Column '{duration_col}' not found in dataset.")
-        st.write("Available columns:", df.columns.tolist())
-        return
-
-    # Convert duration to minutes for all visualizations & stats
-    duration_min = df[duration_col] / 60
+    # user type x duration bin: a few hundred rows carry every stat below
+    by_bin = cube.query([user_type_col, "duration_bin"])
 
     # --- USER TYPE BREAKDOWN ---
     st.subheader("User Type Breakdown")
-    user_counts = df[user_type_col].value_counts()
+    user_counts = count_trips(by_bin, user_type_col).sort_values(ascending=False)
 
     col1, col2 = st.columns(2)
     user_type_img = PLOTS_DIR / "user_type_comparison.png"
@@ -69,36 +75,41 @@ def render(df: pd.DataFrame) -> None:
     st.markdown("Trip durations shown in **minutes** (cleaned).")
 
     st.write("Summary Statistics (minutes):")
-    st.write(duration_min.describe())
+    st.write(_duration_stats(by_bin))
 
     st.markdown("#### Histogram (minutes)")
-    hist_vals, hist_edges = np.histogram(duration_min, bins=30)
+    hist = duration_histogram(by_bin)
 
     st.bar_chart(
-        pd.DataFrame({"count": hist_vals}, index=hist_edges[:-1]),
+        pd.DataFrame({"count": hist["trip_count"].to_numpy()}, index=(hist["bin_start_sec"] / 60).round(1)),
         use_container_width=True,
     )
 
     # --- BOXPLOT (MINUTES) ---
+    # Drawn from the histogram quantiles; whiskers span the 5th-95th percentile
     st.markdown("#### Boxplot (minutes)")
-    sample = df.sample(n=5000, random_state=42) if len(df) > 5000 else df
-    sample = sample.copy()
-    sample["duration_min"] = sample[duration_col] / 60
+    box_stats = duration_quantiles(by_bin, q=(0.05, 0.25, 0.5, 0.75, 0.95), by=user_type_col) / 60
+    box_stats.columns = ["low", "q1", "median", "q3", "high"]
+    box_stats = box_stats.reset_index()
 
-    box = alt.Chart(sample).mark_boxplot().encode(
-        y=alt.Y("duration_min:Q", title="Trip Duration (min)"),
+    base = alt.Chart(box_stats).encode(
+        x=alt.X(f"{user_type_col}:N", title="User Type"),
         color=alt.Color(f"{user_type_col}:N", title="User Type"),
     )
+    box = (
+        base.mark_rule().encode(y=alt.Y("low:Q", title="Trip Duration (min)"), y2="high:Q")
+        + base.mark_bar(size=40).encode(y="q1:Q", y2="q3:Q")
+        + base.mark_tick(color="white", size=40).encode(y="median:Q")
+    )
 
     st.altair_chart(box, use_container_width=True)
 
     # --- SEGMENTATION BY USER TYPE ---
     st.subheader("Trip Duration by User Type (minutes)")
-    grouped = (
-        df.assign(duration_min=duration_min)
-        .groupby(user_type_col)["duration_min"]
-        .describe()
-    )
+    grouped = pd.DataFrame({
+        user_type: _duration_stats(group)
+        for user_type, group in by_bin.groupby(user_type_col, observed=True)
+    }).T
     st.write(grouped)
 
     # --- DEVELOPER NOTES ---
@@ -107,6 +118,7 @@ def render(df: pd.DataFrame) -> None:
         """
         - Using column: `user_type_standardized` for segmentation
         - Using column: `trip_duration_clean` converted to **minutes** for all stats and charts
+        - Stats come from the trip cube; quartiles and the boxplot are read off its duration histogram (~11% bins)
         - Charts configured with `use_container_width=True` for responsive layout
         - Ready for **Story #10 & #11** (Casual vs Annual user insights + duration distribution)
         """
@@ -2,6 +2,11 @@ import logging
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+# Figures and reports go to <project>/outputs wherever the scripts run from
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+OUTPUTS_DIR = PROJECT_ROOT / "outputs"
+PLOTS_DIR = OUTPUTS_DIR / "plots"
+
 
 def get_logger(name: str) -> logging.Logger:
   
@@ -3,10 +3,13 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Tuple
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-from utils import (get_logger, save_fig)
+from top_k import top_k
+from trip_cube import count_trips, duration_histogram
+from utils import (PLOTS_DIR, get_logger, save_fig)
 
 logger = get_logger(__name__)
 
@@ -16,22 +19,22 @@ logger = get_logger(__name__)
 
 def plot_hourly_demand(
     df: pd.DataFrame,
-    out_dir: str | Path = "outputs/plots",
+    out_dir: str | Path = PLOTS_DIR,
     time_col: str = "start_time",
     figsize: Tuple[int, int] = (10, 5),
 ) -> Path:
     """
     Plot number of trips by hour of day.
 
-    Assumes `time_col` is a datetime column (e.g., start_time).
+    Assumes `time_col` is a datetime column (e.g., start_time), or a trip
+    cube query by start_hour.
     """
-    df = df.copy()
-
-    if not pd.api.types.is_datetime64_any_dtype(df[time_col]):
-        raise ValueError(f"{time_col} must be a datetime column")
-
-    df["hour"] = df[time_col].dt.hour
-    hourly_counts = df["hour"].value_counts().sort_index()
+    if "trip_count" in df.columns:
+        hourly_counts = count_trips(df, "start_hour").sort_index()
+    else:
+        if not pd.api.types.is_datetime64_any_dtype(df[time_col]):
+            raise ValueError(f"{time_col} must be a datetime column")
+        hourly_counts = df[time_col].dt.hour.value_counts().sort_index()
 
     fig, ax = plt.subplots(figsize=figsize)
     ax.bar(hourly_counts.index, hourly_counts.values)
@@ -47,7 +50,7 @@ def plot_hourly_demand(
 
 def plot_trip_duration_distribution(
     df: pd.DataFrame,
-    out_dir: str | Path = "outputs/plots",
+    out_dir: str | Path = PLOTS_DIR,
     duration_col: str = "trip_duration_clean",
     bins: int = 50,
     max_minutes: int | None = 120,
@@ -57,46 +60,55 @@ def plot_trip_duration_distribution(
     Plot distribution of trip duration (in minutes).
 
     max_minutes: optional cap to avoid very long trips distorting the plot.
+    Also accepts a trip cube query by duration_bin, drawn with the cube's
+    own (log-spaced) bins instead of `bins`.
     """
-    df = df.copy()
+    fig, ax = plt.subplots(figsize=figsize)
 
-    duration = df[duration_col]
+    if "duration_bin" in df.columns:
+        hist = duration_histogram(df)
+        hist = hist[np.isfinite(hist["bin_end_sec"])]
+        if max_minutes is not None:
+            hist = hist[hist["bin_end_sec"] <= max_minutes * 60]
+        width_min = (hist["bin_end_sec"] - hist["bin_start_sec"]) / 60
+        # bins widen with duration: bar height is trips per minute of bin width
+        ax.bar(hist["bin_start_sec"] / 60, hist["trip_count"] / width_min, width=width_min, align="edge")
+        ax.set_ylabel("Trips per Minute of Duration")
+    else:
+        duration = df[duration_col]
 
-    if max_minutes is not None:
-        duration = duration[duration <= max_minutes * 60]
+        if max_minutes is not None:
+            duration = duration[duration <= max_minutes * 60]
 
-    duration_min = duration / 60
+        ax.hist(duration / 60, bins=bins)
+        ax.set_ylabel("Number of Trips")
 
-    fig, ax = plt.subplots(figsize=figsize)
-    ax.hist(duration_min, bins=bins)
     ax.set_title("Trip Duration Distribution")
     ax.set_xlabel("Duration (minutes)")
-    ax.set_ylabel("Number of Trips")
     fig.tight_layout()
 
     return save_fig(fig, out_dir, "trip_duration_distribution.png")
 
 def plot_top_busiest_stations(
     df: pd.DataFrame,
-    out_dir: str | Path = "outputs/plots",
+    out_dir: str | Path = PLOTS_DIR,
     station_col: str = "start_station_name_clean",
     top_n: int = 10,
     figsize: Tuple[int, int] = (10, 6),
 ) -> Path:
     """
     Plot top N busiest start stations by number of trips.
+    Also accepts a trip cube query (rows weighted by trip_count).
     """
-    df = df.copy()
-
+    weights = "trip_count" if "trip_count" in df.columns else None
     station_counts = (
-        df[station_col]
-        .value_counts()
-        .head(top_n)
+        top_k(df, station_col, k=top_n, weights=weights)
+        .set_index(station_col)["trip_count"]
         .sort_values(ascending=True)
     )
 
     fig, ax = plt.subplots(figsize=figsize)
-    ax.barh(station_counts.index, station_counts.values)
+    ax.barh(station_counts.index.astype(str), station_counts.values)
     ax.set_title(f"Top {top_n} Busiest Start Stations")
     ax.set_xlabel("Number of Trips")
     ax.set_ylabel("Station")
@@ -107,16 +119,15 @@ def plot_top_busiest_stations(
 
 def plot_user_type_comparison(
     df: pd.DataFrame,
-    out_dir: str | Path = "outputs/plots",
+    out_dir: str | Path = PLOTS_DIR,
     user_type_col: str = "user_type_standardized",
     figsize: Tuple[int, int] = (6, 6),
 ) -> Path:
     """
     Plot comparison of trips by user type (e.g., Casual vs Annual).
+    Also accepts a trip cube query by user type.
     """
-    df = df.copy()
-
-    counts = df[user_type_col].value_counts()
+    counts = count_trips(df, user_type_col).sort_values(ascending=False)
 
     fig, ax = plt.subplots(figsize=figsize)
     ax.bar(counts.index, counts.values)
@@ -129,20 +140,19 @@ def plot_user_type_comparison(
 
 def plot_daily_trips_decomposition(
     df: pd.DataFrame,
-    out_dir: str | Path = "outputs/plots",
+    out_dir: str | Path = PLOTS_DIR,
     time_col: str = "start_time",
     window: int = 7,
     figsize: tuple[int, int] = (12, 8),
 ) -> Path:
-    """visualization"""
-
-    df = df.copy()
-
-    if not pd.api.types.is_datetime64_any_dtype(df[time_col]):
-        raise ValueError(f"{time_col} must be a datetime column")
-
-    df["date"] = df[time_col].dt.date
-    daily = df.groupby("date").size().rename("trips").to_frame()
+    """visualization (trips, or a trip cube query by start_date)"""
+
+    if "trip_count" in df.columns:
+        daily = count_trips(df, "start_date").rename("trips").to_frame()
+    else:
+        if not pd.api.types.is_datetime64_any_dtype(df[time_col]):
+            raise ValueError(f"{time_col} must be a datetime column")
+        daily = df.groupby(df[time_col].dt.date).size().rename("trips").to_frame()
     daily.index = pd.to_datetime(daily.index)
 
     daily["trend"] = daily["trips"].rolling(window=window, center=True).mean()
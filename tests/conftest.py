@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import clean_store
+import data_loader
+import incremental
+import route_stats
+import stage_cache
+import station_dimension
+import trip_cube
+
+
+@pytest.fixture
+def data_dirs(tmp_path, monkeypatch):
+    """Point every module's raw/clean data directory at a temporary tree."""
+    raw_dir = tmp_path / "raw"
+    clean_dir = tmp_path / "clean"
+    raw_dir.mkdir()
+
+    monkeypatch.setattr(data_loader, "RAW_DATA_DIR", raw_dir)
+    for module in (data_loader, clean_store, incremental, route_stats, stage_cache, station_dimension, trip_cube):
+        monkeypatch.setattr(module, "CLEAN_DATA_DIR", clean_dir)
+
+    return raw_dir, clean_dir
@@ -0,0 +1,114 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from analysis_outliers import (
+    detect_grouped_duration_outliers,
+    detect_trip_duration_outliers,
+    duration_outlier_thresholds,
+    outlier_mask,
+)
+from duration_sketch import DurationSketch
+
+
+def trips(n: int = 50_000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    user_type = rng.choice(["Annual", "Casual"], n, p=[0.7, 0.3])
+    # casual rides are several times longer than commutes
+    duration = rng.lognormal(np.where(user_type == "Casual", 7.5, 6.3), 0.6)
+    duration[::101] = np.nan
+    return pd.DataFrame({
+        "trip_duration_clean": duration,
+        "user_type_standardized": pd.Categorical(user_type),
+        "start_hour": rng.integers(0, 24, n),
+        "bike_model_group": pd.Categorical(rng.choice(["ICONIC", "EFIT", None], n)),
+    })
+
+
+def expected_mask(df: pd.DataFrame, by: str, method: str) -> pd.Series:
+    duration = df["trip_duration_clean"]
+    groups = duration.groupby(df[by], observed=True)
+    if method == "iqr":
+        q1, q3 = groups.transform(lambda s: s.quantile(0.25)), groups.transform(lambda s: s.quantile(0.75))
+        lower, upper = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    elif method == "zscore":
+        mean, std = groups.transform("mean"), groups.transform("std")
+        lower, upper = mean - 3 * std, mean + 3 * std
+    else:
+        median = groups.transform("median")
+        mad = (duration - median).abs().groupby(df[by], observed=True).transform("median")
+        lower, upper = median - 3 * mad / 0.6745, median + 3 * mad / 0.6745
+    return (duration < lower) | (duration > upper)
+
+
+@pytest.mark.parametrize("method", ["iqr", "zscore", "mad"])
+@pytest.mark.parametrize("by", ["user_type_standardized", "start_hour", "bike_model_group"])
+def test_grouped_mask_matches_per_group_pandas(by, method):
+    df = trips()
+    mask, thresholds = detect_grouped_duration_outliers(df, by=by, method=method)
+
+    assert mask.dtype == bool and len(mask) == len(df)
+    np.testing.assert_array_equal(mask, expected_mask(df, by, method).to_numpy())
+    # trips with a missing key or duration are never flagged
+    assert not mask[df[by].isna().to_numpy() | df["trip_duration_clean"].isna().to_numpy()].any()
+    assert thresholds["outliers"].sum() == mask.sum()
+
+
+def test_groups_get_their_own_thresholds():
+    df = trips()
+    _, thresholds = detect_grouped_duration_outliers(df, by="user_type_standardized", method="iqr")
+
+    assert thresholds.loc["Casual", "upper_bound"] > 2 * thresholds.loc["Annual", "upper_bound"]
+    # a long casual ride is normal for casual riders, an outlier for commuters
+    ride = pd.DataFrame({
+        "trip_duration_clean": [thresholds.loc["Annual", "upper_bound"] + 60] * 2,
+        "user_type_standardized": ["Annual", "Casual"],
+    })
+    assert outlier_mask(ride, thresholds, by="user_type_standardized").tolist() == [True, False]
+
+
+def test_ungrouped_matches_global_detection():
+    df = trips()
+    mask, thresholds = detect_grouped_duration_outliers(df, by=None, method="zscore")
+    outliers_df, insights = detect_trip_duration_outliers(df, method="zscore")
+
+    np.testing.assert_array_equal(np.flatnonzero(mask), df.index.get_indexer(outliers_df.index))
+    assert np.isclose(thresholds["upper_bound"].iloc[0], insights["thresholds"]["upper_bound"])
+
+
+def test_thresholds_from_sketch_apply_chunk_by_chunk():
+    df = trips()
+    sketch = DurationSketch(by="user_type_standardized")
+    for start in range(0, len(df), 10_000):
+        sketch.update(df.iloc[start:start + 10_000])
+
+    thresholds = duration_outlier_thresholds(None, by="user_type_standardized", method="zscore", sketch=sketch)
+    mask = np.concatenate([
+        outlier_mask(df.iloc[start:start + 10_000], thresholds, by="user_type_standardized")
+        for start in range(0, len(df), 10_000)
+    ])
+
+    np.testing.assert_array_equal(mask, expected_mask(df, "user_type_standardized", "zscore").to_numpy())
+    with pytest.raises(ValueError):
+        duration_outlier_thresholds(None, by="user_type_standardized", method="mad", sketch=sketch)
+
+
+def test_groups_missing_from_the_sketch_use_the_trips():
+    df = trips()
+    sketch = DurationSketch(by="user_type_standardized")
+    sketch.update(df[df["user_type_standardized"] == "Annual"])
+
+    mask, thresholds = detect_grouped_duration_outliers(df, method="zscore", sketch=sketch)
+    _, exact = detect_grouped_duration_outliers(df, method="zscore")
+
+    assert thresholds["trips_count"].dtype == "int64"
+    assert thresholds[["lower_bound", "upper_bound"]].notna().all(axis=None)
+    pd.testing.assert_series_equal(thresholds.loc["Casual"], exact.loc["Casual"])
+    np.testing.assert_array_equal(mask, expected_mask(df, "user_type_standardized", "zscore").to_numpy())
@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from bike_chaining import BikeChains
+
+
+def trips(n: int = 20_000, n_bikes: int = 300, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-07-01") + pd.to_timedelta(rng.integers(0, 14 * 86400, n), unit="s")
+    df = pd.DataFrame({
+        "Bike Id": pd.array(rng.integers(1, n_bikes + 1, n), dtype="Int32"),
+        "start_time": start,
+        "end_time": start + pd.to_timedelta(rng.integers(60, 4 * 3600, n), unit="s"),
+        "Start Station Id": pd.array(rng.integers(7000, 7010, n), dtype="Int32"),
+        "End Station Id": pd.array(rng.integers(7000, 7010, n), dtype="Int32"),
+    })
+    df.loc[::151, "Bike Id"] = pd.NA
+    df.loc[::173, "End Station Id"] = pd.NA
+    return df
+
+
+def chained(df: pd.DataFrame) -> pd.DataFrame:
+    """Reference: the same chaining with a sort and groupby shifts."""
+    df = df.dropna(subset=["Bike Id"]).sort_values(["Bike Id", "start_time"], kind="stable")
+    bikes = df.groupby("Bike Id")
+    return df.assign(
+        prev_end=bikes["end_time"].shift(),
+        prev_end_station=bikes["End Station Id"].shift(),
+    )
+
+
+def test_gaps_and_teleports_match_groupby_shift():
+    df = trips()
+    chains = BikeChains.from_frame(df)
+    ref = chained(df)
+
+    linked = ref[ref["prev_end"].notna()]
+    gap = (linked["start_time"] - linked["prev_end"]).dt.total_seconds()
+    moved = linked["prev_end_station"].notna() & (linked["Start Station Id"] != linked["prev_end_station"])
+
+    idle = chains.idle_gaps(min_gap="2h")
+    assert len(idle) == (gap >= 7200).sum()
+    np.testing.assert_allclose(np.sort(idle["idle_sec"]), np.sort(gap[gap >= 7200]))
+
+    teleports = chains.teleports()
+    assert len(teleports) == moved.sum()
+    assert (teleports["end_station"] != teleports["next_start_station"]).all()
+
+    utilization = chains.utilization()
+    expected = moved.groupby(linked["Bike Id"]).sum()
+    np.testing.assert_array_equal(utilization.loc[expected.index, "teleports"], expected)
+    np.testing.assert_array_equal(utilization["trips"], ref.groupby("Bike Id").size())
+
+
+def test_utilization_adds_up():
+    df = trips()
+    utilization = BikeChains.from_frame(df).utilization()
+    ref = chained(df)
+
+    active = (ref["end_time"] - ref["start_time"]).dt.total_seconds().groupby(ref["Bike Id"]).sum()
+    np.testing.assert_allclose(utilization["active_sec"], active)
+    assert ((utilization["utilization"] > 0) & (utilization["utilization"] <= 1)).all()
+    # active + idle covers the span, more when a bike's trips overlap
+    assert (utilization["active_sec"] + utilization["idle_sec"] >= utilization["span_sec"] - 1e-6).all()
+
+
+def test_daily_active_time_splits_trips_at_midnight():
+    df = pd.DataFrame({
+        "Bike Id": pd.array([7, 7, 3], dtype="Int32"),
+        "start_time": pd.to_datetime(["2024-07-01 23:30", "2024-07-02 10:00", "2024-07-02 12:00"]),
+        "end_time": pd.to_datetime(["2024-07-02 00:45", "2024-07-02 10:20", "2024-07-02 12:05"]),
+        "Start Station Id": pd.array([1, 2, 1], dtype="Int32"),
+        "End Station Id": pd.array([3, 2, 1], dtype="Int32"),
+    })
+    chains = BikeChains.from_frame(df)
+    daily = chains.daily_active_time()
+
+    assert daily["bike_id"].tolist() == [3, 7, 7]
+    assert daily["date"].tolist() == list(pd.to_datetime(["2024-07-02", "2024-07-01", "2024-07-02"]))
+    assert daily["active_sec"].tolist() == [300, 1800, 45 * 60 + 20 * 60]
+    # bike 7 ended at station 3 and was picked up at station 2
+    assert chains.teleports()[["bike_id", "end_station", "next_start_station"]].values.tolist() == [[7, 3, 2]]
+    assert len(chains.bike(7)) == 2
+
+    full = BikeChains.from_frame(trips())
+    expected = (full.end - full.start).sum() / 1e9
+    assert np.isclose(full.daily_active_time()["active_sec"].sum(), expected)
@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from bitmap_index import Bitmap, BitmapIndex
+from schema import WEEKDAY_DTYPE
+
+
+def trips(n: int = 20_000) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    hour = rng.integers(0, 24, n)
+    weekday = rng.integers(0, 7, n)
+    return pd.DataFrame({
+        "user_type_standardized": pd.Categorical(rng.choice(["Annual", "Casual"], n, p=[0.7, 0.3])),
+        "start_weekday": pd.Categorical.from_codes(weekday, dtype=WEEKDAY_DTYPE),
+        "start_hour": hour,
+        "start_month": rng.integers(1, 13, n),
+        "is_weekend": weekday >= 5,
+        "is_rush_hour": np.isin(hour, (7, 8, 9, 16, 17, 18)),
+        "start_station_normalized": pd.Categorical(
+            np.where(rng.random(n) < 0.01, None, rng.integers(0, 300, n).astype(str))
+        ),
+    })
+
+
+@pytest.mark.parametrize("fraction_a, fraction_b", [(0.5, 0.4), (0.5, 0.001), (0.002, 0.001)])
+def test_bitmap_ops_match_boolean_masks(fraction_a, fraction_b):
+    rng = np.random.default_rng(0)
+    a, b = rng.random(10_001) < fraction_a, rng.random(10_001) < fraction_b
+    bitmap_a, bitmap_b = Bitmap.from_mask(a), Bitmap.from_mask(b)
+
+    np.testing.assert_array_equal((bitmap_a & bitmap_b).to_mask(), a & b)
+    np.testing.assert_array_equal((bitmap_a | bitmap_b).to_mask(), a | b)
+    np.testing.assert_array_equal((bitmap_b & bitmap_a).to_positions(), np.flatnonzero(a & b))
+    assert bitmap_a.count() == a.sum()
+
+
+def test_count_without_bitwise_count(monkeypatch):
+    # numpy < 2 has no np.bitwise_count; the byte lookup table must agree
+    mask = np.random.default_rng(1).random(10_001) < 0.5
+    monkeypatch.delattr(np, "bitwise_count", raising=False)
+    assert Bitmap.from_mask(mask).count() == mask.sum()
+
+
+def test_sparse_values_use_position_lists():
+    index = BitmapIndex(trips())
+
+    assert all(b.is_dense for b in index.bitmaps["is_weekend"])
+    assert not any(b.is_dense for b in index.bitmaps["start_station_normalized"])
+
+
+def test_filters_match_boolean_masks():
+    df = trips()
+    index = BitmapIndex(df)
+
+    cases = [
+        ({"user_type_standardized": "Casual"}, df["user_type_standardized"] == "Casual"),
+        ({"start_hour": (7, 9), "is_weekend": False}, df["start_hour"].between(7, 9) & ~df["is_weekend"]),
+        ({"start_weekday": ("Monday", "Wednesday")}, df["start_weekday"].cat.codes <= 2),
+        ({"start_station_normalized": ["12", "200", "missing"], "is_rush_hour": True},
+         df["start_station_normalized"].isin(["12", "200"]) & df["is_rush_hour"]),
+        ({"start_month": range(1, 4), "user_type_standardized": "Nobody"}, pd.Series(False, index=df.index)),
+        ({}, pd.Series(True, index=df.index)),
+    ]
+    for filters, mask in cases:
+        assert index.count(filters) == mask.sum()
+        pd.testing.assert_frame_equal(index.select(filters), df[mask])
+
+    head = index.select(start_hour=8, columns=["start_month"], limit=5)
+    pd.testing.assert_frame_equal(head, df.loc[df["start_hour"] == 8, ["start_month"]].head(5))
+
+
+def test_unknown_column_raises():
+    with pytest.raises(KeyError):
+        BitmapIndex(trips(100)).count(trip_duration_clean=60)
@@ -0,0 +1,63 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from calendar_dimension import build_calendar_dimension, calendar_rows, gather_calendar, ontario_holidays
+from feature_engineering import add_calendar_fields
+
+
+def test_ontario_holidays_2024():
+    holidays = ontario_holidays(2024)
+
+    assert holidays[date(2024, 2, 19)] == "Family Day"
+    assert holidays[date(2024, 3, 29)] == "Good Friday"
+    assert holidays[date(2024, 5, 20)] == "Victoria Day"
+    assert holidays[date(2024, 10, 14)] == "Thanksgiving"
+    assert len(holidays) == 9
+
+
+def test_weekend_holidays_get_an_observed_weekday():
+    holidays = ontario_holidays(2027)  # Dec 25 is a Saturday
+
+    assert holidays[date(2027, 12, 27)] == "Christmas Day (observed)"
+    assert holidays[date(2027, 12, 28)] == "Boxing Day (observed)"
+
+
+def test_calendar_covers_every_hour_with_iso_week_and_season():
+    calendar = build_calendar_dimension("2024-12-30 22:00", "2025-01-01 01:30")
+
+    assert len(calendar) == 2 + 24 + 2
+    first = calendar.iloc[0]
+    assert (first["date_key"], first["hour"], first["iso_year"], first["iso_week"]) == (20241230, 22, 2025, 1)
+    assert first["season"] == "Winter" and first["weekday"] == "Monday"
+    new_year = calendar[calendar["date_key"] == 20250101]
+    assert new_year["is_holiday"].all() and not new_year["is_workday"].any()
+
+
+def test_trips_join_the_calendar_by_hour_offset():
+    times = pd.Series(pd.to_datetime(["2024-07-01 08:15", None, "2024-07-02 17:59"]))
+
+    calendar, rows = calendar_rows(times)
+    fields = gather_calendar(calendar, rows, ["hour", "is_rush_hour", "holiday_name"])
+
+    assert rows.tolist() == [0, -1, 33]
+    assert fields["hour"].tolist()[::2] == [8, 17] and pd.isna(fields["hour"][1])
+    assert fields["is_rush_hour"].tolist() == [True, False, True]
+    assert fields["holiday_name"][0] == "Canada Day"
+
+
+def test_add_calendar_fields():
+    df = pd.DataFrame({"start_time": pd.to_datetime(["2024-12-25 10:00", "2024-06-03 09:00"])})
+
+    result = add_calendar_fields(df)
+
+    assert result["start_date_key"].tolist() == [20241225, 20240603]
+    assert result["is_holiday"].tolist() == [True, False]
+    assert result["season"].tolist() == ["Winter", "Summer"]
+    assert result["start_date_key"].dtype == "int32"
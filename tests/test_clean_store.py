@@ -0,0 +1,113 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import clean_store
+
+
+def typed_frame(user_types, start: str = "2024-08-01 07:00") -> pd.DataFrame:
+    n = len(user_types)
+    return pd.DataFrame({
+        "start_time": pd.date_range(start, periods=n, freq="h"),
+        "user_type_standardized": pd.Categorical(user_types),
+        "is_weekend": [False, True] * (n // 2),
+        "start_hour": pd.Series(range(n), dtype="int8"),
+        "trip_duration_clean": [600.0] * n,
+    })
+
+
+def test_clean_store_round_trip_keeps_dtypes(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean_store, "CLEAN_DATA_DIR", tmp_path)
+    df = typed_frame(["Casual", "Annual"])
+
+    clean_store.write_clean_store(df, "trips.parquet")
+    result = clean_store.read_clean_store("trips.parquet")
+
+    pd.testing.assert_frame_equal(result, df)
+
+
+def test_clean_store_column_projection(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean_store, "CLEAN_DATA_DIR", tmp_path)
+    clean_store.write_clean_store(typed_frame(["Casual", "Annual"]), "trips.parquet")
+
+    result = clean_store.read_clean_store(
+        "trips.parquet", columns=["start_hour", "not_a_column", "is_weekend"]
+    )
+
+    assert list(result.columns) == ["start_hour", "is_weekend"]
+
+
+def test_clean_store_writer_appends_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean_store, "CLEAN_DATA_DIR", tmp_path)
+
+    with clean_store.CleanStoreWriter("trips.parquet") as writer:
+        writer.write(typed_frame(["Casual", "Casual"]))
+        writer.write(typed_frame(["Annual", "Unknown"], start="2024-08-02 07:00"))
+
+    result = clean_store.read_clean_store("trips.parquet")
+
+    assert writer.rows_written == 4
+    assert list(result["user_type_standardized"]) == ["Casual", "Casual", "Annual", "Unknown"]
+    assert isinstance(result["user_type_standardized"].dtype, pd.CategoricalDtype)
+    assert not (tmp_path / "trips.parquet.tmp").exists()
+    assert clean_store.clean_store_is_sorted("trips.parquet")
+
+
+def test_out_of_order_chunks_are_merged_when_the_store_is_closed(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean_store, "CLEAN_DATA_DIR", tmp_path)
+
+    with clean_store.CleanStoreWriter("trips.parquet") as writer:
+        writer.write(typed_frame(["Casual", "Casual"], start="2024-09-01"))
+        writer.write(typed_frame(["Annual", "Annual"], start="2024-08-01"))
+
+    # the file itself is in order, not just what read_clean_store returns
+    result = pd.read_parquet(tmp_path / "trips.parquet")
+
+    assert not writer.sorted_by_time
+    assert clean_store.clean_store_is_sorted("trips.parquet")
+    assert result["start_time"].is_monotonic_increasing
+    assert list(result["user_type_standardized"]) == ["Annual", "Annual", "Casual", "Casual"]
+
+
+def test_writer_fills_columns_a_chunk_lacks_with_nulls(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean_store, "CLEAN_DATA_DIR", tmp_path)
+
+    with clean_store.CleanStoreWriter("trips.parquet") as writer:
+        writer.write(typed_frame(["Casual", "Annual"]))
+        writer.write(typed_frame(["Annual", "Casual"], start="2024-08-02").drop(columns="user_type_standardized"))
+
+    result = clean_store.read_clean_store("trips.parquet")
+
+    assert len(result) == 4
+    assert result["user_type_standardized"].isna().tolist() == [False, False, True, True]
+
+
+def test_overlapping_chunks_merge_in_bounded_buffers(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean_store, "CLEAN_DATA_DIR", tmp_path)
+    monkeypatch.setattr(clean_store, "MERGE_BUFFER_ROWS", 3000)
+    rng = np.random.default_rng(0)
+    minutes = rng.permutation(20_000)
+    df = pd.DataFrame({
+        "start_time": pd.Timestamp("2024-08-01") + pd.to_timedelta(minutes, unit="min"),
+        "trip_id": minutes,
+        "user_type_standardized": pd.Categorical(rng.choice(["Annual", "Casual"], len(minutes))),
+    })
+    df.loc[::997, "start_time"] = pd.NaT
+
+    with clean_store.CleanStoreWriter("trips.parquet") as writer:
+        for start in range(0, len(df), 1500):
+            writer.write(df.iloc[start:start + 1500])
+
+    result = pd.read_parquet(tmp_path / "trips.parquet")
+    expected = df.sort_values("start_time", kind="stable", na_position="last", ignore_index=True)
+
+    assert clean_store.clean_store_is_sorted("trips.parquet")
+    pd.testing.assert_frame_equal(result.iloc[:-21], expected.iloc[:-21])
+    assert result["start_time"].iloc[-21:].isna().all()
+    assert sorted(result["trip_id"].iloc[-21:]) == sorted(expected["trip_id"].iloc[-21:])
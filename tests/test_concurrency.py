@@ -0,0 +1,113 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from concurrency import TripsInProgress, build_concurrency_profiles, load_trips_in_progress, save_trips_in_progress
+from time_analysis import peak_trips_in_progress_per_day
+
+
+def trips(n: int = 5_000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-07-01") + pd.to_timedelta(rng.integers(0, 3 * 24 * 3600, n), unit="s")
+    duration = pd.to_timedelta(rng.lognormal(6.5, 0.9, n).astype(int), unit="s")
+    df = pd.DataFrame({
+        "start_time": start,
+        "end_time": start + duration,
+        "user_type_standardized": pd.Categorical(rng.choice(["Annual", "Casual"], n, p=[0.7, 0.3])),
+        "bike_model_group": pd.Categorical(rng.choice(["ICONIC", "EFIT"], n)),
+        "start_station_normalized": pd.Categorical(rng.integers(0, 30, n).astype(str)),
+    })
+    df.loc[::211, "end_time"] = pd.NaT
+    return df
+
+
+def brute_force(df: pd.DataFrame, minutes: pd.DatetimeIndex) -> np.ndarray:
+    df = df.dropna(subset=["start_time", "end_time"])
+    start = df["start_time"].to_numpy().astype("datetime64[m]")
+    end = df["end_time"].to_numpy()
+    last = end.astype("datetime64[m]")
+    last = np.where(last < end, last + np.timedelta64(1, "m"), last)
+    last = np.maximum(last, start + np.timedelta64(1, "m"))
+    grid = minutes.to_numpy().astype("datetime64[m]")[:, None]
+    return ((start <= grid) & (grid < last)).sum(axis=1)
+
+
+def test_series_matches_per_minute_count():
+    df = trips()
+    minutes = pd.date_range("2024-07-01", "2024-07-05", freq="min", inclusive="left")
+    counter = TripsInProgress.from_frame(df)
+
+    series = counter.series(start="2024-07-01", end="2024-07-05")
+    np.testing.assert_array_equal(series.to_numpy(), brute_force(df, minutes))
+    np.testing.assert_array_equal(counter.at(minutes[::97]), series.to_numpy()[::97])
+
+    casual = df[df["user_type_standardized"] == "Casual"]
+    by_type = TripsInProgress.from_frame(df, by="user_type_standardized")
+    np.testing.assert_array_equal(
+        by_type.series("Casual", "2024-07-01", "2024-07-05").to_numpy(), brute_force(casual, minutes)
+    )
+
+
+def test_daily_peaks_carry_trips_over_midnight():
+    df = pd.DataFrame({
+        "start_time": pd.to_datetime(["2024-07-01 23:00", "2024-07-01 23:30", "2024-07-02 09:00"]),
+        "end_time": pd.to_datetime(["2024-07-02 01:00", "2024-07-02 00:10", "2024-07-02 09:05"]),
+    })
+    peaks = peak_trips_in_progress_per_day(df)
+
+    assert peaks["peak_trips_in_progress"].tolist() == [2, 2]
+    assert peaks["peak_time"].tolist() == list(pd.to_datetime(["2024-07-01 23:30", "2024-07-02 00:00"]))
+
+
+def test_daily_peaks_no_carry_when_trips_end_at_midnight():
+    df = pd.DataFrame({
+        "start_time": pd.to_datetime(["2024-07-01 23:00", "2024-07-01 23:30"]),
+        "end_time": pd.to_datetime(["2024-07-02 00:00", "2024-07-02 00:00"]),
+    })
+    counter = TripsInProgress.from_frame(df)
+    peaks = counter.daily_peaks().set_index("date")
+
+    assert counter.at("2024-07-02 00:00")[0] == 0
+    assert peaks.loc["2024-07-02", "peak_trips_in_progress"] == 0
+    assert peaks.loc["2024-07-01", "peak_trips_in_progress"] == 2
+
+
+def test_chunked_updates_and_merge_match_single_pass():
+    df = trips(20_000)
+    whole = build_concurrency_profiles(df)
+
+    streamed = {name: TripsInProgress(counter.by) for name, counter in whole.items()}
+    halves = [TripsInProgress("start_station_normalized") for _ in range(2)]
+    for i, start in enumerate(range(0, len(df), 3_000)):
+        chunk = df.iloc[start:start + 3_000]
+        for counter in streamed.values():
+            counter.update(chunk)
+        halves[i % 2].update(chunk)
+
+    for name, counter in whole.items():
+        pd.testing.assert_frame_equal(streamed[name].daily_peaks(), counter.daily_peaks())
+    pd.testing.assert_frame_equal(halves[0].merge(halves[1]).daily_peaks(), whole["start_station"].daily_peaks())
+
+    peaks = whole["user_type"].daily_peaks()
+    for user_type, group in df.groupby("user_type_standardized", observed=True):
+        expected = peak_trips_in_progress_per_day(group)
+        np.testing.assert_array_equal(
+            peaks.loc[peaks["user_type_standardized"] == user_type, "peak_trips_in_progress"],
+            expected["peak_trips_in_progress"],
+        )
+
+
+def test_saved_counters_merge_like_the_originals(tmp_path):
+    df = trips()
+    for by in ((), ("user_type_standardized",)):
+        save_trips_in_progress(TripsInProgress.from_frame(df.iloc[:3000], by), tmp_path / "first")
+        save_trips_in_progress(TripsInProgress.from_frame(df.iloc[3000:], by), tmp_path / "second")
+
+        merged = load_trips_in_progress(tmp_path / "first").merge(load_trips_in_progress(tmp_path / "second"))
+        pd.testing.assert_frame_equal(merged.daily_peaks(), TripsInProgress.from_frame(df, by).daily_peaks())
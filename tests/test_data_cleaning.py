@@ -98,3 +98,17 @@ def test_clean_station_fields():
 
     assert result.loc[0, "end_station_name_clean"] == "Queens Quay / Yonge St"
     assert result.loc[1, "end_station_name_clean"] == "Queens Quay / Yonge St"
+
+
+def test_to_datetime_unique_matches_to_datetime():
+    from data_cleaning import to_datetime_unique
+
+    raw = pd.Series(
+        ["08/01/2024 00:00", "08/01/2024 00:00", None, "not a date", "08/02/2024 13:45"]
+    )
+    expected = pd.to_datetime(raw, format="%m/%d/%Y %H:%M", errors="coerce")
+
+    for series in (raw, raw.astype("category")):
+        result = to_datetime_unique(series, format="%m/%d/%Y %H:%M")
+        assert list(result.isna()) == [False, False, True, True, False]
+        assert (result.dropna() == expected.dropna()).all()
@@ -42,3 +42,23 @@ def test_load_bike_data_missing_file(tmp_path, monkeypatch):
 
     with pytest.raises(FileNotFoundError):
         data_loader.load_bike_data("does_not_exist.csv")
+
+
+def test_iter_bike_data_chunks(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+
+    pd.DataFrame({"Trip Id": range(5)}).to_csv(raw_dir / "test_bike.csv", index=False)
+    monkeypatch.setattr(data_loader, "RAW_DATA_DIR", raw_dir)
+
+    chunks = list(data_loader.iter_bike_data_chunks("test_bike.csv", chunksize=2))
+
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert list(pd.concat(chunks)["Trip Id"]) == [0, 1, 2, 3, 4]
+
+
+def test_iter_bike_data_chunks_missing_file_fails_eagerly(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, "RAW_DATA_DIR", tmp_path)
+
+    with pytest.raises(FileNotFoundError):
+        data_loader.iter_bike_data_chunks("does_not_exist.csv")
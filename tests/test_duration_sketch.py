@@ -0,0 +1,124 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from analysis import summarize_trip_duration_by_user_type
+from analysis_outliers import detect_trip_duration_outliers
+from duration_sketch import (
+    DurationSketch,
+    build_duration_sketches,
+    combine_duration_sketches,
+    load_duration_sketches,
+    save_duration_sketches,
+)
+
+
+def trips(n: int = 200_000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    duration = rng.lognormal(6.5, 0.8, n)
+    duration[::97] = np.nan
+    return pd.DataFrame({
+        "trip_duration_clean": duration,
+        "user_type_standardized": pd.Categorical(rng.choice(["Annual", "Casual"], n, p=[0.7, 0.3])),
+        "start_station_normalized": pd.Categorical(rng.integers(0, 300, n).astype(str)),
+        "end_station_normalized": pd.Categorical(rng.integers(0, 300, n).astype(str)),
+    })
+
+
+def chunked(df: pd.DataFrame, size: int):
+    for start in range(0, len(df), size):
+        # every chunk gets its own category sets, as in streamed ingestion
+        yield df.iloc[start:start + size].astype({
+            "start_station_normalized": str, "end_station_normalized": str,
+        }).astype({"start_station_normalized": "category", "end_station_normalized": "category"})
+
+
+def test_small_groups_are_exact():
+    df = trips(20_000)
+    df.loc[::53, "start_station_normalized"] = np.nan
+    by = ["start_station_normalized", "end_station_normalized"]
+    sketch = DurationSketch.from_frame(df, by)
+
+    expected = df.groupby(by, observed=True)["trip_duration_clean"].agg(["count", "mean", "std", "median"])
+    result = sketch.summary(q=[0.5]).reindex(expected.index)
+
+    np.testing.assert_array_equal(result["count"], expected["count"])
+    np.testing.assert_allclose(result[["mean", "std", "50%"]], expected[["mean", "std", "median"]], equal_nan=True)
+
+
+def test_quantiles_within_rank_error_after_merging_chunks():
+    df = trips()
+    sketch = DurationSketch(by="user_type_standardized")
+    for chunk in chunked(df, 15_000):
+        sketch.update(chunk)
+
+    q = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+    estimates = sketch.quantiles(q)
+    for user_type, durations in df.groupby("user_type_standardized", observed=True)["trip_duration_clean"]:
+        values = np.sort(durations.dropna().to_numpy())
+        ranks = np.searchsorted(values, estimates.loc[user_type].to_numpy()) / len(values)
+        assert np.abs(ranks - q).max() < 0.0165
+    # a few hundred retained items instead of one per trip
+    assert sketch.n_items < 2_000
+
+    exact = df.groupby("user_type_standardized", observed=True)["trip_duration_clean"].agg(["count", "mean", "std", "min", "max"])
+    exact.index = exact.index.astype(str)
+    pd.testing.assert_frame_equal(sketch.moments().sort_index(), exact, check_dtype=False)
+
+
+def test_combine_matches_single_pass_and_leaves_parts_alone():
+    df = trips(60_000)
+    parts = [build_duration_sketches(chunk) for chunk in chunked(df, 7_000)]
+    n_items = [part["route"].n_items for part in parts]
+
+    combined = combine_duration_sketches(parts)
+    whole = build_duration_sketches(df)
+
+    assert [part["route"].n_items for part in parts] == n_items
+    for name in whole:
+        pd.testing.assert_frame_equal(
+            combined[name].moments().sort_index(),
+            whole[name].moments().sort_index(),
+        )
+
+
+def test_outlier_thresholds_and_summary_from_sketches():
+    df = trips()
+    sketches = build_duration_sketches(df)
+
+    exact_df, exact = detect_trip_duration_outliers(df, method="iqr")
+    sketch_df, approx = detect_trip_duration_outliers(df, method="iqr", sketch=sketches["all"])
+    for bound in ("lower_bound", "upper_bound"):
+        assert abs(approx["thresholds"][bound] / exact["thresholds"][bound] - 1) < 0.02
+    assert abs(len(sketch_df) / len(exact_df) - 1) < 0.05
+
+    _, exact = detect_trip_duration_outliers(df, method="zscore")
+    _, approx = detect_trip_duration_outliers(df, method="zscore", sketch=sketches["all"])
+    assert np.isclose(approx["thresholds"]["upper_bound"], exact["thresholds"]["upper_bound"])
+
+    summary = summarize_trip_duration_by_user_type(sketches["user_type"])
+    expected = summarize_trip_duration_by_user_type(df)
+    np.testing.assert_array_equal(summary["trips_count"], expected["trips_count"])
+    np.testing.assert_allclose(summary["duration_mean_sec"], expected["duration_mean_sec"])
+    np.testing.assert_allclose(summary["duration_median_sec"], expected["duration_median_sec"], rtol=0.02)
+
+
+def test_saved_sketches_merge_like_the_originals(tmp_path):
+    df = trips(40_000)
+    first, second = build_duration_sketches(df.iloc[:25_000]), build_duration_sketches(df.iloc[25_000:])
+    save_duration_sketches(first, tmp_path / "first")
+    save_duration_sketches(second, tmp_path / "second")
+
+    loaded = combine_duration_sketches(
+        load_duration_sketches(tmp_path / part) for part in ("first", "second")
+    )
+    expected = combine_duration_sketches([first, second])
+    for name in expected:
+        pd.testing.assert_frame_equal(loaded[name].moments(), expected[name].moments())
+        pd.testing.assert_frame_equal(loaded[name].quantiles(), expected[name].quantiles())
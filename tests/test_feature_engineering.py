@@ -110,3 +110,17 @@ def test_add_rush_hour_flag():
     assert "is_rush_hour" in result.columns
     # 8 and 17 are inside rush hour ranges
     assert list(result["is_rush_hour"]) == [False, True, False, True, False]
+
+
+def test_add_time_features_keeps_nat_rows_missing():
+    df = pd.DataFrame(
+        {"start_time": pd.to_datetime(["2024-08-03 15:30:00", None, "2024-08-05 07:05:00"])}
+    )
+
+    result = add_time_features(df)
+
+    assert result["start_hour"].isna().tolist() == [False, True, False]
+    assert result["start_hour"].dropna().tolist() == [15, 7]
+    assert result["start_weekday"].tolist()[0] == "Saturday"
+    assert pd.isna(result["start_weekday"].iloc[1])
+    assert result["start_weekday"].iloc[2] == "Monday"
@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import group_aggregates
+from group_aggregates import FactorizedKeys, multi_aggregate
+
+
+def trips(n: int = 20_000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "start_hour": rng.integers(0, 24, n),
+        "start_weekday": rng.choice(["Monday", "Saturday", "Sunday"], n),
+        "user_type_standardized": pd.Categorical(rng.choice(["Annual", "Casual"], n), categories=["Annual", "Casual", "Unknown"]),
+        "start_station_normalized": pd.Categorical(rng.integers(0, 50, n).astype(str)),
+        "trip_duration_clean": rng.lognormal(6.5, 0.8, n),
+    })
+    df.loc[::17, "start_station_normalized"] = np.nan
+    df.loc[::23, "start_weekday"] = None
+    return df
+
+
+def expected(df: pd.DataFrame, by) -> pd.DataFrame:
+    return (
+        df.groupby(by, observed=True, dropna=False, sort=True)["trip_duration_clean"]
+          .agg(trip_count="size", duration_sum_sec="sum")
+          .reset_index()
+    )
+
+
+def test_aggregates_match_groupby_with_missing_keys():
+    df = trips()
+    groupings = {
+        "hour": ["start_hour"],
+        "weekday": ["start_weekday"],
+        "hour_user": ["start_hour", "user_type_standardized"],
+        "station_weekday": ["start_station_normalized", "start_weekday"],
+    }
+    result = multi_aggregate(df, groupings, sums={"duration_sum_sec": df["trip_duration_clean"].to_numpy()})
+
+    for name, by in groupings.items():
+        pd.testing.assert_frame_equal(result[name], expected(df, by), check_dtype=False)
+    # categorical keys keep their dtype (all categories), as groupby does
+    assert result["hour_user"]["user_type_standardized"].dtype == df["user_type_standardized"].dtype
+
+
+def test_sparse_key_space_matches_dense(monkeypatch):
+    df = trips()
+    by = ["start_station_normalized", "start_hour", "start_weekday"]
+    dense = FactorizedKeys(df, by).aggregate(by)
+
+    monkeypatch.setattr(group_aggregates, "DENSE_MAX_CELLS", 10)
+    sparse = FactorizedKeys(df, by).aggregate(by)
+
+    pd.testing.assert_frame_equal(sparse, dense)
+
+
+def test_integer_sums_means_and_grand_total():
+    df = trips()
+    keys = FactorizedKeys(df, ["user_type_standardized"])
+    long_trip = (df["trip_duration_clean"] > 1800).to_numpy()
+
+    result = keys.aggregate(
+        ["user_type_standardized"],
+        sums={"long_trips": long_trip, "duration_sum_sec": df["trip_duration_clean"].to_numpy()},
+        means={"duration_mean_sec": ("duration_sum_sec", "trip_count")},
+    )
+    assert result["long_trips"].dtype == "int64"
+    np.testing.assert_allclose(
+        result["duration_mean_sec"],
+        df.groupby("user_type_standardized", observed=True)["trip_duration_clean"].mean(),
+    )
+
+    total = keys.aggregate([], sums={"long_trips": long_trip})
+    assert total.to_dict("records") == [{"trip_count": len(df), "long_trips": int(long_trip.sum())}]
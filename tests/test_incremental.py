@@ -0,0 +1,113 @@
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import clean_store
+import incremental
+from test_pipeline import raw_trips
+from trip_cube import TripCube
+
+
+def test_incremental_run_only_processes_new_and_changed_files(data_dirs, monkeypatch):
+    raw_dir, clean_dir = data_dirs
+    raw_trips(4).to_csv(raw_dir / "bike-2024-08.csv", index=False)
+
+    first = incremental.run_incremental("bike-*.csv", max_workers=1)
+    assert set(first["files"]) == {"bike-2024-08.csv"}
+    assert (clean_dir / "partitions" / "bike-2024-08.parquet").exists()
+
+    processed = []
+    original = incremental.iter_ingested_files
+
+    def spy(paths, **kwargs):
+        processed.extend(p.name for p in paths)
+        return original(paths, **kwargs)
+
+    monkeypatch.setattr(incremental, "iter_ingested_files", spy)
+
+    # touched but identical -> skipped after a hash check
+    os.utime(raw_dir / "bike-2024-08.csv", ns=(1, 1))
+    raw_trips(6).to_csv(raw_dir / "bike-2024-09.csv", index=False)
+    second = incremental.run_incremental("bike-*.csv", max_workers=1)
+
+    assert processed == ["bike-2024-09.csv"]
+    assert second["files"]["bike-2024-09.csv"]["rows"] == 6
+    assert len(clean_store.read_clean_store()) == 10
+
+    totals = incremental.combine_aggregates(second)
+    assert TripCube(totals["trip_cube"]).total_trips() == 10
+    assert totals["duration_sketches"]["all"].moments()["count"].sum() == 10
+    assert totals["duration_sketches"]["user_type"].moments()["count"].sum() == 10
+    peaks = totals["trips_in_progress"].daily_peaks()
+    assert set(peaks["user_type_standardized"]) == {"Casual", "Annual"}
+
+
+def test_incremental_run_drops_removed_files(data_dirs):
+    raw_dir, clean_dir = data_dirs
+    raw_trips(4).to_csv(raw_dir / "bike-2024-08.csv", index=False)
+    raw_trips(6).to_csv(raw_dir / "bike-2024-09.csv", index=False)
+    incremental.run_incremental("bike-*.csv", max_workers=1)
+
+    (raw_dir / "bike-2024-08.csv").unlink()
+    manifest = incremental.run_incremental("bike-*.csv", max_workers=1)
+
+    assert list(manifest["files"]) == ["bike-2024-09.csv"]
+    assert not (clean_dir / "partitions" / "bike-2024-08.parquet").exists()
+    assert not (clean_dir / "aggregates" / "bike-2024-08").exists()
+    assert len(clean_store.read_clean_store()) == 6
+
+
+def test_incremental_run_with_narrower_pattern_keeps_other_files(data_dirs):
+    raw_dir, clean_dir = data_dirs
+    raw_trips(4).to_csv(raw_dir / "bike-2024-08.csv", index=False)
+    raw_trips(6).to_csv(raw_dir / "bike-2024-09.csv", index=False)
+    incremental.run_incremental("bike-*.csv", max_workers=1)
+
+    manifest = incremental.run_incremental("bike-2024-09.csv", max_workers=1)
+
+    assert sorted(manifest["files"]) == ["bike-2024-08.csv", "bike-2024-09.csv"]
+    assert (clean_dir / "partitions" / "bike-2024-08.parquet").exists()
+    assert len(clean_store.read_clean_store()) == 10
+
+
+def test_changed_file_is_hashed_once(data_dirs, monkeypatch):
+    raw_dir, _ = data_dirs
+    raw_trips(4).to_csv(raw_dir / "bike-2024-08.csv", index=False)
+    incremental.run_incremental("bike-*.csv", max_workers=1)
+
+    # same size, new content and mtime -> hashed while planning, not again
+    text = (raw_dir / "bike-2024-08.csv").read_text()
+    (raw_dir / "bike-2024-08.csv").write_text(text.replace("1,600,", "1,660,", 1))
+    os.utime(raw_dir / "bike-2024-08.csv", ns=(2, 2))
+
+    hashed = []
+    original = incremental.file_fingerprint
+
+    def spy(path, **kwargs):
+        hashed.append(path.name)
+        return original(path, **kwargs)
+
+    monkeypatch.setattr(incremental, "file_fingerprint", spy)
+    manifest = incremental.run_incremental("bike-*.csv", max_workers=1)
+
+    assert hashed == ["bike-2024-08.csv"]
+    assert manifest["files"]["bike-2024-08.csv"]["mtime_ns"] == 2
+
+
+def test_missing_partition_is_rebuilt(data_dirs):
+    raw_dir, clean_dir = data_dirs
+    raw_trips(4).to_csv(raw_dir / "bike-2024-08.csv", index=False)
+    raw_trips(6).to_csv(raw_dir / "bike-2024-09.csv", index=False)
+    manifest = incremental.run_incremental("bike-*.csv", max_workers=1)
+
+    (clean_dir / "partitions" / "bike-2024-08.parquet").unlink()
+    plan = incremental.plan_incremental_run("bike-*.csv", manifest)
+    assert [p.name for p in plan["changed"]] == ["bike-2024-08.csv"]
+
+    incremental.run_incremental("bike-*.csv", max_workers=1)
+    assert (clean_dir / "partitions" / "bike-2024-08.parquet").exists()
+    assert len(clean_store.read_clean_store()) == 10
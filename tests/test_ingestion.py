@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import data_loader
+import ingestion
+from schema import canonical_column_name
+from test_pipeline import raw_trips
+
+
+def test_canonical_column_name_handles_spelling_drift():
+    assert canonical_column_name("Trip Duration") == "Trip  Duration"
+    assert canonical_column_name("trip_duration") == "Trip  Duration"
+    assert canonical_column_name("﻿Trip Id") == "Trip Id"
+    assert canonical_column_name("from_station_name") == "Start Station Name"
+    assert canonical_column_name("Something Else") == "Something Else"
+
+
+@pytest.fixture
+def monthly_drops(data_dirs):
+    raw_dir, _ = data_dirs
+
+    august = raw_trips(4)
+    # September's drop spells the duration header with a single space
+    september = raw_trips(6).rename(columns={"Trip  Duration": "Trip Duration"})
+    september["Start Station Name"] = "Spadina Ave"
+    september["Start Time"] = september["Start Time"].str.replace("08/", "09/", n=1)
+
+    august.to_csv(raw_dir / "bike-2024-08.csv", index=False)
+    september.to_csv(raw_dir / "bike-2024-09.csv", index=False)
+
+    return raw_dir
+
+
+def test_resolve_raw_files_glob_is_sorted(monthly_drops):
+    paths = data_loader.resolve_raw_files("bike-2024-*.csv")
+
+    assert [p.name for p in paths] == ["bike-2024-08.csv", "bike-2024-09.csv"]
+
+
+def test_load_bike_files_merges_in_file_order(monthly_drops):
+    serial = ingestion.load_bike_files("bike-2024-*.csv", max_workers=1)
+    parallel = ingestion.load_bike_files(
+        ["bike-2024-09.csv", "bike-2024-08.csv"], max_workers=2
+    )
+
+    assert len(serial) == 10
+    assert list(serial["source_file"]) == ["bike-2024-08.csv"] * 4 + ["bike-2024-09.csv"] * 6
+    assert serial["trip_duration_clean"].notna().all()
+    # station names from both months end up in one categorical
+    assert isinstance(serial["start_station_normalized"].dtype, pd.CategoricalDtype)
+    assert {"Union Station", "Spadina Ave"} <= set(serial["start_station_normalized"])
+
+    pd.testing.assert_frame_equal(serial, parallel)
@@ -0,0 +1,90 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import od_matrix as od_matrix_module
+from benchmark import make_synthetic_raw_trips
+from od_matrix import ODMatrix
+from pipeline import process_bike_data
+from trip_cube import TripCube, build_trip_cube
+
+
+def regional_trips(n: int = 40_000, seed: int = 0) -> pd.DataFrame:
+    """Three regions of 20 stations; 90% of trips stay inside their region."""
+    rng = np.random.default_rng(seed)
+    region = rng.integers(0, 3, n)
+    start = region * 20 + rng.integers(0, 20, n)
+    end = np.where(rng.random(n) < 0.9, region * 20 + rng.integers(0, 20, n), rng.integers(0, 60, n))
+    df = pd.DataFrame({
+        "start_station_normalized": pd.Categorical([f"S{i:02d}" for i in start]),
+        "end_station_normalized": [f"S{i:02d}" for i in end],
+    })
+    df.loc[::101, "end_station_normalized"] = None
+    return df
+
+
+def test_csr_matches_crosstab_and_dense_build(monkeypatch):
+    df = regional_trips()
+    od = ODMatrix.from_frame(df)
+
+    expected = pd.crosstab(df["start_station_normalized"].astype(str), df["end_station_normalized"])
+    expected = expected.reindex(index=od.stations, columns=od.stations, fill_value=0)
+    np.testing.assert_array_equal(od.to_dense(), expected.to_numpy())
+    np.testing.assert_array_equal(od.transpose().to_dense(), expected.to_numpy().T)
+    np.testing.assert_array_equal(od.out_degree(), (expected > 0).sum(axis=1))
+    np.testing.assert_array_equal(od.in_degree(), (expected > 0).sum(axis=0))
+
+    monkeypatch.setattr(od_matrix_module, "DENSE_MAX_CELLS", 10)
+    sparse = ODMatrix.from_frame(df)
+    for attr in ("indptr", "indices", "data"):
+        np.testing.assert_array_equal(getattr(sparse, attr), getattr(od, attr))
+
+
+def test_network_measures():
+    od = ODMatrix.from_frame(regional_trips())
+    dense = od.to_dense().astype(float)
+
+    # PageRank against the dense power iteration
+    transition = dense / dense.sum(axis=1, keepdims=True)
+    rank = np.full(od.n_stations, 1 / od.n_stations)
+    for _ in range(200):
+        rank = 0.85 * transition.T @ rank + 0.15 / od.n_stations
+    np.testing.assert_allclose(od.pagerank(), rank / rank.sum(), atol=1e-9)
+
+    np.testing.assert_allclose(od.matvec(np.ones(od.n_stations)), dense.sum(axis=1))
+    np.testing.assert_allclose(od.asymmetry(), (dense.sum(1) - dense.sum(0)) / (dense.sum(1) + dense.sum(0)))
+
+    # the three regions come out as the communities
+    region = np.array([int(name[1:]) // 20 for name in od.stations])
+    communities = od.communities()
+    assert len(np.unique(communities)) == 3
+    assert (pd.crosstab(region, communities).to_numpy() > 0).sum() == 3
+    assert (od.components() == 0).all()
+
+    pairs = od.pair_asymmetry()
+    upper = np.triu(dense, 1) + np.tril(dense, -1).T
+    assert len(pairs) == (upper > 0).sum()
+    assert pairs["trips_ab"].sum() + pairs["trips_ba"].sum() == dense.sum() - np.trace(dense)
+
+
+def test_cube_od_matrix_follows_filters():
+    df = process_bike_data(make_synthetic_raw_trips(5000, n_stations=40, seed=7))
+    cube = TripCube(build_trip_cube(df))
+
+    where = {"user_type_standardized": "Casual", "start_hour": (7, 9)}
+    od = cube.od_matrix(where)
+    subset = df[(df["user_type_standardized"] == "Casual") & df["start_hour"].between(7, 9)]
+    assert od.data.sum() == subset[["start_station_normalized", "end_station_normalized"]].notna().all(axis=1).sum()
+
+    # hour band + user type come from the (hour, user type, start, end) cuboid, not the base one
+    assert cube._choose_cuboid(cube._source_dims(["start_station_normalized", "end_station_normalized", *where])) == "od_hour"
+
+    top = od.top_routes(5)
+    expected = cube.top_k(["start_station_normalized", "end_station_normalized"], k=5, where=where)
+    np.testing.assert_array_equal(top["trip_count"], expected["trip_count"])
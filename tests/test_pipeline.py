@@ -0,0 +1,136 @@
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import clean_store
+import pipeline
+from time_index import sort_by_time
+from trip_cube import StreamingTripCube, TripCube, build_trip_cube
+
+
+def raw_trips(n: int = 6) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Trip Id": range(1, n + 1),
+        "Trip  Duration": [600] * n,
+        "Start Station Id": [7001, 7002] * (n // 2),
+        "Start Time": [f"08/0{1 + i % 3}/2024 0{7 + i % 3}:00" for i in range(n)],
+        "Start Station Name": ["Union Station", "Bay St"] * (n // 2),
+        "End Station Id": [7002, 7001] * (n // 2),
+        "End Time": [f"08/0{1 + i % 3}/2024 0{7 + i % 3}:10" for i in range(n)],
+        "End Station Name": ["Bay St", "Union Station"] * (n // 2),
+        "Bike Id": [100 + i for i in range(n)],
+        "User Type": ["Casual Member", "Annual Member"] * (n // 2),
+        "Model": ["ICONIC", "EFIT"] * (n // 2),
+    })
+
+
+def test_streaming_pipeline_matches_in_memory(data_dirs):
+    raw_dir, clean_dir = data_dirs
+    raw_trips().to_csv(raw_dir / "trips.csv", index=False)
+
+    chunks = list(pipeline.stream_processed_chunks("trips.csv", chunksize=4))
+    assert [len(c) for c in chunks] == [4, 2]
+
+    output_path = pipeline.run_streaming_pipeline("trips.csv", "trips-clean.parquet", chunksize=4)
+    # a second run replaces the store rather than appending to it
+    output_path = pipeline.run_streaming_pipeline("trips.csv", "trips-clean.parquet", chunksize=4)
+
+    streamed = clean_store.read_clean_store(output_path.name)
+    expected = pipeline.process_bike_data(raw_trips())
+    # the chunks overlap in time, so the writer merges them into order on close
+    assert clean_store.clean_store_is_sorted(output_path.name)
+    expected = sort_by_time(expected)
+
+    assert len(streamed) == len(expected)
+    assert list(streamed["start_station_normalized"]) == list(expected["start_station_normalized"])
+    assert list(streamed["start_hour"]) == list(expected["start_hour"])
+    assert (streamed["start_time"] == expected["start_time"]).all()
+
+
+def test_streaming_pipeline_collects_the_trip_cube(data_dirs):
+    raw_dir, _ = data_dirs
+    raw_trips(8).to_csv(raw_dir / "trips.csv", index=False)
+
+    streaming = StreamingTripCube()
+    pipeline.run_streaming_pipeline("trips.csv", "trips-clean.parquet", chunksize=3, trip_cubes=[streaming])
+
+    expected = TripCube(build_trip_cube(pipeline.process_bike_data(raw_trips(8))))
+    cube = TripCube(streaming.cube)
+    assert cube.total_trips() == 8
+    pd.testing.assert_frame_equal(
+        cube.query(["start_hour", "user_type_standardized"]),
+        expected.query(["start_hour", "user_type_standardized"]),
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+
+def test_process_bike_data_keeps_compact_schema():
+    result = pipeline.process_bike_data(raw_trips())
+
+    assert isinstance(result["user_type_standardized"].dtype, pd.CategoricalDtype)
+    assert isinstance(result["start_station_normalized"].dtype, pd.CategoricalDtype)
+    assert isinstance(result["start_weekday"].dtype, pd.CategoricalDtype)
+    assert result["start_hour"].dtype == "int8"
+    assert result["trip_duration_clean"].dtype == "float32"
+    assert result["is_rush_hour"].dtype == "bool"
+
+
+def test_run_pipeline_matches_chained_stages_without_touching_input():
+    raw = raw_trips()
+    columns_before = list(raw.columns)
+
+    engine = pipeline.run_pipeline(raw, pipeline.CLEANING_STAGES + pipeline.FEATURE_STAGES)
+    chained = pipeline.run_stages(raw, pipeline.CLEANING_STAGES + pipeline.FEATURE_STAGES)
+
+    assert list(raw.columns) == columns_before
+    pd.testing.assert_frame_equal(engine[chained.columns], chained)
+
+
+def test_run_pipeline_inplace_adds_declared_outputs():
+    raw = raw_trips()
+
+    result = pipeline.run_pipeline(raw, pipeline.CLEANING_STAGES[:2], inplace=True)
+
+    assert result is raw
+    assert {"user_type_standardized", "bike_model_group"} <= set(raw.columns)
+
+
+def test_profiled_pipeline_records_every_stage(tmp_path):
+    from profiling import PipelineProfiler
+
+    stages = pipeline.CLEANING_STAGES + pipeline.FEATURE_STAGES
+    with PipelineProfiler() as profiler:
+        result = pipeline.process_bike_data(raw_trips(), profiler=profiler)
+
+    summary = profiler.summary()
+    assert list(summary["stage"]) == [s.name for s in stages]
+    assert (summary["rows_in"] == 6).all() and (summary["rows_out"] == len(result)).all()
+    assert (summary["cpu_s"] >= 0).all() and (summary["frame_mb"] > 0).all()
+
+    json_path, text_path = profiler.write_report(tmp_path, name="profile")
+    report = json.loads(json_path.read_text())
+    assert [s["stage"] for s in report["stages"]] == list(summary["stage"])
+    assert "add_rush_hour_flag" in text_path.read_text()
+    assert "TOTAL" in text_path.read_text()
+
+
+def test_profiled_streaming_sums_chunks(data_dirs):
+    from profiling import PipelineProfiler
+
+    raw_dir, _ = data_dirs
+    raw_trips().to_csv(raw_dir / "trips.csv", index=False)
+
+    profiler = PipelineProfiler(trace_memory=False)
+    pipeline.run_streaming_pipeline("trips.csv", "trips-clean.parquet", chunksize=4, profiler=profiler)
+
+    summary = profiler.summary().set_index("stage")
+    assert summary.loc["load_bike_data", "runs"] == 2
+    assert summary.loc["load_bike_data", "rows_out"] == 6
+    assert summary.loc["add_time_features", "rows_in"] == 6
@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import route_stats as route_stats_module
+from group_aggregates import grouped_quantiles
+from route_stats import RouteStats, build_route_stats, save_route_stats
+
+
+def trips(n: int = 50_000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Start Station Id": pd.array(rng.integers(7000, 7060, n), dtype="Int32"),
+        "End Station Id": pd.array(rng.integers(7000, 7060, n), dtype="Int32"),
+        "trip_duration_clean": rng.lognormal(6.5, 0.6, n).astype("float32"),
+        "trip_distance_km": rng.gamma(3, 0.7, n).astype("float32"),
+    })
+    df.loc[::113, "Start Station Id"] = pd.NA
+    df.loc[::37, "trip_distance_km"] = np.nan
+    return df
+
+
+def test_route_stats_match_groupby_quantiles():
+    df = trips()
+    stats = build_route_stats(df).set_index(["start_station_id", "end_station_id"])
+
+    groups = df.dropna(subset=["Start Station Id"]).groupby(["Start Station Id", "End Station Id"])
+    np.testing.assert_array_equal(stats["trip_count"], groups.size())
+    for column, prefix in (("trip_duration_clean", "duration_sec"), ("trip_distance_km", "distance_km")):
+        expected = groups[column].quantile([0.1, 0.5, 0.9]).unstack()
+        for q in (0.1, 0.5, 0.9):
+            np.testing.assert_allclose(stats[f"{prefix}_p{round(q * 100)}"], expected[q], rtol=1e-6)
+    np.testing.assert_allclose(stats["speed_kmh"], stats["distance_km_p50"] / stats["duration_sec_p50"] * 3600)
+
+
+def test_grouped_quantiles_float32_path_matches_float64():
+    rng = np.random.default_rng(3)
+    codes = rng.integers(0, 100_000, 300_000)
+    values = rng.normal(0, 50, 300_000).astype("float32")
+
+    packed = grouped_quantiles(codes, values, 100_001, [0.1, 0.5, 0.9])
+    generic = grouped_quantiles(codes, values.astype("float64"), 100_001, [0.1, 0.5, 0.9])
+    np.testing.assert_array_equal(packed, generic)
+    assert np.isnan(packed[-1]).all()
+
+
+@pytest.mark.parametrize("dense", [True, False])
+def test_lookup_by_station_ids(monkeypatch, dense):
+    if not dense:
+        monkeypatch.setattr(route_stats_module, "DENSE_MAX_STATIONS", 1)
+        monkeypatch.setattr(route_stats_module, "LOOKUP_MAX_ID", 1)
+    df = trips()
+    routes = RouteStats(build_route_stats(df))
+
+    row = routes.get(7001, 7002)
+    mask = (df["Start Station Id"] == 7001) & (df["End Station Id"] == 7002)
+    assert row["trip_count"] == mask.sum()
+    assert row["duration_sec_p50"] == pytest.approx(df.loc[mask, "trip_duration_clean"].median())
+    with pytest.raises(KeyError):
+        routes.get(7001, 9999)
+
+    found = routes.lookup(df["Start Station Id"], df["End Station Id"])
+    known = df["Start Station Id"].notna().to_numpy()
+    assert found["trip_count"].notna().to_numpy().tolist() == known.tolist()
+    assert (found["start_station_id"].to_numpy()[known] == df["Start Station Id"].to_numpy()[known]).all()
+    assert (routes.rows([7001, -5, 7059], [7002, 7003, 12]) >= 0).tolist() == [True, False, False]
+
+
+def test_route_stats_round_trip(data_dirs):
+    stats = build_route_stats(trips(5_000))
+    save_route_stats(stats)
+
+    loaded = RouteStats.load()
+    pd.testing.assert_frame_equal(loaded.table, stats)
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from schema import apply_schema, memory_report
+
+
+def test_apply_schema_casts_known_columns_only():
+    df = pd.DataFrame({
+        "User Type": ["Casual Member", "Annual Member"],
+        "start_hour": [7, 18],
+        "Start Station Latitude": [43.6532, 43.6426],
+        "not_in_schema": [1, 2],
+    })
+
+    result = apply_schema(df)
+
+    assert isinstance(result["User Type"].dtype, pd.CategoricalDtype)
+    assert result["start_hour"].dtype == "int8"
+    assert result["Start Station Latitude"].dtype == "float32"
+    assert result["not_in_schema"].dtype == "int64"
+    # input frame is left untouched
+    assert df["start_hour"].dtype == "int64"
+
+
+def test_apply_schema_uses_nullable_ints_for_gaps():
+    df = pd.DataFrame({"End Station Id": [7001, None], "start_hour": [7, None]})
+
+    result = apply_schema(df)
+
+    assert result["End Station Id"].dtype == "Int32"
+    assert result["start_hour"].dtype == "Int8"
+    assert result["End Station Id"].isna().sum() == 1
+
+
+def test_memory_report_shows_reduction():
+    n = 1000
+    df = pd.DataFrame({
+        "User Type": ["Casual Member", "Annual Member"] * (n // 2),
+        "start_hour": [7, 18] * (n // 2),
+    })
+
+    report = memory_report(df)
+
+    assert list(report["column"]) == ["User Type", "start_hour", "TOTAL"]
+    total = report.iloc[-1]
+    assert total["schema_bytes"] < total["bytes"]
+    assert report.loc[report["column"] == "start_hour", "schema_bytes"].iloc[0] == n
@@ -0,0 +1,106 @@
+import os
+import sys
+from dataclasses import replace
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import pipeline
+from data_cleaning import clean_station_fields
+from stage_cache import StageCache, stage_fingerprint
+from station_dimension import build_station_dimension, load_station_dimension, update_station_dimension
+from test_pipeline import raw_trips
+
+STAGES = pipeline.CLEANING_STAGES + pipeline.FEATURE_STAGES
+
+
+def rush_hour_v2(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy(deep=False)
+    df["is_rush_hour"] = df["start_hour"].between(6, 10)
+    return df
+
+
+def test_rerun_is_served_from_cache(data_dirs):
+    expected = pipeline.run_pipeline(raw_trips(), STAGES)
+
+    first = StageCache()
+    pipeline.run_pipeline(raw_trips(), STAGES, cache=first)
+    assert (first.hits, first.misses) == (0, len(STAGES))
+
+    second = StageCache()
+    result = pipeline.run_pipeline(raw_trips(), STAGES, cache=second)
+    assert (second.hits, second.misses) == (len(STAGES), 0)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_changed_stage_resumes_from_it(data_dirs):
+    pipeline.run_pipeline(raw_trips(), STAGES, cache=StageCache())
+
+    i = next(i for i, stage in enumerate(STAGES) if stage.name == "add_rush_hour_flag")
+    edited = STAGES[:i] + (replace(STAGES[i], func=rush_hour_v2),) + STAGES[i + 1:]
+    cache = StageCache()
+    result = pipeline.run_pipeline(raw_trips(), edited, cache=cache)
+
+    # the edited stage and everything after it rerun
+    assert (cache.hits, cache.misses) == (i, len(STAGES) - i)
+    assert result["is_rush_hour"].tolist() == pipeline.run_stages(raw_trips(), edited)["is_rush_hour"].tolist()
+
+
+def test_stage_parameters_are_part_of_the_key():
+    dim = build_station_dimension(raw_trips())
+    other = dim.assign(station_name="Renamed")
+
+    with_dim = stage_fingerprint(partial(clean_station_fields, station_dim=dim))
+    assert with_dim == stage_fingerprint(partial(clean_station_fields, station_dim=dim.copy()))
+    assert with_dim != stage_fingerprint(partial(clean_station_fields, station_dim=other))
+    assert with_dim != stage_fingerprint(clean_station_fields)
+
+
+def test_lru_eviction_keeps_recently_used_entries(tmp_path):
+    cache = StageCache(tmp_path, max_bytes=10**9)
+    frame = pd.DataFrame({"x": range(1000)})
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.store(key, frame)
+        os.utime(cache.path(key), ns=(i * 10**9, i * 10**9))
+
+    cache.load("a")  # "a" becomes the most recently used
+    cache.max_bytes = cache.size_bytes() - 1
+    cache.evict()
+
+    assert not cache.contains("b")
+    assert cache.contains("a") and cache.contains("c")
+
+
+def test_load_raw_reuses_the_parsed_frame(data_dirs):
+    raw_dir, _ = data_dirs
+    raw_trips().to_csv(raw_dir / "trips.csv", index=False)
+
+    df, key = StageCache().load_raw("trips.csv")
+    cache = StageCache()
+    cached, cached_key = cache.load_raw("trips.csv")
+
+    assert cached_key == key and cache.hits == 1
+    pd.testing.assert_frame_equal(cached, df)
+
+
+def test_station_dimension_update_keeps_the_rerun_cached(data_dirs):
+    raw = raw_trips()
+    raw.loc[0, "Start Station Name"] = None
+    raw.loc[0, "Start Station Id"] = 7100  # a station this frame never names
+    update_station_dimension(pd.DataFrame({"Start Station Id": [7100], "Start Station Name": ["Queen St"]}))
+
+    first = StageCache()
+    expected = pipeline.process_bike_data(raw, station_dim=load_station_dimension(), cache=first)
+    # main folds the run's stations into the dimension after every run
+    update_station_dimension(expected)
+
+    second = StageCache()
+    result = pipeline.process_bike_data(raw, station_dim=load_station_dimension(), cache=second)
+    assert (second.hits, second.misses) == (len(STAGES), 0)
+    assert result.loc[0, "start_station_name_clean"] == "Queen St"
+    pd.testing.assert_frame_equal(result, expected)
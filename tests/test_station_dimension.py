@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from data_cleaning import clean_station_fields
+from station_dimension import (
+    build_station_dimension,
+    load_station_dimension,
+    update_station_dimension,
+)
+
+
+def trips(start_names, end_names, start_ids=(7001, 7002), end_ids=(7002, 7003)):
+    return pd.DataFrame({
+        "Start Station Id": pd.array(start_ids, dtype="Int32"),
+        "Start Station Name": start_names,
+        "End Station Id": pd.array(end_ids, dtype="Int32"),
+        "End Station Name": end_names,
+    })
+
+
+def test_build_station_dimension_uses_start_and_end_columns():
+    dim = build_station_dimension(trips(["Union Station", None], [None, "Bay St"]))
+
+    assert dim.loc[7001, "station_name"] == "Union Station"
+    assert dim.loc[7003, "station_name"] == "Bay St"
+    assert pd.isna(dim.loc[7002, "station_name"])
+
+
+def test_clean_station_fields_fills_from_station_dimension():
+    august = trips(["Union Station", "Spadina Ave"], ["Spadina Ave", "Bay St"])
+    september = trips([None, None], [None, None], start_ids=(7001, 7999))
+
+    result = clean_station_fields(september, station_dim=build_station_dimension(august))
+
+    assert list(result["start_station_name_clean"]) == ["Union Station", "Unknown Station 7999"]
+    assert list(result["end_station_name_clean"]) == ["Spadina Ave", "Bay St"]
+
+    # without the dimension nothing can be inferred
+    alone = clean_station_fields(september)
+    assert list(alone["start_station_name_clean"]) == ["Unknown Station 7001", "Unknown Station 7999"]
+
+
+def test_update_station_dimension_persists_first_known_name(data_dirs):
+    update_station_dimension(trips(["Union Station", None], ["Spadina Ave", None]))
+    update_station_dimension(trips(["Union Stn (renamed)", "Bay St"], [None, "Bay St"]))
+
+    dim = load_station_dimension()
+
+    assert dim.loc[7001, "station_name"] == "Union Station"
+    assert dim.loc[7002, "station_name"] == "Spadina Ave"
+    # unknown in the first batch, learned from the second
+    assert dim.loc[7003, "station_name"] == "Bay St"
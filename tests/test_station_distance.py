@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import station_distance
+from feature_engineering import compute_distance_fields
+from station_distance import StationDistanceTable, haversine_km, station_coordinates
+
+LAT_LON = [
+    "Start Station Latitude", "Start Station Longitude",
+    "End Station Latitude", "End Station Longitude",
+]
+
+
+def trips() -> pd.DataFrame:
+    return pd.DataFrame({
+        "Start Station Id": pd.array([7001, 7002, 7003, None, 7001], dtype="Int32"),
+        "End Station Id": pd.array([7002, 7001, 7001, 7002, 7001], dtype="Int32"),
+        "Start Station Latitude": [43.6532, 43.6426, np.nan, 43.6500, 43.6532],
+        "Start Station Longitude": [-79.3832, -79.3871, np.nan, -79.3900, -79.3832],
+        "End Station Latitude": [43.6426, 43.6532, 43.6532, 43.6426, 43.6532],
+        "End Station Longitude": [-79.3871, -79.3832, -79.3832, -79.3871, -79.3832],
+    })
+
+
+def test_station_coordinates_prefer_start_side():
+    df = trips()
+    df.loc[1, "End Station Latitude"] = 0.0  # 7001 seen later on the end side
+
+    coords = station_coordinates(df)
+
+    assert coords.index.tolist() == [7001, 7002]
+    assert coords.loc[7001, "latitude"] == pytest.approx(43.6532)
+
+
+def test_distance_table_matches_per_trip_haversine():
+    df = trips()
+    expected = haversine_km(*(df[c] for c in LAT_LON))
+
+    result = compute_distance_fields(df)["trip_distance_km"]
+
+    # row 2 has no start coordinates and 7003 is not in the table -> NaN
+    assert np.isnan(result[2])
+    # row 3 has no start id: falls back to the trip's own coordinates
+    np.testing.assert_allclose(result.drop(index=2), np.delete(expected, 2), rtol=1e-6)
+    assert result.dtype == "float32"
+
+
+def test_distinct_pair_path_matches_dense_matrix(monkeypatch):
+    df = trips()
+    coords = station_coordinates(df)
+    dense = StationDistanceTable.from_coordinates(coords, dtype="float64")
+
+    monkeypatch.setattr(station_distance, "DENSE_MAX_STATIONS", 1)
+    monkeypatch.setattr(station_distance, "LOOKUP_MAX_ID", 0)
+    sparse = StationDistanceTable.from_coordinates(coords, dtype="float64")
+    assert sparse.matrix is None and sparse.id_lookup is None
+
+    a = dense.lookup(df["Start Station Id"], df["End Station Id"])
+    b = sparse.lookup(df["Start Station Id"], df["End Station Id"])
+    np.testing.assert_array_equal(a, b)
+    assert dense.positions(pd.Series([7002, 9999, None], dtype="Int32")).tolist() == [1, -1, -1]
+
+
+def test_int64_ids_are_not_modified():
+    df = trips().dropna(subset=["Start Station Id"]).astype({"Start Station Id": "int64", "End Station Id": "int64"})
+    # an end station without coordinates, past the end of the id lookup array
+    df.loc[df.index[0], ["End Station Id", "End Station Latitude", "End Station Longitude"]] = [8000, np.nan, np.nan]
+    ids_before = df["End Station Id"].copy()
+
+    result = compute_distance_fields(df)["trip_distance_km"]
+
+    pd.testing.assert_series_equal(df["End Station Id"], ids_before)
+    assert len(result) == len(df)
+    assert np.isfinite(result.iloc[1])
@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from station_flow import StationFlow
+
+
+def trips(n: int = 30_000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-07-01") + pd.to_timedelta(rng.integers(0, 7 * 86400, n), unit="s")
+    df = pd.DataFrame({
+        "start_time": start,
+        "end_time": start + pd.to_timedelta(rng.integers(60, 5400, n), unit="s"),
+        "start_station_normalized": pd.Categorical(rng.integers(0, 40, n).astype(str)),
+        # end stations as plain strings with a few stations nobody starts from
+        "end_station_normalized": rng.integers(5, 45, n).astype(str),
+    })
+    df.loc[::97, "start_station_normalized"] = np.nan
+    df.loc[::89, "end_time"] = pd.NaT
+    return df
+
+
+def hourly_counts(df: pd.DataFrame, station_col: str, time_col: str, flow: StationFlow) -> pd.DataFrame:
+    counts = (
+        df.groupby([df[station_col].astype(str).where(df[station_col].notna()), df[time_col].dt.floor("h")])
+          .size()
+          .unstack(fill_value=0)
+    )
+    return counts.reindex(index=flow.stations, columns=flow.hours, fill_value=0)
+
+
+def test_flow_matrices_match_groupby():
+    df = trips()
+    flow = StationFlow.from_frame(df)
+
+    departures = hourly_counts(df, "start_station_normalized", "start_time", flow)
+    arrivals = hourly_counts(df, "end_station_normalized", "end_time", flow)
+    np.testing.assert_array_equal(flow.departures, departures.to_numpy())
+    np.testing.assert_array_equal(flow.arrivals, arrivals.to_numpy())
+    np.testing.assert_array_equal(flow.net_flow, (departures - arrivals).to_numpy())
+    assert len(flow.stations) == 45
+
+
+def test_drift_restarts_at_reset_hours():
+    df = trips()
+    flow = StationFlow.from_frame(df)
+    drift = flow.drift(reset_hours=[4, 16], resets=["2024-07-03 10:30"])
+
+    hours = pd.Series(flow.hours)
+    segment = ((hours.dt.hour == 4) | (hours.dt.hour == 16) | (hours == pd.Timestamp("2024-07-03 10:00"))).cumsum()
+    expected = pd.DataFrame(-flow.net_flow.T).groupby(segment.to_numpy()).cumsum().to_numpy().T
+    np.testing.assert_array_equal(drift, expected)
+    np.testing.assert_array_equal(flow.drift()[:, -1], -flow.net_flow.sum(axis=1))
+
+
+def test_pages_cover_every_station_once_in_sort_order():
+    df = trips()
+    flow = StationFlow.from_frame(df)
+    pages = [
+        flow.page(page, page_size=10, view="drift", sort_by="abs_net_flow",
+                  start="2024-07-02", end="2024-07-03", reset_hours=4)
+        for page in range(flow.n_pages(10))
+    ]
+
+    stations = pd.Index(np.concatenate([page.index for page in pages]))
+    assert stations.is_unique and len(stations) == len(flow.stations)
+    totals = flow.totals().set_index("station")
+    assert totals.loc[stations, "net_flow"].abs().is_monotonic_decreasing
+    assert all(page.shape[1] == 24 for page in pages)
+
+    one = flow.station(stations[0], start="2024-07-02", end="2024-07-03", reset_hours=4)
+    np.testing.assert_array_equal(one["drift"].to_numpy(), pages[0].iloc[0].to_numpy())
+    np.testing.assert_array_equal(one["net_flow"], one["departures"] - one["arrivals"])
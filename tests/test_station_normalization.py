@@ -21,4 +21,21 @@ def test_normalize_station_fields_dataframe():
     assert cleaned.loc[1, "start_station_normalized"] == "College Station"
 
     assert cleaned.loc[0, "end_station_normalized"] == "Spadina Ave"
-    assert cleaned.loc[1, "end_station_normalized"] == "Bay Station"
\ No newline at end of file
+    assert cleaned.loc[1, "end_station_normalized"] == "Bay Station"
+
+def test_normalize_station_fields_shares_categories_between_start_and_end():
+    df = pd.DataFrame({
+        "start_station_name_clean": pd.Categorical(["Bloor & Yonge", "UNION STATION ", None]),
+        "end_station_name_clean": ["union  station", "Bloor and Yonge", "Spadina Ave."],
+    })
+
+    cleaned = normalize_station_fields(df)
+    start = cleaned["start_station_normalized"]
+    end = cleaned["end_station_normalized"]
+
+    assert list(start) == ["Bloor And Yonge", "Union Station", "Unknown Station"]
+    assert list(end) == ["Union Station", "Bloor And Yonge", "Spadina Ave"]
+    assert start.dtype == end.dtype
+    # the same station gets the same code on both sides
+    assert start.cat.codes[1] == end.cat.codes[0]
+    assert start.cat.codes[0] == end.cat.codes[1]
@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import clean_store
+from bitmap_index import BitmapIndex
+from time_index import TimeIndex, is_sorted_by_time, sort_by_time
+
+
+def trips() -> pd.DataFrame:
+    start_time = pd.to_datetime([
+        "2024-07-02 00:00:00", "2024-07-01 23:59:00", "2024-07-01 00:00:00",
+        None, "2024-07-03 12:00:00", "2024-07-02 23:59:59",
+    ])
+    return pd.DataFrame({
+        "start_time": start_time,
+        "start_hour": start_time.hour,
+        "trip_duration_clean": np.arange(6, dtype="float64"),
+    })
+
+
+def test_sort_by_time_puts_nat_last():
+    df = sort_by_time(trips())
+
+    assert is_sorted_by_time(df)
+    assert df["start_time"].isna().tolist() == [False] * 5 + [True]
+    assert sort_by_time(df) is df
+
+
+def test_days_are_inclusive_and_windows_half_open():
+    index = TimeIndex(sort_by_time(trips()))
+
+    # the whole of July 2nd, up to 23:59:59
+    assert index.days("2024-07-02")["trip_duration_clean"].tolist() == [0.0, 5.0]
+    assert len(index.days("2024-07-01", "2024-07-02")) == 4
+    assert len(index.days("2024-07-01", "2024-07-31")) == 5
+    assert len(index.days("2024-06-01", "2024-06-30")) == 0
+
+    assert index.count("2024-07-01", "2024-07-02") == 2
+    assert index.count("2024-07-01 23:59", None) == 4
+    assert index.count() == 5
+    # sub-second bound against second-resolution times
+    assert TimeIndex(sort_by_time(trips()).astype({"start_time": "datetime64[s]"})).count("2024-07-02 23:59:58.5") == 2
+
+
+def test_window_is_a_view_of_the_sorted_frame():
+    df = sort_by_time(trips())
+    window = TimeIndex(df).days("2024-07-02")
+
+    assert np.shares_memory(window["trip_duration_clean"].to_numpy(), df["trip_duration_clean"].to_numpy())
+
+
+def test_unsorted_frame_is_sorted_on_construction():
+    index = TimeIndex(trips())
+
+    assert is_sorted_by_time(index.frame)
+    assert index.first == pd.Timestamp("2024-07-01 00:00")
+    assert index.last == pd.Timestamp("2024-07-03 12:00")
+
+
+def test_clean_store_is_sorted_by_start_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean_store, "CLEAN_DATA_DIR", tmp_path)
+
+    clean_store.write_clean_store(trips(), "trips.parquet")
+    result = clean_store.read_clean_store("trips.parquet")
+
+    assert is_sorted_by_time(result)
+    pd.testing.assert_frame_equal(result, sort_by_time(trips()))
+
+
+def test_bitmap_filters_within_a_day_range():
+    df = sort_by_time(trips())
+    rows = TimeIndex(df).day_bounds("2024-07-01", "2024-07-02")
+
+    assert BitmapIndex(df, columns=["start_hour"]).count(rows=rows, start_hour=(0, 0)) == 2
+    assert BitmapIndex(df, columns=["start_hour"]).count(rows=rows) == 4
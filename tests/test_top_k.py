@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+import top_k as top_k_module
+from analysis import get_peak_stations_by_user_type
+from top_k import SpaceSaving, StreamingTopK, top_k
+
+
+def skewed_trips(n: int = 60_000, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "user_type_standardized": pd.Categorical(rng.choice(["Annual", "Casual"], n, p=[0.7, 0.3])),
+        "start_station_normalized": pd.Categorical((rng.zipf(1.4, n) % 400).astype(str)),
+        "end_station_normalized": pd.Categorical((rng.zipf(1.6, n) % 300).astype(str)),
+    })
+
+
+def expected_top(df: pd.DataFrame, columns, k: int, by=None) -> pd.DataFrame:
+    keys = ([by] if by else []) + columns
+    counts = df.groupby(keys, observed=True).size().rename("trip_count").reset_index()
+    counts = counts.sort_values(keys[:1] + ["trip_count"] if by else ["trip_count"],
+                                ascending=[True, False] if by else [False], kind="stable")
+    return counts.groupby(by, observed=True).head(k) if by else counts.head(k)
+
+
+def test_top_k_matches_groupby_sort():
+    df = skewed_trips()
+    start, end = "start_station_normalized", "end_station_normalized"
+
+    for columns, by in (([start], None), ([start], "user_type_standardized"), ([start, end], None)):
+        result = top_k(df, columns, k=15, by=by)
+        expected = expected_top(df, columns, 15, by)
+        np.testing.assert_array_equal(result["trip_count"], expected["trip_count"])
+        # the leaders are unambiguous in a skewed distribution
+        assert result.iloc[0][columns].tolist() == expected.iloc[0][columns].tolist()
+
+
+def test_sparse_fallback_matches_dense(monkeypatch):
+    df = skewed_trips()
+    dense = top_k(df, ["start_station_normalized", "end_station_normalized"], k=20, by="user_type_standardized")
+
+    monkeypatch.setattr(top_k_module, "DENSE_MAX_CELLS", 10)
+    sparse = top_k(df, ["start_station_normalized", "end_station_normalized"], k=20, by="user_type_standardized")
+
+    pd.testing.assert_frame_equal(sparse, dense)
+
+
+def test_weights_and_peak_stations_from_cube_rows():
+    df = skewed_trips()
+    cube_rows = (
+        df.groupby(["user_type_standardized", "start_station_normalized", "end_station_normalized"], observed=True)
+          .size().rename("trip_count").reset_index()
+    )
+
+    for key in ("start_stations", "end_stations"):
+        np.testing.assert_array_equal(
+            get_peak_stations_by_user_type(cube_rows)[key]["trip_count"],
+            get_peak_stations_by_user_type(df)[key]["trip_count"],
+        )
+
+
+def test_space_saving_bounds_hold():
+    rng = np.random.default_rng(0)
+    items = pd.Series(rng.zipf(1.3, 50_000) % 1000)
+    summary = SpaceSaving(capacity=50)
+    for start in range(0, len(items), 5_000):
+        summary.update(items.iloc[start:start + 5_000].value_counts())
+
+    true = items.value_counts()
+    top = summary.top(10)
+    assert list(top.index[:3]) == list(true.index[:3])
+    assert ((top["count"] - top["error"] <= true[top.index]) & (true[top.index] <= top["count"])).all()
+
+
+def test_streaming_top_k_over_chunks():
+    df = skewed_trips()
+    columns = ["start_station_normalized", "end_station_normalized"]
+    tracker = StreamingTopK(columns, k=5, by="user_type_standardized", capacity=100)
+    for chunk in np.array_split(np.arange(len(df)), 6):
+        # chunks get their own category sets, as in streamed ingestion
+        part = df.iloc[chunk].astype({c: str for c in columns}).astype({c: "category" for c in columns})
+        tracker.update(part)
+
+    result = tracker.result()
+    expected = expected_top(df, columns, 5, by="user_type_standardized")
+    np.testing.assert_array_equal(result["trip_count"], expected["trip_count"])
+    assert (result["error"] == 0).all()
+
+    true = df.groupby(["user_type_standardized"] + columns, observed=True).size().rename("n").reset_index()
+    estimate = tracker.estimate(true[["user_type_standardized"] + columns])
+    assert (estimate >= true["n"].to_numpy()).all()
+    assert tracker.total == len(df)
@@ -0,0 +1,135 @@
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.append(str(SRC_DIR))
+
+from analysis import (
+    get_peak_stations_by_user_type,
+    summarize_time_of_day_by_user_type,
+    summarize_trip_duration_by_user_type,
+)
+from benchmark import make_synthetic_raw_trips
+from pipeline import process_bike_data
+from time_analysis import trips_per_hour, trips_per_month, trips_per_weekday
+from trip_cube import (
+    DURATION_BIN_EDGES,
+    TripCube,
+    build_trip_cube,
+    combine_trip_cubes,
+    duration_moments,
+    duration_quantiles,
+    save_trip_cube,
+)
+
+
+@lru_cache(maxsize=1)
+def _processed_trips() -> pd.DataFrame:
+    return process_bike_data(make_synthetic_raw_trips(5000, n_stations=40, seed=7))
+
+
+def trips() -> pd.DataFrame:
+    return _processed_trips().copy()
+
+
+def test_time_analysis_from_cube_matches_row_level():
+    df = trips()
+    cube = TripCube(build_trip_cube(df))
+
+    for func, dim in ((trips_per_hour, "start_hour"),
+                      (trips_per_weekday, "start_weekday"),
+                      (trips_per_month, "start_month")):
+        expected = func(df)
+        result = func(cube.query([dim]))
+        np.testing.assert_array_equal(result[dim].astype(str), expected[dim].astype(str))
+        np.testing.assert_array_equal(result["trip_count"], expected["trip_count"])
+
+
+def test_analysis_from_cube_matches_row_level():
+    df = trips()
+    cube = TripCube(build_trip_cube(df))
+
+    expected = summarize_trip_duration_by_user_type(df)
+    result = summarize_trip_duration_by_user_type(cube.query(["user_type_standardized", "duration_bin"]))
+    np.testing.assert_array_equal(result["trips_count"], expected["trips_count"])
+    np.testing.assert_allclose(result["duration_mean_sec"], expected["duration_mean_sec"], rtol=1e-6)
+    # median comes from the histogram sketch: within one ~11% bin
+    np.testing.assert_allclose(result["duration_median_sec"], expected["duration_median_sec"], rtol=0.12)
+
+    od = cube.query(["user_type_standardized", "start_station_normalized", "end_station_normalized"])
+    for key, frame in get_peak_stations_by_user_type(od).items():
+        expected_counts = get_peak_stations_by_user_type(df)[key]["trip_count"]
+        np.testing.assert_array_equal(frame["trip_count"], expected_counts)
+
+    pd.testing.assert_frame_equal(
+        summarize_time_of_day_by_user_type(cube.query(["start_hour", "user_type_standardized"])),
+        summarize_time_of_day_by_user_type(df),
+        check_dtype=False,
+        check_index_type=False,
+        check_categorical=False,
+    )
+
+
+def test_where_filters_are_inclusive_and_moments_match():
+    df = trips()
+    cube = TripCube(build_trip_cube(df))
+
+    first_day = df["start_time"].min().normalize()
+    days = (first_day, first_day + pd.Timedelta(days=6))
+    in_range = (df["start_time"] >= days[0]) & (df["start_time"] < days[1] + pd.Timedelta(days=1))
+    in_range &= df["is_rush_hour"]
+
+    result = cube.query(["user_type_standardized"], where={"start_date": days, "is_rush_hour": True})
+    assert result["trip_count"].sum() == in_range.sum()
+
+    moments = duration_moments(result.set_index("user_type_standardized"))
+    expected = (
+        df.loc[in_range, "trip_duration_clean"].astype("float64")
+          .groupby(df.loc[in_range, "user_type_standardized"], observed=True)
+          .agg(["count", "mean", "std"])
+    )
+    np.testing.assert_allclose(moments.loc[expected.index].to_numpy(), expected.to_numpy(), rtol=1e-6)
+
+
+def test_combined_chunk_cubes_equal_full_cube_and_round_trip(data_dirs):
+    df = trips()
+    full = build_trip_cube(df)
+    combined = combine_trip_cubes([build_trip_cube(df.iloc[:2000]), build_trip_cube(df.iloc[2000:])])
+
+    for name in full:
+        assert combined[name]["trip_count"].sum() == len(df)
+        assert len(combined[name]) == len(full[name])
+
+    save_trip_cube(combined)
+    loaded = TripCube.load()
+    assert loaded.total_trips() == len(df)
+    pd.testing.assert_frame_equal(
+        loaded.query(["start_weekday"]),
+        TripCube(full).query(["start_weekday"]),
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+    # a cube saved before the od_hour cuboid existed still answers from the base cuboid
+    (loaded.path / "od_hour.parquet").unlink()
+    stations = df.loc[df["start_hour"].between(7, 9), ["start_station_normalized", "end_station_normalized"]]
+    assert TripCube.load().od_matrix({"start_hour": (7, 9)}).data.sum() == stations.notna().all(axis=1).sum()
+
+
+def test_duration_quantiles_skip_leading_empty_bins():
+    # every trip in bin 5: p=0 is its lower edge, not 0/0 in an empty bin
+    frame = pd.DataFrame({"duration_bin": [5, 5], "trip_count": [3, 1]})
+
+    with np.errstate(all="raise"):
+        result = duration_quantiles(frame, q=(0.0, 0.5, 1.0))
+
+    assert result.notna().all(axis=None)
+    assert result.iloc[0, 0] == DURATION_BIN_EDGES[5]
+    assert DURATION_BIN_EDGES[5] < result.iloc[0, 1] < DURATION_BIN_EDGES[6]
+    assert result.iloc[0, 2] == pytest.approx(DURATION_BIN_EDGES[6])